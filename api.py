@@ -1,11 +1,41 @@
 import requests
+from requests.adapters import HTTPAdapter
+import httpx
 import json
+import os
+import zlib
+import hashlib
 import logging
 import re
+import sys
+import time
+import secrets
+import random
+import threading
+import asyncio
+import concurrent.futures
+import bisect
+import heapq
+import math
+import sqlite3
+import shlex
+from collections import OrderedDict
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from dateutil import parser
 
+# 可选依赖：安装 pypinyin 后自动补全支持拼音和拼音首字母
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+# 可选依赖：安装 numpy 后任务筛选使用列式存储做向量化计算
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 logging.basicConfig(
     level=logging.DEBUG,  # 设置日志级别
@@ -15,152 +45,1986 @@ logging.basicConfig(
     encoding='utf-8'
 )
 
+# 默认的 API 地址
+BASE_URL = "https://api.dida365.com"
+
+# 默认超时时间（秒）：(连接超时, 读取超时)
+DEFAULT_TIMEOUT = (5, 30)
+
+# 同步结果在请求期间过时（如切换了账号）时丢弃并重新同步，最多尝试的次数
+SYNC_ATTEMPTS = 3
+
+# 进程内共享的 HTTP 会话，所有 User 实例复用同一个连接池
+_shared_session = None
+
+def create_session(pool_connections = 4, pool_maxsize = 16, keep_alive = True):
+    """创建带连接池的 HTTP 会话
+
+    Args:
+        pool_connections: 缓存的连接池数量（按主机区分）
+        pool_maxsize: 每个主机连接池中保持的最大连接数
+        keep_alive: 是否复用连接；为 False 时每个请求结束后关闭连接
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+def get_shared_session():
+    """获取进程内共享的 HTTP 会话，不存在时按默认参数创建"""
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = create_session()
+    return _shared_session
+
+def configure_shared_session(pool_connections = 4, pool_maxsize = 16, keep_alive = True):
+    """按指定参数重建共享会话，应在创建 User 之前调用"""
+    global _shared_session
+    if _shared_session is not None:
+        _shared_session.close()
+    _shared_session = create_session(pool_connections, pool_maxsize, keep_alive)
+    return _shared_session
+
+# 进程内共享的异步 HTTP 客户端，供 AsyncUser 使用
+_shared_async_client = None
+
+def create_async_client(max_connections = 32, max_keepalive_connections = 16, keepalive_expiry = 30):
+    """创建带连接池的异步 HTTP 客户端
+
+    Args:
+        max_connections: 同时打开的最大连接数
+        max_keepalive_connections: 空闲时保持的最大连接数
+        keepalive_expiry: 空闲连接的保持时间（秒）
+    """
+    limits = httpx.Limits(max_connections=max_connections,
+                          max_keepalive_connections=max_keepalive_connections,
+                          keepalive_expiry=keepalive_expiry)
+    return httpx.AsyncClient(limits=limits)
+
+def get_shared_async_client():
+    """获取进程内共享的异步 HTTP 客户端，不存在时按默认参数创建"""
+    global _shared_async_client
+    if _shared_async_client is None:
+        _shared_async_client = create_async_client()
+    return _shared_async_client
+
+def configure_shared_async_client(max_connections = 32, max_keepalive_connections = 16, keepalive_expiry = 30):
+    """按指定参数创建共享的异步客户端，应在创建 AsyncUser 之前调用"""
+    global _shared_async_client
+    _shared_async_client = create_async_client(max_connections, max_keepalive_connections, keepalive_expiry)
+    return _shared_async_client
+
+async def close_shared_async_client():
+    """关闭共享的异步客户端，释放连接池"""
+    global _shared_async_client
+    if _shared_async_client is not None:
+        await _shared_async_client.aclose()
+        _shared_async_client = None
+
+def httpx_timeout(timeout):
+    """把 requests 风格的超时参数（秒数或 (连接超时, 读取超时)）转换为 httpx.Timeout"""
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+def task_batch_payload(add = None, update = None, delete = None,
+                       add_attachments = None, update_attachments = None, delete_attachments = None):
+    """构建 /batch/task 接口的请求体"""
+    return {
+        "add": add or [],
+        "update": update or [],
+        "delete": delete or [],
+        "addAttachments": add_attachments or [],
+        "updateAttachments": update_attachments or [],
+        "deleteAttachments": delete_attachments or []
+    }
+
+def new_object_id():
+    """生成与服务器格式一致的24位十六进制ID（4字节时间戳 + 8字节随机数）"""
+    return f"{int(time.time()):08x}{secrets.token_hex(8)}"
+
+def new_task_items(tasks):
+    """把待新增的任务转换为请求数据，没有ID的任务在客户端生成ID，便于把结果写回本地模型"""
+    items = []
+    for task in tasks:
+        if not task.id:
+            task.id = new_object_id()
+        items.append(task.to_dict())
+    return items
+
+def changed_fields(base, data):
+    """data 相对 base 变化的字段（被去掉的字段为 None），总是包含 id"""
+    changes = {key: value for key, value in data.items() if base.get(key) != value}
+    changes.update((key, None) for key in base if key not in data)
+    changes["id"] = data["id"]
+    return changes
+
+def delete_items(tasks):
+    """把任务对象转换为 /batch/task 删除项 {"taskId", "projectId"}"""
+    return [{"taskId": task.id, "projectId": task.projectId} for task in tasks]
+
+def parse_timestamp(value):
+    """把时间字符串解析为时间戳（秒），为空或无法解析时返回 None
+
+    接口返回的格式固定为 "2025-05-21T16:00:00.000+0000"，先走 datetime.fromisoformat 快速路径，
+    其他格式再交给 dateutil 解析；不带时区的时间按本地时间处理。
+    """
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        try:
+            dt = parser.parse(value)
+        except (ValueError, TypeError, OverflowError):
+            return None
+    return dt.timestamp()
+
+def day_range(day = None):
+    """本地时间某一天的 [开始, 结束) 时间戳，默认今天"""
+    start = datetime.combine(day or date.today(), datetime.min.time())
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+# 中日韩文字按连续字符的二元组切分，其他文字按单词（字母数字串）切分
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"([{_CJK_CHARS}]+)|([0-9a-z\u00c0-\u024f]+)")
+_CJK_RE = re.compile(f"[{_CJK_CHARS}]")
+
+def tokenize(text):
+    """把文本切分为检索词：中日韩文字取相邻两字（单独一个字时取单字），拉丁文字取小写单词"""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall((text or "").lower()):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(map(str.__add__, cjk, cjk[1:]))
+    return tokens
+
+def task_text_fields(task):
+    """参与全文检索的任务文本：标题、内容、描述和检查项标题"""
+    fields = [task.title, task.content, task.desc]
+    for item in task.items or ():
+        if isinstance(item, dict):
+            fields.append(item.get("title"))
+    return [i for i in fields if i and isinstance(i, str)]
+
+def text_snippet(task, terms, width = 40):
+    """截取任务文本中命中检索词最多的字段里第一个命中处附近的片段，命中的词用【】标出"""
+    best = None
+    for text in task_text_fields(task):
+        lower = text.lower()
+        hits = [(pos, -len(term)) for term in terms for pos in [lower.find(term)] if pos >= 0]
+        if hits and (best is None or len(hits) > best[0]):
+            best = (len(hits), text, min(hits))
+    if best is None:
+        return task.title or ""
+    _, text, (pos, length) = best
+    length = -length
+    start = max(0, pos - width // 2)
+    end = min(len(text), pos + length + width // 2)
+    return (("…" if start > 0 else "") + text[start:pos] + "【" + text[pos:pos + length] + "】"
+            + text[pos + length:end] + ("…" if end < len(text) else ""))
+
+def normalize_name(name):
+    """名称比较前的规范化：忽略大小写，合并多余空白"""
+    return " ".join((name or "").casefold().split())
+
+def name_grams(name):
+    """名称的三元组集合（前面补两个空格、后面补一个空格，使开头的字符权重更高）"""
+    padded = f"  {normalize_name(name)} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+# 名称中的分隔符，分隔符之后的部分也可以作为补全的前缀
+_WORD_BREAK_RE = re.compile(r"[\s\-_/|:;,.，。、；：（）()\[\]【】《》<>\"'“”‘’]+")
+
+def prefix_keys(name):
+    """名称可供前缀匹配的形式，返回 [(文本, 匹配类型), ...]
+
+    匹配类型 0 为整个名称，1 为名称中某个词开头的部分，2 为拼音/拼音首字母（需要安装 pypinyin）。
+    """
+    text = normalize_name(name)
+    if not text:
+        return []
+    keys = {text: 0}
+    for m in _WORD_BREAK_RE.finditer(text):
+        rest = text[m.end():]
+        if rest:
+            keys.setdefault(rest, 1)
+    if lazy_pinyin is not None and _CJK_RE.search(text):
+        compact = _WORD_BREAK_RE.sub("", text)
+        keys.setdefault("".join(lazy_pinyin(compact)), 2)
+        keys.setdefault("".join(lazy_pinyin(compact, style=Style.FIRST_LETTER)), 2)
+    return list(keys.items())
+
+def pick_match(exact, matches, threshold = 0.6, margin = 0.1):
+    """在精确匹配和相似候选中确定唯一结果，返回 (对象, 置信度)，无法确定时对象为 None
+
+    exact 为精确匹配的对象；没有精确匹配时，相似度最高的候选不低于 threshold
+    且领先第二名至少 margin 才视为命中，否则交给调用方列出候选。
+    """
+    if exact is not None:
+        return exact, 1.0
+    if matches and matches[0][1] >= threshold and (len(matches) == 1 or matches[0][1] - matches[1][1] >= margin):
+        return matches[0]
+    return None, 0.0
+
+# 紧凑输出省略的默认值；None、空字符串、空列表/字典和 False 总是省略
+COMPACT_DEFAULTS = {
+    'status': 0, 'priority': 0, 'progress': 0, 'deleted': 0, 'completedUserId': 0, 'commentCount': 0, 'kind': 'TEXT',
+}
+
+# 短键名对照表，没有列出的键保持原样
+SHORT_KEYS = {
+    'title': 't', 'content': 'c', 'desc': 'd', 'projectId': 'pid', 'projectName': 'pn',
+    'status': 's', 'priority': 'p', 'progress': 'pg', 'tags': 'tg', 'tagDetails': 'td',
+    'dueDate': 'due', 'startDate': 'st', 'isAllDay': 'ad', 'isFloating': 'fl', 'timeZone': 'tz',
+    'items': 'it', 'reminder': 'rm1', 'reminders': 'rm', 'exDate': 'ex', 'repeatFlag': 'rf', 'repeatFrom': 'rfr',
+    'repeatTaskId': 'rt', 'sortOrder': 'so', 'createdTime': 'ct', 'modifiedTime': 'mt', 'completedTime': 'cpt',
+    'completedUserId': 'cu', 'creator': 'cr', 'assignee': 'as', 'etag': 'e', 'kind': 'k', 'columnId': 'col',
+    'parentId': 'par', 'childIds': 'ch', 'deleted': 'del', 'focusSummaries': 'fs', 'commentCount': 'cc',
+    'name': 'n', 'color': 'clr', 'label': 'lb', 'groupId': 'gid', 'viewMode': 'vm', 'inAll': 'ia',
+    'searchScore': 'sc', 'snippet': 'sn', 'matchConfidence': 'mc',
+}
+
+# 裁剪字段时总是保留的键：任务和项目的 id、标签的 name，以及数据过期标记
+_IDENTITY_KEYS = ('id', 'name', '_stale')
+
+def compact_value(value):
+    """紧凑格式：递归去掉空值和默认值"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            item = compact_value(item)
+            if item is None or item is False or item == "" or item == [] or item == {}:
+                continue
+            if key in COMPACT_DEFAULTS and COMPACT_DEFAULTS[key] == item and type(item) is type(COMPACT_DEFAULTS[key]):
+                continue
+            result[key] = item
+        return result
+    if isinstance(value, list):
+        return [compact_value(item) for item in value]
+    return value
+
+def shorten_keys(value):
+    """递归把键名换成 SHORT_KEYS 中的短键名"""
+    if isinstance(value, dict):
+        return {SHORT_KEYS.get(key, key): shorten_keys(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shorten_keys(item) for item in value]
+    return value
+
+def select_fields(item, fields):
+    """只保留 fields 中的字段，id（标签为 name）总是保留"""
+    return {key: value for key, value in item.items() if key in fields or key in _IDENTITY_KEYS}
+
+def shape_output(result, fields = "", compact = False, short_keys = False):
+    """按 fields（逗号分隔的字段名）、compact（省略空值和默认值）、short_keys（短键名）调整返回结果
+
+    result 可以是单个对象、对象列表、带 "tasks" 列表的分页/查询结果（外层的 total 等键不变），
+    或过期数据的 {"data": ..., "_stale": ...} 包装；错误信息原样返回。
+    """
+    fields = {name.strip() for name in fields.split(",") if name.strip()} if fields else None
+
+    def shape(item):
+        if not isinstance(item, dict) or "error" in item:
+            return item
+        if fields is not None:
+            item = select_fields(item, fields)
+        if compact:
+            item = compact_value(item)
+        if short_keys:
+            item = shorten_keys(item)
+        return item
+
+    def shape_result(result):
+        if isinstance(result, list):
+            return [shape(item) for item in result]
+        if isinstance(result, dict) and "_stale" in result and "data" in result:
+            return {**result, "data": shape_result(result["data"])}
+        if isinstance(result, dict) and isinstance(result.get("tasks"), list):
+            return {**result, "tasks": [shape(item) for item in result["tasks"]]}
+        return shape(result)
+
+    return shape_result(result)
+
+def dump_json(data, compact = False):
+    """序列化为 JSON 字符串，compact=True 时不缩进、不留空格"""
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
 def write_tmp(str):
     with open('tmp.txt', 'a', encoding='utf-8') as file:
         file.write(str)
         file.write('\n')
 
 
-class Task:
-    def __init__(self, task_dict=None):
+class Model:
+    """滴答清单数据对象的公共基类
 
-        # 任务唯一标识符（字符串格式，如"681473bbf92b2938d3ab5d45"）
-        self.id = None  
-        
-        # 任务标题（字符串，必填字段）
-        self.title = None  
-        
-        # 所属项目ID（字符串，如"6778eeb7c71c710000000114"表示特定项目）
-        self.projectId = None  
-        
-        # 开始时间（ISO 8601格式字符串，如"2025-05-21T16:00:00.000+0000"）
-        self.startDate = None  
-        
-        # 子任务列表（数组，存储子任务对象，默认空数组）
-        self.items = None  
-        
-        # 提醒时间列表（数组，存储提醒时间点，默认空数组）
-        self.reminders = None  
-        
-        # 排除的重复日期（数组，存储重复任务中跳过的时间点，默认空数组）
-        self.exDate = None  
-        
-        # 截止时间（ISO 8601格式字符串，可为None表示无截止时间）
-        self.dueDate = None  
-        
-        # 优先级（整数1-5，5最高，0表示无优先级）
-        self.priority = None  
-        
-        # 是否为全天任务（布尔值，True表示全天任务）
-        self.isAllDay = None  
-        
-        # 重复规则（字符串，如"RRULE:FREQ=DAILY"，None表示不重复）
-        self.repeatFlag = None  
-        
-        # 进度百分比（整数0-100，0表示未开始）
-        self.progress = None  
-        
-        # 任务负责人（用户ID，None表示无人负责）
-        self.assignee = None  
-        
-        # 排序权重（数值越小越靠前，通常为大负数）
-        self.sortOrder = None  
-        
-        # 是否为浮动时间（布尔值，True表示忽略时区）
-        self.isFloating = None  
-        
-        # 任务状态（整数：0=未完成，1=已完成，2=已归档）
-        self.status = None  
-        
-        # 任务类型扩展字段（保留字段，通常为None）
-        self.kind = None  
-        
-        # 创建时间（ISO 8601格式字符串）
-        self.createdTime = None  
-        
-        # 最后修改时间（ISO 8601格式字符串）
-        self.modifiedTime = None  
-        
-        # 标签列表（数组，存储字符串类型的标签）
-        self.tags = None  
-        
-        # 时区标识（字符串，如"Asia/Hong_Kong"）
-        self.timeZone = None  
-        
-        # 任务描述内容（字符串，可为空）
-        self.content = None  
+    使用 __slots__ 固定已知字段的布局（每个对象不再带 __dict__），服务端返回的未知字段放入 _extra 溢出字典，
+    仍然可以按属性访问。to_dict 的结果会缓存，直到任一字段被重新赋值；列表等可变字段请整体赋值而不是原地修改。
+    """
+    _fields = ()
+    _interned = frozenset()    # 取值重复度高的字符串字段（项目ID、时区等），加载时 intern 以共享同一个字符串对象
+    __slots__ = ('_extra', '_dict_cache')
 
-        # 如果有输入字典，覆盖对应字段
-        if task_dict:
-            self.__dict__.update(task_dict)
-    
-    def to_dict(self):
-        return {key: value for key, value in self.__dict__.items() if value is not None}        
+    def __init__(self, data=None):
+        data = data or {}
+        get = data.get
+        # 直接调用 slot 描述符赋值，绕过 __setattr__，加载大量任务时开销更小
+        for name, setter in self._setters:
+            setter(self, get(name))
+        for name, setter in self._intern_setters:
+            value = get(name)
+            if type(value) is str:
+                setter(self, sys.intern(value))
+        unknown = data.keys() - self._field_set
+        object.__setattr__(self, '_extra', {key: data[key] for key in unknown} if unknown else None)
+        object.__setattr__(self, '_dict_cache', None)
 
-class Tag:
-    def __init__(self, task_dict=None):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls._fields)
+        cls._all_slots = tuple(name for klass in cls.__mro__ for name in klass.__dict__.get('__slots__', ()))
+        cls._setters = tuple((name, getattr(cls, name).__set__) for name in cls._fields)
+        cls._intern_setters = tuple((name, getattr(cls, name).__set__) for name in cls._fields if name in cls._interned)
+
+    def __setattr__(self, name, value):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            # 不在 __slots__ 中的字段放入溢出字典
+            if self._extra is None:
+                object.__setattr__(self, '_extra', {})
+            self._extra[name] = value
+        if name[0] != '_':
+            object.__setattr__(self, '_dict_cache', None)
+
+    def __getattr__(self, name):
+        # 只有在 slot 中找不到时才会调用，下划线开头的内部字段不查溢出字典（避免反序列化时递归）
+        if name[0] != '_':
+            extra = self._extra
+            if extra and name in extra:
+                return extra[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._as_dict()!r})"
+
+    def _as_dict(self):
+        """缓存的字典形式（只读，调用方不要修改）"""
+        cache = self._dict_cache
+        if cache is None:
+            cache = {}
+            for name in self._fields:
+                value = getattr(self, name)
+                if value is not None:
+                    cache[name] = value
+            if self._extra:
+                cache.update((key, value) for key, value in self._extra.items() if value is not None)
+            object.__setattr__(self, '_dict_cache', cache)
+        return cache
 
-        self.name = None
-        self.rawName = None
-        self.label = None
-        self.sortOrder = None
-        self.sortType = None
-        self.color = None
-        self.etag = None
-        self.type = None
-        
-               
-        if task_dict:
-            self.__dict__.update(task_dict)
-    
     def to_dict(self):
-        return {key: value for key, value in self.__dict__.items() if value is not None}        
+        # 返回过滤掉 None 值的字典副本，调用方可以自由修改
+        return dict(self._as_dict())
+
+    def copy(self):
+        """浅拷贝，修改副本的字段不会影响原对象"""
+        clone = object.__new__(type(self))
+        for name in self._all_slots:
+            try:
+                object.__setattr__(clone, name, object.__getattribute__(self, name))
+            except AttributeError:
+                pass
+        if clone._extra:
+            object.__setattr__(clone, '_extra', dict(clone._extra))
+        return clone
+
+
+class Task(Model):
+    _fields = (
+        'id',              # 任务唯一标识符（字符串格式，如"681473bbf92b2938d3ab5d45"）
+        'title',           # 任务标题（字符串，必填字段）
+        'projectId',       # 所属项目ID（字符串，如"6778eeb7c71c710000000114"表示特定项目）
+        'startDate',       # 开始时间（ISO 8601格式字符串，如"2025-05-21T16:00:00.000+0000"）
+        'items',           # 子任务列表（数组，存储子任务对象，默认空数组）
+        'reminders',       # 提醒时间列表（数组，存储提醒时间点，默认空数组）
+        'exDate',          # 排除的重复日期（数组，存储重复任务中跳过的时间点，默认空数组）
+        'dueDate',         # 截止时间（ISO 8601格式字符串，可为None表示无截止时间）
+        'priority',        # 优先级（整数1-5，5最高，0表示无优先级）
+        'isAllDay',        # 是否为全天任务（布尔值，True表示全天任务）
+        'repeatFlag',      # 重复规则（字符串，如"RRULE:FREQ=DAILY"，None表示不重复）
+        'progress',        # 进度百分比（整数0-100，0表示未开始）
+        'assignee',        # 任务负责人（用户ID，None表示无人负责）
+        'sortOrder',       # 排序权重（数值越小越靠前，通常为大负数）
+        'isFloating',      # 是否为浮动时间（布尔值，True表示忽略时区）
+        'status',          # 任务状态（整数：0=未完成，1=已完成，2=已归档）
+        'kind',            # 任务类型扩展字段（保留字段，通常为None）
+        'createdTime',     # 创建时间（ISO 8601格式字符串）
+        'modifiedTime',    # 最后修改时间（ISO 8601格式字符串）
+        'tags',            # 标签列表（数组，存储字符串类型的标签）
+        'timeZone',        # 时区标识（字符串，如"Asia/Hong_Kong"）
+        'content',         # 任务描述内容（字符串，可为空）
+        # 以下为接口常见的其他字段
+        'etag', 'desc', 'completedTime', 'completedUserId', 'columnId', 'parentId', 'childIds',
+        'reminder', 'repeatFrom', 'repeatTaskId', 'deleted', 'creator', 'attachments',
+        'commentCount', 'focusSummaries', 'imgMode', 'pinnedTime',
+    )
+    _interned = frozenset(('projectId', 'timeZone', 'kind', 'repeatFlag', 'repeatFrom', 'columnId', 'parentId'))
+    __slots__ = _fields + ('_start_src', '_due_src', '_start_ts', '_due_ts')
 
-class Project:
     def __init__(self, task_dict=None):
-        self.id = None
-        self.name = None
-        self.isOwner = None
-        self.color = None
-        self.sortOrder = None
-        self.sortOption = None
-        self.sortType = None
-        self.userCount = None
-        self.etag = None
-        self.modifiedTime = None
-        self.inAll = None
-        self.showType = None
-        self.muted = None
-        self.reminderType = None
-        self.closed = None
-        self.transferred = None
-        self.groupId = None
-        self.viewMode = None
-        self.notificationOptions = None
-        self.teamId = None
-        self.permission = None
-        self.kind = None
-        self.timeline = None
-        self.needAudit = None
-        self.barcodeNeedAudit = None
-        self.openToTeam = None
-        self.teamMemberPermission = None
-        self.source = None
-
-        # 如果提供了字典，则更新对象的属性
-        if task_dict:
-            self.__dict__.update(task_dict)
+        super().__init__(task_dict)
+
+        # 入库时解析一次开始/截止时间，结果按原始字符串缓存（字段被修改后自动重新解析）
+        self._start_src = self._due_src = None
+        self._start_ts = self._due_ts = None
+        self.start_time()
+        self.due_time()
+
+    def start_time(self):
+        """开始时间的时间戳（秒），无开始时间或无法解析时返回 None"""
+        if self._start_src is not self.startDate:
+            self._start_src = self.startDate
+            self._start_ts = parse_timestamp(self.startDate)
+        return self._start_ts
+
+    def due_time(self):
+        """截止时间的时间戳（秒），无截止时间或无法解析时返回 None"""
+        if self._due_src is not self.dueDate:
+            self._due_src = self.dueDate
+            self._due_ts = parse_timestamp(self.dueDate)
+        return self._due_ts
+
+class Tag(Model):
+    _fields = ('name', 'rawName', 'label', 'sortOrder', 'sortType', 'color', 'etag', 'type', 'parent')
+    __slots__ = _fields
+
+class Project(Model):
+    _fields = (
+        'id', 'name', 'isOwner', 'color', 'sortOrder', 'sortOption', 'sortType', 'userCount', 'etag',
+        'modifiedTime', 'inAll', 'showType', 'muted', 'reminderType', 'closed', 'transferred', 'groupId',
+        'viewMode', 'notificationOptions', 'teamId', 'permission', 'kind', 'timeline', 'needAudit',
+        'barcodeNeedAudit', 'openToTeam', 'teamMemberPermission', 'source',
+    )
+    __slots__ = _fields
+
+class TaskWriteQueue:
+    """任务写操作合并队列
+
+    把一段时间内提交的新增/修改/删除合并为一次 /batch/task 请求，同一任务的多次操作会被去重：
+    新增后再修改合并为一次新增，多次修改合并为一次修改（后提交的字段覆盖先提交的），
+    新增后删除直接抵消，修改后删除只保留删除。每个操作通过各自的 future 获得结果（True/False）。
+    修改可以附带 changes（只含改动的字段），合并时只用改动的字段覆盖排队中的数据，
+    基于同一版本分别修改不同字段的多次修改不会互相覆盖。
+    future 可以是 concurrent.futures.Future 或 asyncio.Future。
+    """
+
+    def __init__(self):
+        # 任务ID -> [操作类型, 请求数据, [future, ...]]，操作类型为 add/update/delete/cancel
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def put(self, kind, data, future, changes = None):
+        task_id = data["taskId"] if kind == "delete" else data["id"]
+        with self._lock:
+            slot = self._slots.get(task_id)
+            if slot is None:
+                self._slots[task_id] = [kind, data, [future]]
+                return
+            prev = slot[0]
+            if prev in ("delete", "cancel"):
+                # 任务已在队列中被删除，之后的操作不再生效
+                future.set_result(False)
+                return
+            if kind == "delete":
+                slot[0] = "cancel" if prev == "add" else "delete"
+                slot[1] = data
+            else:
+                slot[1] = {**slot[1], **(data if changes is None else changes)}
+            slot[2].append(future)
+
+    def drain(self):
+        """取出全部待提交操作，返回 (请求体, 操作列表)；被抵消的操作直接返回成功"""
+        with self._lock:
+            slots, self._slots = self._slots, {}
+        pending = []
+        add, update, delete = [], [], []
+        for task_id, (kind, data, futures) in slots.items():
+            if kind == "cancel":
+                for future in futures:
+                    future.set_result(True)
+                continue
+            {"add": add, "update": update, "delete": delete}[kind].append(data)
+            pending.append((task_id, kind, futures))
+        if not pending:
+            return None, []
+        return task_batch_payload(add=add, update=update, delete=delete), pending
+
+    @staticmethod
+    def resolve(pending, result):
+        """根据 /batch/task 的返回结果设置每个操作的结果，result 为 None 表示请求失败"""
+        id2etag = (result or {}).get("id2etag") or {}
+        id2error = (result or {}).get("id2error") or {}
+        for task_id, kind, futures in pending:
+            if result is None or task_id in id2error:
+                ok = False
+            elif kind == "delete":
+                ok = True
+            else:
+                ok = task_id in id2etag
+            for future in futures:
+                if not future.done():
+                    future.set_result(ok)
+
+
+class CopyOnWrite:
+    """写时复制索引的公共部分：_copied 为 True 表示全量构建，为集合时记录本次构建已复制过的桶"""
+    __slots__ = ()
+
+    def _bucket(self, index, key, empty):
+        """取得本次构建可以修改的索引桶（旧版本共享的桶先复制）"""
+        bucket = index.get(key)
+        if self._copied is True:
+            # 全量构建，所有桶都是新建的
+            if bucket is None:
+                bucket = index[key] = empty()
+            return bucket
+        marker = (id(index), key)
+        if bucket is None:
+            bucket = index[key] = empty()
+        elif marker not in self._copied:
+            bucket = index[key] = bucket.copy()
+        self._copied.add(marker)
+        return bucket
+
+
+class Snapshot(CopyOnWrite):
+    """某一版本的只读数据快照（任务、项目、标签及其查找索引）
+
+    快照发布后不再修改：同步或本地写操作会在旁边构建新快照（未变化的部分与旧快照共享，
+    被修改的索引桶先复制再修改），再通过一次引用赋值替换 User 上的当前快照。
+    读取方先取得快照引用再使用，即使期间发生同步，也始终看到同一版本的完整数据，无需加锁。
+    快照中的对象同样视为只读，需要修改时使用 find_* 返回的副本或 Model.copy()。
+    """
+    __slots__ = (
+        'version',           # 版本号，每次发布新快照加一，可用作缓存键
+        'tasks', 'projects', 'tags',
+        'tasks_by_id',
+        'tasks_by_title',    # 标题 -> (Task, ...)（标题可能重复）
+        'tasks_by_project',  # 项目ID -> {任务ID: Task}
+        'tasks_by_tag',      # 标签名 -> {任务ID: Task}
+        'task_keys',         # 任务ID -> 建立索引时的 (标题, 项目ID, 标签, 截止时间, 开始时间)，用于删除旧索引
+        'due_index',         # 按截止时间排序的 [(时间戳, 任务ID), ...]
+        'start_index',       # 按开始时间排序的 [(时间戳, 任务ID), ...]
+        'projects_by_id', 'projects_by_name', 'tags_by_name',
+        '_indexes',          # 派生索引 (数据来源, 名称) -> 索引对象（全文检索、名称相似度等），第一次使用时构建
+        '_pending',          # 任务派生索引尚未应用的变化 (数据来源, 名称) -> (旧版本索引, 更新的任务, 删除的任务ID)
+        '_copied',           # 构建期间已复制的索引桶，发布后为 None
+    )
+
+    def __init__(self, version = 0, tasks = (), projects = (), tags = ()):
+        """全量构建快照"""
+        self.version = version
+        self._copied = None
+        self._indexes = {}
+        self._pending = {}
+        self._set_projects(projects)
+        self._set_tags(tags)
+        self.tasks = tuple(tasks)
+        self.tasks_by_id = {}
+        self.tasks_by_title = {}
+        self.tasks_by_project = {}
+        self.tasks_by_tag = {}
+        self.task_keys = {}
+        self.due_index = []
+        self.start_index = []
+        self._copied = True
+        for task in self.tasks:
+            self._index_task(task, bulk=True)
+        # 全量构建时先追加再统一排序，比逐个插入更快
+        self.due_index.sort()
+        self.start_index.sort()
+        self._copied = None
+
+    def evolve(self, version, updated = None, deleted_ids = (), projects = None, tags = None):
+        """基于当前快照构建新快照（写时复制），当前快照保持不变
+
+        updated 为新增/修改的任务（任务ID -> Task），deleted_ids 为删除的任务ID，
+        projects/tags 不为 None 时整体替换项目/标签列表。
+        """
+        snapshot = object.__new__(Snapshot)
+        for name in Snapshot.__slots__:
+            setattr(snapshot, name, getattr(self, name))
+        snapshot.version = version
+        snapshot._indexes, snapshot._pending = self._carry_indexes(
+            updated or {}, deleted_ids, projects is not None, tags is not None)
+        if projects is not None:
+            snapshot._set_projects(projects)
+        if tags is not None:
+            snapshot._set_tags(tags)
+        if updated or deleted_ids:
+            snapshot._merge_tasks(dict(updated or {}), set(deleted_ids))
+        return snapshot
+
+    def _carry_indexes(self, updated, deleted_ids, projects_changed, tags_changed):
+        """新快照可以沿用的派生索引和待应用的变化
+
+        数据来源未变化的索引直接共享；任务变化时，已构建的任务派生索引不立即更新，
+        而是连同变化一起记录下来，连续多次变化合并后在下次使用时一次性应用（evolve）。
+        项目/标签派生索引在列表被替换时丢弃，下次使用时重新构建（数量很少）。
+        """
+        tasks_changed = bool(updated or deleted_ids)
+        indexes, pending = {}, {}
+        for key, index in list(self._indexes.items()):
+            source = key[0]
+            if source == "tasks" and tasks_changed:
+                pending[key] = (index, {}, set())
+            elif not (source == "projects" and projects_changed or source == "tags" and tags_changed):
+                indexes[key] = index
+        for key, delta in list(self._pending.items()):
+            pending.setdefault(key, delta)
+        if not tasks_changed:
+            return indexes, pending
+        # 变化太多时增量应用不比全量构建快
+        limit = len(self.tasks) // 4 + 64
+        for key, (base, tasks, deleted) in list(pending.items()):
+            tasks, deleted = dict(tasks), set(deleted)
+            for task_id in deleted_ids:
+                tasks.pop(task_id, None)
+                deleted.add(task_id)
+            # 删除后又新增的任务保留在删除集合中：快照把它移到了末尾，先删除再新增才能保持相同的顺序
+            for task_id, task in updated.items():
+                tasks[task_id] = task
+            if len(tasks) + len(deleted) > limit:
+                del pending[key]
+            else:
+                pending[key] = (base, tasks, deleted)
+        return indexes, pending
+
+    def _set_projects(self, projects):
+        self.projects = tuple(projects)
+        self.projects_by_id = {i.id: i for i in self.projects}
+        self.projects_by_name = {}
+        for i in self.projects:
+            # 名称重复时保留列表中的第一个，与线性查找的结果一致
+            self.projects_by_name.setdefault(i.name, i)
+
+    def _set_tags(self, tags):
+        self.tags = tuple(tags)
+        self.tags_by_name = {}
+        for i in self.tags:
+            self.tags_by_name.setdefault(i.name, i)
+
+    def _merge_tasks(self, updated, deleted_ids):
+        # 顶层索引浅复制，内部的桶在第一次修改时再复制
+        self.tasks_by_id = dict(self.tasks_by_id)
+        self.tasks_by_title = dict(self.tasks_by_title)
+        self.tasks_by_project = dict(self.tasks_by_project)
+        self.tasks_by_tag = dict(self.tasks_by_tag)
+        self.task_keys = dict(self.task_keys)
+        self.due_index = list(self.due_index)
+        self.start_index = list(self.start_index)
+        self._copied = set()
+        for task_id in deleted_ids:
+            self._unindex_task(task_id)
+        for task_id, task in updated.items():
+            self._unindex_task(task_id)
+            self._index_task(task)
+        self._copied = None
+
+        tasks = []
+        for task in self.tasks:
+            if task.id in deleted_ids:
+                continue
+            # 已存在的任务原位替换，保持原有顺序
+            tasks.append(updated.pop(task.id, task))
+        tasks.extend(updated.values())
+        self.tasks = tuple(tasks)
+
+    def _index_task(self, task, bulk = False):
+        """把任务加入各个索引，bulk=True 时日期索引只追加不排序"""
+        tags = tuple(task.tags or ())
+        due, start = task.due_time(), task.start_time()
+        self.tasks_by_id[task.id] = task
+        self.task_keys[task.id] = (task.title, task.projectId, tags, due, start)
+        self._bucket(self.tasks_by_title, task.title, list).append(task)
+        self._bucket(self.tasks_by_project, task.projectId, dict)[task.id] = task
+        for tag in tags:
+            self._bucket(self.tasks_by_tag, tag, dict)[task.id] = task
+        for index, ts in ((self.due_index, due), (self.start_index, start)):
+            if ts is not None:
+                if bulk:
+                    index.append((ts, task.id))
+                else:
+                    bisect.insort(index, (ts, task.id))
+
+    def _unindex_task(self, task_id):
+        """按建立索引时记录的键把任务从各个索引中移除"""
+        self.tasks_by_id.pop(task_id, None)
+        keys = self.task_keys.pop(task_id, None)
+        if keys is None:
+            return
+        title, project_id, tags, due, start = keys
+        for index, ts in ((self.due_index, due), (self.start_index, start)):
+            if ts is not None:
+                pos = bisect.bisect_left(index, (ts, task_id))
+                if pos < len(index) and index[pos] == (ts, task_id):
+                    del index[pos]
+        if title in self.tasks_by_title:
+            same_title = self._bucket(self.tasks_by_title, title, list)
+            same_title[:] = [i for i in same_title if i.id != task_id]
+            if not same_title:
+                del self.tasks_by_title[title]
+        for index, key in [(self.tasks_by_project, project_id)] + [(self.tasks_by_tag, tag) for tag in tags]:
+            if key in index:
+                bucket = self._bucket(index, key, dict)
+                bucket.pop(task_id, None)
+                if not bucket:
+                    del index[key]
+
+    # ========== 查询 ==========
+    def tasks_in_project(self, project_id):
+        """获取指定项目中的所有任务"""
+        return list(self.tasks_by_project.get(project_id, {}).values())
+
+    def tasks_with_tag(self, tag_name):
+        """获取包含指定标签的所有任务"""
+        return list(self.tasks_by_tag.get(tag_name, {}).values())
+
+    def _tasks_in_range(self, index, start, end):
+        lo = bisect.bisect_left(index, (start,))
+        hi = bisect.bisect_left(index, (end,))
+        return [self.tasks_by_id[task_id] for _, task_id in index[lo:hi]]
+
+    def tasks_due_between(self, start, end):
+        """截止时间在 [start, end) 内的任务，start/end 为时间戳，按截止时间排序"""
+        return self._tasks_in_range(self.due_index, start, end)
+
+    def tasks_starting_between(self, start, end):
+        """开始时间在 [start, end) 内的任务，按开始时间排序"""
+        return self._tasks_in_range(self.start_index, start, end)
+
+    def derived(self, key, build):
+        """取得派生索引，第一次使用时构建（有待应用的变化时在旧索引上增量更新）
+
+        key 为 (数据来源, 名称)，数据来源为 tasks/projects/tags；build() 用于全量构建。
+        并发构建的结果相同，后写入的覆盖先写入的即可，无需加锁。
+        """
+        index = self._indexes.get(key)
+        if index is None:
+            delta = self._pending.get(key)
+            if delta is not None:
+                base, tasks, deleted = delta
+                index = base.evolve(tasks, deleted)
+            else:
+                index = build()
+            self._indexes[key] = index
+            self._pending.pop(key, None)
+        return index
+
+    @property
+    def text_index(self):
+        """全文检索索引"""
+        return self.derived(("tasks", "text"), lambda: TextIndex(self.tasks))
+
+    @property
+    def title_index(self):
+        """任务标题的相似度索引"""
+        return self.derived(("tasks", "title"), lambda: NameIndex(self.tasks, name="title"))
+
+    @property
+    def project_name_index(self):
+        """项目名称的相似度索引"""
+        return self.derived(("projects", "name"), lambda: NameIndex(self.projects))
+
+    @property
+    def tag_name_index(self):
+        """标签名称的相似度索引"""
+        return self.derived(("tags", "name"), lambda: NameIndex(self.tags, key="name"))
+
+    @property
+    def stats(self):
+        """任务统计（TaskStats）"""
+        return self.derived(("tasks", "stats"), lambda: TaskStats(self.tasks))
+
+    @property
+    def positions(self):
+        """任务在任务列表中的先后顺序（TaskPositions）"""
+        return self.derived(("tasks", "positions"), lambda: TaskPositions(self.tasks))
+
+    @property
+    def columns(self):
+        """任务的列式副本（TaskColumns），没有安装 numpy 时为 None"""
+        if np is None:
+            return None
+        return self.derived(("tasks", "columns"), lambda: TaskColumns(self.tasks))
+
+    @property
+    def enriched_view(self):
+        """附加了项目名称和标签详情的任务字典视图（EnrichedView）"""
+        key = ("tasks", "enriched")
+        view = self.derived(key, lambda: EnrichedView(self.projects_by_id, self.tags_by_name))
+        if view.projects is not self.projects_by_id or view.tags is not self.tags_by_name:
+            view = view.rejoin(self)
+            self._indexes[key] = view
+        return view
+
+    @property
+    def task_prefix_index(self):
+        """任务标题的前缀索引"""
+        return self.derived(("tasks", "prefix"), lambda: PrefixIndex(self.tasks, name="title"))
+
+    @property
+    def project_prefix_index(self):
+        """项目名称的前缀索引"""
+        return self.derived(("projects", "prefix"), lambda: PrefixIndex(self.projects))
+
+    @property
+    def tag_prefix_index(self):
+        """标签名称的前缀索引"""
+        return self.derived(("tags", "prefix"), lambda: PrefixIndex(self.tags, key="name"))
+
+    def search(self, query, limit = 20):
+        """全文检索，返回按相关度排序的 [(Task, 得分), ...]"""
+        return [(self.tasks_by_id[task_id], score) for score, task_id in self.text_index.search(query, limit)]
+
+    def match_tasks(self, title, limit = 5):
+        """标题与 title 相近的任务，返回按相似度排序的 [(Task, 相似度), ...]"""
+        return [(self.tasks_by_id[task_id], score) for score, task_id in self.title_index.match(title, limit)]
+
+    def match_projects(self, name, limit = 5):
+        """名称与 name 相近的项目，返回按相似度排序的 [(Project, 相似度), ...]"""
+        return [(self.projects_by_id[project_id], score)
+                for score, project_id in self.project_name_index.match(name, limit)]
+
+    def match_tags(self, name, limit = 5):
+        """名称与 name 相近的标签，返回按相似度排序的 [(Tag, 相似度), ...]"""
+        return [(self.tags_by_name[tag_name], score) for score, tag_name in self.tag_name_index.match(name, limit)]
+
+
+class TextIndex(CopyOnWrite):
+    """任务全文检索的倒排索引（标题、内容、描述、检查项标题），按 BM25 排序
+
+    与 Snapshot 一样构建后只读：evolve() 复制顶层字典，只复制被修改的倒排桶，旧索引保持不变。
+    标题中的词按 TITLE_WEIGHT 倍计入词频，使标题命中排在内容命中之前。
+    文档长度归一化项在加入索引时预先算好，平均长度变化超过 AVG_DRIFT 时才全部重算。
+    """
+    __slots__ = (
+        'postings',    # 检索词 -> {任务ID: 词频}
+        'doc_terms',   # 任务ID -> 该任务包含的检索词，用于删除旧索引
+        'doc_len',     # 任务ID -> 文档长度（加权后的词数）
+        'doc_norm',    # 任务ID -> BM25 长度归一化项 k1 * (1 - b + b * 长度 / 平均长度)
+        'total_len',   # 全部文档长度之和
+        'avg_len',     # 计算 doc_norm 时使用的平均长度
+        'chars',       # 中日韩单字 -> {包含该字的检索词: None}，用于单字查询
+        '_copied',
+    )
+    TITLE_WEIGHT = 2
+    K1 = 1.2
+    B = 0.75
+    AVG_DRIFT = 0.2
+
+    def __init__(self, tasks = ()):
+        """全量构建索引"""
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_len = {}
+        self.chars = {}
+        self.total_len = 0
+        self._copied = True
+        for task in tasks:
+            self._add(task)
+        self._copied = None
+        self._renorm()
+
+    def evolve(self, updated = None, deleted_ids = ()):
+        """应用任务变化（任务ID -> Task，删除的任务ID），返回新索引，当前索引保持不变"""
+        index = object.__new__(TextIndex)
+        index.postings = dict(self.postings)
+        index.doc_terms = dict(self.doc_terms)
+        index.doc_len = dict(self.doc_len)
+        index.doc_norm = dict(self.doc_norm)
+        index.chars = dict(self.chars)
+        index.total_len = self.total_len
+        index.avg_len = self.avg_len
+        index._copied = set()
+        for task_id in deleted_ids:
+            index._remove(task_id)
+        for task_id, task in (updated or {}).items():
+            index._remove(task_id)
+            index._add(task)
+        index._copied = None
+        avg_len = index.total_len / max(len(index.doc_len), 1)
+        if abs(avg_len - index.avg_len) > index.avg_len * self.AVG_DRIFT:
+            index._renorm()
+        return index
+
+    def _renorm(self):
+        self.avg_len = self.total_len / max(len(self.doc_len), 1) or 1
+        k1, b, avg_len = self.K1, self.B, self.avg_len
+        self.doc_norm = {task_id: k1 * (1 - b + b * length / avg_len) for task_id, length in self.doc_len.items()}
+
+    def _add(self, task):
+        counts = {}
+        length = 0
+        for n, text in enumerate(task_text_fields(task)):
+            weight = self.TITLE_WEIGHT if n == 0 and text == task.title else 1
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + weight
+                length += weight
+        if not counts:
+            return
+        task_id = task.id
+        self.doc_terms[task_id] = tuple(counts)
+        self.doc_len[task_id] = length
+        self.total_len += length
+        if self._copied is True:
+            # 全量构建：所有桶都是新建的，直接写入
+            postings_index, chars = self.postings, self.chars
+            for token, tf in counts.items():
+                postings = postings_index.get(token)
+                if postings is None:
+                    postings = postings_index[token] = {}
+                    if _CJK_RE.match(token):
+                        for char in set(token):
+                            chars.setdefault(char, {})[token] = None
+                postings[task_id] = tf
+            return
+        self.doc_norm[task_id] = self.K1 * (1 - self.B + self.B * length / self.avg_len)
+        for token, tf in counts.items():
+            postings = self._bucket(self.postings, token, dict)
+            if not postings and _CJK_RE.match(token):
+                for char in set(token):
+                    self._bucket(self.chars, char, dict)[token] = None
+            postings[task_id] = tf
+
+    def _remove(self, task_id):
+        terms = self.doc_terms.pop(task_id, None)
+        if terms is None:
+            return
+        self.total_len -= self.doc_len.pop(task_id)
+        del self.doc_norm[task_id]
+        for token in terms:
+            postings = self._bucket(self.postings, token, dict)
+            postings.pop(task_id, None)
+            if postings:
+                continue
+            del self.postings[token]
+            if _CJK_RE.match(token):
+                for char in set(token):
+                    tokens = self._bucket(self.chars, char, dict)
+                    tokens.pop(token, None)
+                    if not tokens:
+                        del self.chars[char]
+
+    def query_groups(self, query):
+        """查询语句对应的检索词分组，每组为 [(得分上限, 倒排表), ...]
+
+        一般每个检索词一组；单个中日韩字扩展为所有包含该字的检索词，同组内任意一个命中即可。
+        索引中不存在的检索词对应空组。
+        """
+        count = len(self.doc_len)
+        groups = []
+        for token in dict.fromkeys(tokenize(query)):
+            if len(token) == 1 and _CJK_RE.match(token):
+                tokens = self.chars.get(token, ())
+            else:
+                tokens = (token,)
+            group = []
+            for term in tokens:
+                postings = self.postings.get(term)
+                if postings:
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    group.append((idf * (self.K1 + 1), postings))
+            groups.append(group)
+        return groups
+
+    def search(self, query, limit = 20):
+        """按 BM25 得分返回前 limit 个 (得分, 任务ID)
+
+        优先返回同时命中全部检索词的任务（从最短的倒排表开始求交集）；没有这样的任务时，
+        返回命中任一检索词的任务。
+        """
+        if not self.doc_len or limit <= 0:
+            return []
+        groups = self.query_groups(query)
+        if not groups:
+            return []
+        if len(groups) == 1 and len(groups[0]) == 1:
+            # 单个检索词：一次遍历倒排表直接取前 limit 名
+            (bound, postings), = groups[0]
+            norms = self.doc_norm
+            return heapq.nlargest(limit, ((bound * tf / (tf + norms[task_id]), task_id)
+                                          for task_id, tf in postings.items()))
+        scores = self._search_all(groups) if all(groups) else {}
+        if not scores and len(groups) > 1:
+            scores = self._search_any([term for group in groups for term in group], limit)
+        return heapq.nlargest(limit, ((score, task_id) for task_id, score in scores.items()))
+
+    def match_all(self, query):
+        """同时命中全部检索词的任务，返回 {任务ID: 得分}"""
+        groups = self.query_groups(query)
+        if not groups or not all(groups):
+            return {}
+        return self._search_all(groups)
+
+    def _search_all(self, groups):
+        norms = self.doc_norm
+        groups = sorted(groups, key=lambda group: sum(len(postings) for _, postings in group))
+        first, others = groups[0], groups[1:]
+        candidates = set().union(*(postings.keys() for _, postings in first))
+        for group in others:
+            if len(group) == 1:
+                candidates = group[0][1].keys() & candidates
+            else:
+                candidates = {task_id for task_id in candidates if any(task_id in postings for _, postings in group)}
+            if not candidates:
+                return {}
+        scores = dict.fromkeys(candidates, 0.0)
+        for group in groups:
+            for bound, postings in group:
+                # 从候选集合和倒排表中较小的一方遍历
+                if len(postings) < len(scores):
+                    for task_id, tf in postings.items():
+                        if task_id in scores:
+                            scores[task_id] += bound * tf / (tf + norms[task_id])
+                else:
+                    for task_id in scores:
+                        tf = postings.get(task_id)
+                        if tf:
+                            scores[task_id] += bound * tf / (tf + norms[task_id])
+        return scores
+
+    def _search_any(self, terms, limit):
+        """任一检索词命中即可；按得分上限从高到低处理，剩余检索词的得分上限之和已不超过
+        当前第 limit 名的得分时，只为已有候选累加得分，不再遍历这些常见词的完整倒排表"""
+        norms = self.doc_norm
+        terms = sorted(terms, key=lambda term: term[0], reverse=True)
+        rest = sum(bound for bound, _ in terms)
+        scores = {}
+        for bound, postings in terms:
+            rest -= bound
+            if not scores:
+                scores = {task_id: bound * tf / (tf + norms[task_id]) for task_id, tf in postings.items()}
+            elif len(scores) < len(postings) and len(scores) >= limit \
+                    and heapq.nlargest(limit, scores.values())[-1] >= rest + bound:
+                # 新文档最多只能得到 rest + bound 分，进不了前 limit 名，只需更新已有候选
+                for task_id in scores:
+                    tf = postings.get(task_id)
+                    if tf:
+                        scores[task_id] += bound * tf / (tf + norms[task_id])
+            else:
+                get = scores.get
+                for task_id, tf in postings.items():
+                    scores[task_id] = get(task_id, 0.0) + bound * tf / (tf + norms[task_id])
+        return scores
+
+class NameIndex(CopyOnWrite):
+    """名称的三元组相似度索引，用于按名称/标题查找时容忍错别字和大小写差异
+
+    相似度为三元组集合的 Jaccard 系数。查询时只从最少见的若干个三元组取候选（前缀过滤）：
+    相似度不低于 s 的名称至少与查询共享 s * |查询三元组| 个三元组，
+    因此必然出现在最少见的 |查询三元组| - 该数量 + 1 个三元组之一中，无需遍历全部名称。
+    出现在超过 COMMON_RATIO 比例名称中的三元组（如常见的英文词尾）不作为候选来源，
+    结果可能漏掉只靠这些三元组相似的名称，但查询耗时不随名称数量增长。
+    """
+    __slots__ = (
+        'grams',    # 三元组 -> {对象键: None}
+        'entries',  # 对象键 -> 三元组集合
+        'key',      # 对象键的属性名
+        'name',     # 名称的属性名
+        '_copied',
+    )
+    MIN_SIMILARITY = 0.2
+    COMMON_RATIO = 0.02
+
+    def __init__(self, objects = (), key = "id", name = "name"):
+        self.grams = {}
+        self.entries = {}
+        self.key = key
+        self.name = name
+        self._copied = True
+        for obj in objects:
+            self._add(obj)
+        self._copied = None
+
+    def evolve(self, updated = None, deleted_keys = ()):
+        """应用变化（对象键 -> 对象，删除的对象键），返回新索引，当前索引保持不变"""
+        index = object.__new__(NameIndex)
+        index.grams = dict(self.grams)
+        index.entries = dict(self.entries)
+        index.key = self.key
+        index.name = self.name
+        index._copied = set()
+        for key in deleted_keys:
+            index._remove(key)
+        for key, obj in (updated or {}).items():
+            index._remove(key)
+            index._add(obj)
+        index._copied = None
+        return index
+
+    def _add(self, obj):
+        key = getattr(obj, self.key)
+        grams = name_grams(getattr(obj, self.name))
+        self.entries[key] = grams
+        for gram in grams:
+            self._bucket(self.grams, gram, dict)[key] = None
+
+    def _remove(self, key):
+        grams = self.entries.pop(key, None)
+        for gram in grams or ():
+            bucket = self._bucket(self.grams, gram, dict)
+            bucket.pop(key, None)
+            if not bucket:
+                del self.grams[gram]
+
+    def match(self, query, limit = 5, min_similarity = MIN_SIMILARITY):
+        """与 query 最相近的前 limit 个对象，返回 [(相似度, 对象键), ...]"""
+        grams = name_grams(query)
+        need = max(1, math.ceil(min_similarity * len(grams)))
+        common = max(256, int(len(self.entries) * self.COMMON_RATIO))
+        candidates = set()
+        for n, gram in enumerate(sorted(grams, key=lambda gram: len(self.grams.get(gram, ())))):
+            keys = self.grams.get(gram, ())
+            if n > len(grams) - need or (len(keys) > common and candidates):
+                break
+            candidates.update(keys)
+        results = []
+        for key in candidates:
+            other = self.entries[key]
+            common = len(grams & other)
+            score = common / (len(grams) + len(other) - common)
+            if score >= min_similarity:
+                results.append((score, key))
+        return heapq.nlargest(limit, results)
+
+
+class TaskStats(CopyOnWrite):
+    """任务统计的累计值：按状态、优先级、项目、标签计数，以及未完成任务的截止时间（用于统计过期任务）
+
+    每个任务对各计数的贡献记录在 contrib 中，任务变化时先减去旧贡献再加上新贡献，
+    统计结果随快照增量更新，读取时不再遍历任务。与其他派生索引一样写时复制，旧版本保持不变。
+    """
+    __slots__ = (
+        'total',
+        'by_status',    # 状态 -> 任务数
+        'by_priority',  # 优先级 -> 任务数
+        'by_project',   # 项目ID -> {状态: 任务数}
+        'by_tag',       # 标签名 -> {状态: 任务数}
+        'pending_due',  # 未完成任务按截止时间排序的 [(时间戳, 任务ID), ...]
+        'contrib',      # 任务ID -> (状态, 优先级, 项目ID, 标签, 未完成任务的截止时间)
+        '_copied',
+    )
+
+    def __init__(self, tasks = ()):
+        self.total = 0
+        self.by_status = {}
+        self.by_priority = {}
+        self.by_project = {}
+        self.by_tag = {}
+        self.pending_due = []
+        self.contrib = {}
+        self._copied = True
+        for task in tasks:
+            self._add(task, bulk=True)
+        self.pending_due.sort()
+        self._copied = None
+
+    def evolve(self, updated = None, deleted_ids = ()):
+        """应用任务变化（任务ID -> Task，删除的任务ID），返回新的统计，当前统计保持不变"""
+        stats = object.__new__(TaskStats)
+        stats.total = self.total
+        stats.by_status = dict(self.by_status)
+        stats.by_priority = dict(self.by_priority)
+        stats.by_project = dict(self.by_project)
+        stats.by_tag = dict(self.by_tag)
+        stats.pending_due = list(self.pending_due)
+        stats.contrib = dict(self.contrib)
+        stats._copied = set()
+        for task_id in deleted_ids:
+            stats._remove(task_id)
+        for task_id, task in (updated or {}).items():
+            stats._remove(task_id)
+            stats._add(task)
+        stats._copied = None
+        return stats
+
+    @staticmethod
+    def _count(counts, key, delta):
+        value = counts.get(key, 0) + delta
+        if value:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    def _apply(self, contrib, delta):
+        status, priority, project_id, tags, due = contrib
+        self.total += delta
+        self._count(self.by_status, status, delta)
+        self._count(self.by_priority, priority, delta)
+        self._count(self._bucket(self.by_project, project_id, dict), status, delta)
+        if not self.by_project[project_id]:
+            del self.by_project[project_id]
+        for tag in tags:
+            self._count(self._bucket(self.by_tag, tag, dict), status, delta)
+            if not self.by_tag[tag]:
+                del self.by_tag[tag]
+
+    def _add(self, task, bulk = False):
+        # 没有 status 的任务视为未完成（0），与过期统计和 query_tasks 一致
+        status = task.status or 0
+        due = task.due_time() if status == 0 else None
+        contrib = (status, task.priority or 0, task.projectId, tuple(dict.fromkeys(task.tags or ())), due)
+        self.contrib[task.id] = contrib
+        self._apply(contrib, 1)
+        if due is not None:
+            if bulk:
+                self.pending_due.append((due, task.id))
+            else:
+                bisect.insort(self.pending_due, (due, task.id))
+
+    def _remove(self, task_id):
+        contrib = self.contrib.pop(task_id, None)
+        if contrib is None:
+            return
+        self._apply(contrib, -1)
+        due = contrib[4]
+        if due is not None:
+            pos = bisect.bisect_left(self.pending_due, (due, task_id))
+            if pos < len(self.pending_due) and self.pending_due[pos] == (due, task_id):
+                del self.pending_due[pos]
+
+    def overdue(self, now = None):
+        """已过截止时间且未完成的任务数"""
+        now = time.time() if now is None else now
+        return bisect.bisect_left(self.pending_due, (now,))
+
+
+class TaskColumns:
+    """任务快照的列式副本（需要 numpy），筛选时对整列做向量化比较，不逐个访问任务对象
+
+    每个任务占一行，行的顺序与快照的任务列表一致：修改的任务原位覆盖，新增的任务追加在末尾，
+    删除的任务只把 alive 置为 False，删除的行过多时整体压缩。
+    项目ID按字典编码为整数，标签编码为位集合（每 64 个标签一列 uint64）。
+    """
+    __slots__ = (
+        'tasks',          # 行号 -> Task（object 数组）
+        'ids',            # 行号 -> 任务ID
+        'rows',           # 任务ID -> 行号
+        'alive',          # 行是否有效
+        'status', 'priority', 'progress',
+        'due', 'start',   # 截止/开始时间戳，没有时为 NaN
+        'project',        # 项目编码
+        'project_codes',  # 项目ID -> 编码
+        'tag_bits',       # (行数, 列数) 的标签位集合
+        'tag_codes',      # 标签名 -> 位序号
+        'dead',           # 已删除的行数
+    )
+
+    COLUMNS = ('tasks', 'ids', 'status', 'priority', 'progress', 'due', 'start', 'project', 'tag_bits')
+
+    def __init__(self, tasks = ()):
+        tasks = list(tasks)
+        self.rows = {task.id: row for row, task in enumerate(tasks)}
+        self.project_codes = {}
+        self.tag_codes = {}
+        self.dead = 0
+        self.alive = np.ones(len(tasks), dtype=bool)
+        for name, column in self._columns(tasks).items():
+            setattr(self, name, column)
+
+    def _columns(self, tasks):
+        """把一批任务转换为各列的数组，同时为新出现的项目和标签编码"""
+        project_codes, tag_codes = self.project_codes, self.tag_codes
+        nan = float("nan")
+        tag_rows, tag_bits = [], []
+        for row, task in enumerate(tasks):
+            for tag in task.tags or ():
+                tag_rows.append(row)
+                tag_bits.append(tag_codes.setdefault(tag, len(tag_codes)))
+        # 每 64 个标签一列，行内各标签的位互不相同，按位或写入
+        words = max(1, (len(tag_codes) + 63) // 64)
+        bits = np.zeros(len(tasks) * words, dtype=np.uint64)
+        if tag_bits:
+            codes = np.array(tag_bits, dtype=np.int64)
+            np.bitwise_or.at(bits, np.array(tag_rows, dtype=np.int64) * words + (codes >> 6),
+                             np.left_shift(np.uint64(1), (codes & 63).astype(np.uint64)))
+        return {
+            # 不用 array[:] = tasks：numpy 会逐个探测对象是否为序列/数组，对 Task 很慢
+            'tasks': np.fromiter(tasks, dtype=object, count=len(tasks)),
+            'ids': np.array([task.id for task in tasks], dtype=str),
+            'status': np.array([task.status or 0 for task in tasks], dtype=np.int8),
+            'priority': np.array([task.priority or 0 for task in tasks], dtype=np.int8),
+            'progress': np.array([task.progress or 0 for task in tasks], dtype=np.int16),
+            'due': np.array([nan if ts is None else ts for ts in map(Task.due_time, tasks)], dtype=np.float64),
+            'start': np.array([nan if ts is None else ts for ts in map(Task.start_time, tasks)], dtype=np.float64),
+            'project': np.array([project_codes.setdefault(task.projectId, len(project_codes)) for task in tasks], dtype=np.int32),
+            'tag_bits': bits.reshape(len(tasks), words),
+        }
+
+    def evolve(self, updated = None, deleted_ids = ()):
+        """应用任务变化（任务ID -> Task，删除的任务ID），返回新的列式副本，当前副本保持不变"""
+        columns = object.__new__(TaskColumns)
+        columns.rows = dict(self.rows)
+        columns.project_codes = dict(self.project_codes)
+        columns.tag_codes = dict(self.tag_codes)
+        columns.dead = self.dead
+        columns.alive = self.alive.copy()
+        for name in self.COLUMNS:
+            setattr(columns, name, getattr(self, name).copy())
+        for task_id in deleted_ids:
+            row = columns.rows.pop(task_id, None)
+            if row is not None:
+                columns.alive[row] = False
+                columns.tasks[row] = None
+                columns.dead += 1
+        changed = [task for task in (updated or {}).values() if task.id in columns.rows]
+        added = [task for task in (updated or {}).values() if task.id not in columns.rows]
+        values = columns._columns(changed + added)
+        words = values['tag_bits'].shape[1]
+        if words > columns.tag_bits.shape[1]:
+            columns.tag_bits = np.hstack([columns.tag_bits, np.zeros((len(columns.tasks), words - columns.tag_bits.shape[1]), dtype=np.uint64)])
+        rows = [columns.rows[task.id] for task in changed]
+        if rows:
+            for name in self.COLUMNS:
+                getattr(columns, name)[rows] = values[name][:len(rows)]
+        if added:
+            base = len(columns.tasks)
+            for offset, task in enumerate(added):
+                columns.rows[task.id] = base + offset
+            columns.alive = np.concatenate([columns.alive, np.ones(len(added), dtype=bool)])
+            for name in self.COLUMNS:
+                setattr(columns, name, np.concatenate([getattr(columns, name), values[name][len(rows):]]))
+        if columns.dead > len(columns.tasks) // 4:
+            columns._compact()
+        return columns
+
+    def _compact(self):
+        """去掉已删除的行"""
+        keep = self.alive
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.rows = {task_id: row for row, task_id in enumerate(self.ids.tolist())}
+        self.alive = np.ones(len(self.tasks), dtype=bool)
+        self.dead = 0
+
+    def has_tag(self, tag):
+        """包含指定标签的行（布尔数组）"""
+        code = self.tag_codes.get(tag)
+        if code is None:
+            return np.zeros(len(self.tasks), dtype=bool)
+        return (self.tag_bits[:, code >> 6] & np.uint64(1 << (code & 63))) != 0
+
+    def in_project(self, project_id):
+        """属于指定项目的行（布尔数组）"""
+        code = self.project_codes.get(project_id)
+        if code is None:
+            return np.zeros(len(self.tasks), dtype=bool)
+        return self.project == code
+
+    def select(self, project_id = None, tag = None, status = None, min_priority = None, due_before = None):
+        """按条件筛选任务，返回 Task 列表，与 User.query_tasks 的条件和顺序相同"""
+        mask = self.alive.copy()
+        if project_id is not None:
+            mask &= self.in_project(project_id)
+        if tag is not None:
+            mask &= self.has_tag(tag)
+        if status is not None:
+            mask &= self.status == status
+        if min_priority is not None:
+            mask &= self.priority >= min_priority
+        if due_before is not None:
+            mask &= self.due < due_before   # NaN 比较结果为 False，没有截止时间的任务不会入选
+        return self.rows_to_tasks(np.flatnonzero(mask), by_due=due_before is not None)
+
+    def rows_to_tasks(self, rows, by_due = False):
+        """行号数组转换为 Task 列表，by_due=True 时按 (截止时间, 任务ID) 排序"""
+        if by_due:
+            rows = rows[np.lexsort((self.ids[rows], self.due[rows]))]
+        return self.tasks[rows].tolist()
+
+
+class TaskPositions:
+    """任务在快照任务列表中的先后顺序（任务ID -> 序号），用于把索引桶中取出的任务按任务列表的顺序排列
+
+    序号只保证先后关系与任务列表一致，不等于列表下标：删除任务后不重新编号，
+    与快照相同，修改的任务保持原位，新增（包括删除后又新增）的任务排在最后。
+    """
+
+    def __init__(self, tasks = ()):
+        self.order = {task.id: i for i, task in enumerate(tasks)}
+        self.next = len(self.order)
+
+    def evolve(self, updated = None, deleted_ids = ()):
+        """应用任务变化，返回新的顺序表，当前顺序表保持不变"""
+        positions = object.__new__(TaskPositions)
+        positions.order = order = dict(self.order)
+        positions.next = self.next
+        for task_id in deleted_ids:
+            order.pop(task_id, None)
+        for task_id in updated or {}:
+            if task_id not in order:
+                order[task_id] = positions.next
+                positions.next += 1
+        return positions
+
+    def sort(self, tasks):
+        """按任务列表中的顺序排列"""
+        order = self.order
+        return sorted(tasks, key=lambda task: order[task.id])
+
+
+class EnrichedView:
+    """附加了项目名称（projectName）和标签详情（tagDetails）的任务字典（物化视图）
+
+    字典在第一次取用时生成并缓存，之后直接返回同一个对象（只读，调用方不要修改）。
+    任务变化时只丢弃变化任务的缓存；项目/标签列表变化时只丢弃名称、颜色等有变化的项目/标签下的任务。
+    缓存项记录生成它的任务对象，取用的任务不是同一个对象时重新生成，不会返回其他版本的数据。
+    """
+    __slots__ = ('entries', 'projects', 'tags')
+
+    def __init__(self, projects, tags, entries = None):
+        self.projects = projects    # 项目ID -> Project
+        self.tags = tags            # 标签名 -> Tag
+        self.entries = {} if entries is None else entries   # 任务ID -> (Task, 字典)
+
+    def evolve(self, updated = None, deleted_ids = ()):
+        """应用任务变化（任务ID -> Task，删除的任务ID），返回新的视图，当前视图保持不变"""
+        entries = dict(self.entries)
+        for task_id in deleted_ids:
+            entries.pop(task_id, None)
+        for task_id in updated or ():
+            entries.pop(task_id, None)
+        return EnrichedView(self.projects, self.tags, entries)
+
+    def rejoin(self, snapshot):
+        """换用快照中新的项目/标签列表，返回新的视图，只丢弃受影响任务的缓存"""
+        stale = set()
+        projects, tags = snapshot.projects_by_id, snapshot.tags_by_name
+        for project_id in self.projects.keys() | projects.keys():
+            old, new = self.projects.get(project_id), projects.get(project_id)
+            if (old and old.name) != (new and new.name):
+                stale.update(task.id for task in snapshot.tasks_in_project(project_id))
+        for name in self.tags.keys() | tags.keys():
+            old, new = self.tags.get(name), tags.get(name)
+            if (old and (old.name, old.label, old.color)) != (new and (new.name, new.label, new.color)):
+                stale.update(task.id for task in snapshot.tasks_with_tag(name))
+        entries = {task_id: entry for task_id, entry in self.entries.items() if task_id not in stale}
+        return EnrichedView(projects, tags, entries)
+
+    def get(self, task):
+        """任务的附加字典"""
+        entry = self.entries.get(task.id)
+        if entry is not None and entry[0] is task:
+            return entry[1]
+        data = dict(task._as_dict())
+        project_id = task.projectId
+        if project_id and project_id in self.projects:
+            data['projectName'] = self.projects[project_id].name
+        if task.tags:
+            details = []
+            for tag_name in task.tags:
+                tag = self.tags.get(tag_name)
+                if tag is not None:
+                    details.append({'name': tag.name, 'label': tag.label, 'color': tag.color})
+                else:
+                    details.append({'name': tag_name})
+            data['tagDetails'] = details
+        # 并发生成的结果相同，后写入的覆盖先写入的即可，无需加锁
+        self.entries[task.id] = (task, data)
+        return data
+
+
+class PrefixIndex:
+    """名称的前缀索引，用于自动补全
+
+    按 (前缀文本, 匹配类型, 对象键) 排序的数组，前缀查询为二分查找后的一段连续区间，
+    与字典树按字典序遍历子树的效果相同，但内存占用只有每个名称几个元组。
+    每个名称除整体外，还按词开头和拼音（可选）加入索引。更新时在复制的数组上逐个插入/删除。
+    """
+    __slots__ = (
+        'keys',     # 排序的 [(前缀文本, 匹配类型, 对象键), ...]
+        'entries',  # 对象键 -> (名称, 该对象的前缀文本列表)
+        'key',      # 对象键的属性名
+        'name',     # 名称的属性名
+    )
+    SCAN_FACTOR = 20
+
+    def __init__(self, objects = (), key = "id", name = "name"):
+        self.key = key
+        self.name = name
+        self.entries = {}
+        self.keys = []
+        for obj in objects:
+            self._add(obj, bulk=True)
+        self.keys.sort()
+
+    def evolve(self, updated = None, deleted_keys = ()):
+        """应用变化（对象键 -> 对象，删除的对象键），返回新索引，当前索引保持不变"""
+        index = object.__new__(PrefixIndex)
+        index.key = self.key
+        index.name = self.name
+        index.entries = dict(self.entries)
+        index.keys = list(self.keys)
+        for key in deleted_keys:
+            index._remove(key)
+        for key, obj in (updated or {}).items():
+            index._remove(key)
+            index._add(obj)
+        return index
+
+    def _add(self, obj, bulk = False):
+        key, name = getattr(obj, self.key), getattr(obj, self.name)
+        texts = prefix_keys(name)
+        if not texts:
+            return
+        self.entries[key] = (name, texts)
+        for text, kind in texts:
+            if bulk:
+                self.keys.append((text, kind, key))
+            else:
+                bisect.insort(self.keys, (text, kind, key))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for text, kind in entry[1]:
+            pos = bisect.bisect_left(self.keys, (text, kind, key))
+            if pos < len(self.keys) and self.keys[pos] == (text, kind, key):
+                del self.keys[pos]
+
+    def complete(self, prefix, limit = 10):
+        """以 prefix 开头的名称，返回 [((匹配类型, 名称长度, 名称), 对象键, 名称), ...]
+
+        整个名称匹配的排在词开头匹配之前，拼音匹配最后，同类中较短的名称在前。
+        前缀很短、匹配项很多时只检查字典序最前的 limit * SCAN_FACTOR 项。
+        """
+        prefix = normalize_name(prefix)
+        if not prefix or limit <= 0:
+            return []
+        best = {}
+        keys = self.keys
+        pos = bisect.bisect_left(keys, (prefix,))
+        end = min(len(keys), pos + limit * self.SCAN_FACTOR)
+        while pos < end and keys[pos][0].startswith(prefix):
+            _, kind, key = keys[pos]
+            name = self.entries[key][0]
+            rank = (kind, len(name), name)
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, key, name)
+            pos += 1
+        return heapq.nsmallest(limit, best.values())
+
+
+class TaskQuery:
+    """任务查询表达式：解析为条件后在快照上选择候选最少的索引执行，不必遍历全部任务
+
+    表达式由空格分隔的条件组成，全部条件同时满足；值中含空格时用引号括起来，条件前加 - 表示取反：
+      status:pending      状态 pending/completed/archived（或 0/1/2），逗号分隔表示任一
+      priority>=3         优先级，可用 : = > >= < <=，priority:1..3 为范围，也可写 none/low/medium/high
+      project:工作        项目名称或ID，逗号分隔表示任一
+      tag:a,b / tag:a+b   包含任一标签 / 同时包含这些标签，多个 tag 条件同时满足
+      due<today           截止时间，值为日期（2025-06-01）、today/tomorrow/yesterday、+7d/-3d 或 now，
+                          due:2025-06-01..2025-06-30 为日期范围（含两端），due:none/any 为没有/有截止时间
+      start:today         开始时间，写法同 due
+      text:周报 或 周报    全文检索标题、内容和检查项，所有词都要命中
+    排序字段为 due/start/priority/status/title/created/modified/score（相关度，高的在前），
+    前加 - 为降序，逗号分隔多个字段；没有截止时间等空值总是排在最后。
+    """
+    FIELDS = ('status', 'priority', 'project', 'tag', 'due', 'start', 'text')
+    STATUS = {'pending': 0, 'completed': 1, 'archived': 2, '待完成': 0, '已完成': 1, '已归档': 2}
+    PRIORITY = {'none': 0, 'low': 1, 'medium': 3, 'high': 5}
+    SORT_KEYS = {
+        'due': Task.due_time,
+        'start': Task.start_time,
+        'priority': lambda task: task.priority or 0,
+        'status': lambda task: task.status or 0,
+        'title': lambda task: task.title or '',
+        'created': lambda task: task.createdTime,
+        'modified': lambda task: task.modifiedTime,
+    }
+    # 最小的索引候选数不超过任务数的这一比例时使用索引，否则（安装了 numpy 时）在列式副本上向量化扫描
+    INDEX_RATIO = 0.125
+    _TERM_RE = re.compile(r"(-?)([A-Za-z]+)(>=|<=|:|=|>|<)(.*)", re.S)
+    _RELATIVE_DAY_RE = re.compile(r"([+-]\d+)d")
+
+    def __init__(self, expression, now = None):
+        self.now = time.time() if now is None else now
+        self.conditions = []    # [(字段, 是否取反, 值), ...]
+        try:
+            parts = shlex.split(expression or "")
+        except ValueError as e:
+            raise ValueError(f"查询表达式格式错误: {e}")
+        words = []
+        for part in parts:
+            match = self._TERM_RE.fullmatch(part)
+            if match is None or match.group(2).lower() not in self.FIELDS:
+                words.append(part)
+                continue
+            negate, field, op, value = match.groups()
+            field = field.lower()
+            if not value:
+                raise ValueError(f"条件缺少值: {part}")
+            if op not in (":", "=") and field not in ("priority", "due", "start"):
+                raise ValueError(f"{field} 不支持比较运算: {part}")
+            if field == "text" and not negate:
+                words.append(value)
+            else:
+                self.conditions.append((field, bool(negate), getattr(self, "_parse_" + field, self._parse_value)(op, value)))
+        if words:
+            self.conditions.append(("text", False, " ".join(words)))
+
+    @staticmethod
+    def _parse_value(op, value):
+        return value
+
+    def _parse_status(self, op, value):
+        statuses = set()
+        for item in value.split(","):
+            item = item.strip().lower()
+            if item in self.STATUS:
+                statuses.add(self.STATUS[item])
+            elif item.lstrip("-").isdigit():
+                statuses.add(int(item))
+            else:
+                raise ValueError(f"未知的状态: {item}，可选 pending/completed/archived")
+        return statuses
+
+    def _priority(self, value):
+        value = value.strip().lower()
+        if value in self.PRIORITY:
+            return self.PRIORITY[value]
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"未知的优先级: {value}，可用 0-5 或 none/low/medium/high")
+
+    def _parse_priority(self, op, value):
+        """优先级条件转换为闭区间 (下限, 上限)"""
+        if ".." in value:
+            if op not in (":", "="):
+                raise ValueError(f"优先级范围不能与比较运算同时使用: {value}")
+            low, high = value.split("..", 1)
+            return self._priority(low), self._priority(high)
+        value = self._priority(value)
+        return {":": (value, value), "=": (value, value), ">": (value + 1, 99), ">=": (value, 99),
+                "<": (-99, value - 1), "<=": (-99, value)}[op]
+
+    def _parse_project(self, op, value):
+        return [item.strip() for item in value.split(",") if item.strip()]
+
+    def _parse_tag(self, op, value):
+        """("all", 标签) 表示同时包含，("any", 标签) 表示包含任一"""
+        if "+" in value:
+            return "all", tuple(item.strip() for item in value.split("+") if item.strip())
+        return "any", tuple(item.strip() for item in value.split(",") if item.strip())
+
+    def _day(self, value):
+        """日期值对应的 [开始, 结束) 时间戳"""
+        value = value.strip().lower()
+        if value == "now":
+            return self.now, self.now
+        today = date.fromtimestamp(self.now)
+        offsets = {"today": 0, "tomorrow": 1, "yesterday": -1}
+        match = self._RELATIVE_DAY_RE.fullmatch(value)
+        if value in offsets or match:
+            days = offsets[value] if value in offsets else int(match.group(1))
+            return day_range(today + timedelta(days=days))
+        try:
+            return day_range(parser.parse(value).date())
+        except (ValueError, OverflowError):
+            raise ValueError(f"无法识别的日期: {value}")
+
+    def _parse_due(self, op, value):
+        """时间条件转换为 [下限, 上限) 时间戳，none 转换为 None（没有该时间）"""
+        lowered = value.strip().lower()
+        if lowered in ("none", "any"):
+            if op not in (":", "="):
+                raise ValueError(f"{value} 不能与比较运算同时使用")
+            return None if lowered == "none" else (float("-inf"), float("inf"))
+        if ".." in value:
+            if op not in (":", "="):
+                raise ValueError(f"日期范围不能与比较运算同时使用: {value}")
+            first, last = value.split("..", 1)
+            return self._day(first)[0], self._day(last)[1]
+        start, end = self._day(value)
+        return {":": (start, end), "=": (start, end), "<": (float("-inf"), start), "<=": (float("-inf"), end),
+                ">": (end, float("inf")), ">=": (start, float("inf"))}[op]
+
+    _parse_start = _parse_due
+
+    def _resolve_projects(self, snapshot, names):
+        project_ids = set()
+        for name in names:
+            project = snapshot.projects_by_id.get(name) or snapshot.projects_by_name.get(name)
+            if project is None:
+                raise ValueError(f"未找到项目: {name}")
+            project_ids.add(project.id)
+        return project_ids
+
+    def _predicate(self, field, value, matches):
+        """条件对应的判断函数"""
+        if field == "status":
+            return lambda task: (task.status or 0) in value
+        if field == "priority":
+            low, high = value
+            return lambda task: low <= (task.priority or 0) <= high
+        if field == "project":
+            return lambda task: task.projectId in value
+        if field == "tag":
+            mode, tags = value
+            tags = set(tags)
+            if mode == "all":
+                return lambda task: tags.issubset(task.tags or ())
+            return lambda task: not tags.isdisjoint(task.tags or ())
+        if field == "text":
+            return lambda task: task.id in matches
+        get_time = Task.due_time if field == "due" else Task.start_time
+        if value is None:
+            return lambda task: get_time(task) is None
+        low, high = value
+        return lambda task: (ts := get_time(task)) is not None and low <= ts < high
+
+    @staticmethod
+    def _mask(columns, field, value):
+        """条件对应的行掩码（布尔数组），全文检索条件返回 None"""
+        if field == "status":
+            return np.isin(columns.status, list(value))
+        if field == "priority":
+            low, high = value
+            return (columns.priority >= low) & (columns.priority <= high)
+        if field == "project":
+            masks = [columns.in_project(project_id) for project_id in value]
+            return np.logical_or.reduce(masks) if masks else np.zeros(len(columns.tasks), dtype=bool)
+        if field == "tag":
+            mode, tags = value
+            masks = [columns.has_tag(tag) for tag in tags]
+            if not masks:
+                return np.ones(len(columns.tasks), dtype=bool)
+            return (np.logical_and if mode == "all" else np.logical_or).reduce(masks)
+        if field in ("due", "start"):
+            times = columns.due if field == "due" else columns.start
+            if value is None:
+                return np.isnan(times)
+            low, high = value
+            return (times >= low) & (times < high)     # NaN 比较结果为 False
+        return None
+
+    @staticmethod
+    def _index_option(snapshot, field, value, matches):
+        """条件可以使用的索引：(候选数, 说明, 取得候选任务的函数)，没有可用索引时返回 None"""
+        if field == "project":
+            buckets = [snapshot.tasks_by_project.get(project_id, {}) for project_id in value]
+            return (sum(map(len, buckets)), "项目索引",
+                    lambda: [task for bucket in buckets for task in bucket.values()])
+        if field == "tag":
+            mode, tags = value
+            buckets = [snapshot.tasks_by_tag.get(tag, {}) for tag in tags]
+            if not buckets:
+                return None
+            if mode == "all":
+                smallest = min(buckets, key=len)
+                return len(smallest), "标签索引", lambda: list(smallest.values())
+            return (sum(map(len, buckets)), "标签索引",
+                    lambda: list({task.id: task for bucket in buckets for task in bucket.values()}.values()))
+        if field in ("due", "start") and value is not None:
+            index = snapshot.due_index if field == "due" else snapshot.start_index
+            low = bisect.bisect_left(index, (value[0],))
+            high = bisect.bisect_left(index, (value[1],))
+            name = "截止时间索引" if field == "due" else "开始时间索引"
+            return max(high - low, 0), name, lambda: [snapshot.tasks_by_id[task_id] for _, task_id in index[low:high]]
+        if field == "text":
+            return len(matches), "全文索引", lambda: [snapshot.tasks_by_id[task_id] for task_id in matches]
+        return None
+
+    def run(self, snapshot, sort = None, limit = None):
+        """在快照上执行查询，返回 (任务列表, 符合条件的总数, 执行计划说明, {任务ID: 全文检索得分})"""
+        conditions, scores = [], None
+        for field, negate, value in self.conditions:
+            matches = None
+            if field == "project":
+                value = self._resolve_projects(snapshot, value)
+            elif field == "text":
+                matches = snapshot.text_index.match_all(value)
+                if not negate:
+                    # 多个全文检索条件时取交集，得分相加
+                    scores = matches if scores is None else {
+                        task_id: score + matches[task_id] for task_id, score in scores.items() if task_id in matches}
+            conditions.append((field, negate, value, matches))
+
+        # 选择候选最少的索引；取反的条件不能使用索引
+        options = [option for field, negate, value, matches in conditions if not negate
+                   for option in [self._index_option(snapshot, field, value, matches)] if option]
+        best = min(options, key=lambda option: option[0]) if options else None
+        predicates = []
+        for field, negate, value, matches in conditions:
+            predicate = self._predicate(field, value, scores if field == "text" and not negate else matches)
+            predicates.append((lambda task, predicate=predicate: not predicate(task)) if negate else predicate)
+
+        columns = snapshot.columns
+        if best is not None and (columns is None or best[0] <= len(snapshot.tasks) * self.INDEX_RATIO):
+            size, name, fetch = best
+            plan = f"{name}（候选 {size} 个）"
+            tasks = [task for task in fetch() if all(predicate(task) for predicate in predicates)]
+        elif columns is not None:
+            plan = "列式向量化扫描"
+            mask = columns.alive.copy()
+            rest = []
+            for (field, negate, value, _), predicate in zip(conditions, predicates):
+                condition_mask = self._mask(columns, field, value)
+                if condition_mask is None:
+                    rest.append(predicate)
+                else:
+                    mask &= ~condition_mask if negate else condition_mask
+            tasks = [task for task in columns.rows_to_tasks(np.flatnonzero(mask))
+                     if all(predicate(task) for predicate in rest)]
+        else:
+            plan = "全量扫描"
+            tasks = [task for task in snapshot.tasks if all(predicate(task) for predicate in predicates)]
+
+        self._sort(tasks, sort or ("score" if scores is not None else "due"), scores or {})
+        total = len(tasks)
+        if limit is not None:
+            tasks = tasks[:max(limit, 0)]
+        return tasks, total, plan, scores or {}
+
+    def _sort(self, tasks, sort, scores):
+        keys = []
+        for item in sort.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            descending = item.startswith("-")
+            name = item.lstrip("-").lower()
+            if name == "score":
+                get = lambda task: -scores.get(task.id, 0.0)
+            elif name in self.SORT_KEYS:
+                get = self.SORT_KEYS[name]
+            else:
+                raise ValueError(f"不支持的排序字段: {name}，可选 {'/'.join(list(self.SORT_KEYS) + ['score'])}")
+            keys.append((get, descending))
+        tasks.sort(key=lambda task: task.id)
+        # 从次要字段到主要字段依次稳定排序；空值在升序和降序时都排在最后
+        for get, descending in reversed(keys):
+            if descending:
+                tasks.sort(key=lambda task: ((value := get(task)) is not None, value), reverse=True)
+            else:
+                tasks.sort(key=lambda task: ((value := get(task)) is None, value))
+
+
+class ResultCursors:
+    """分页游标
+
+    第一页时把完整的结果列表（当时快照中的 Task）保存下来，后续各页都从这份列表中截取，
+    翻页期间同步到的新版本不会使结果重复或遗漏。游标为 "<编号>.<偏移>"，编号是随机字符串。
+    最多保留 max_size 份结果（按最近使用淘汰），超过 ttl 秒未使用的失效。
+    """
+
+    def __init__(self, max_size = 32, ttl = 600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._results = OrderedDict()   # 编号 -> [查询键, 快照版本, 结果元组, 最近使用时间]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def page(self, key, snapshot, fetch, limit, cursor = None):
+        """取得一页结果，返回 (本页任务列表, 总数, 下一页游标（没有下一页时为 None）, 快照版本)
+
+        key 标识查询（如工具名和参数）；cursor 为空时调用 fetch(snapshot) 取得完整结果并返回第一页。
+        游标格式错误、已失效或不属于该查询时抛出 ValueError。
+        """
+        now = time.monotonic()
+        with self._lock:
+            for cursor_id, entry in list(self._results.items()):
+                if now - entry[3] > self.ttl:
+                    del self._results[cursor_id]
+        if cursor:
+            try:
+                cursor_id, offset = cursor.rsplit(".", 1)
+                offset = int(offset)
+            except ValueError:
+                raise ValueError(f"无效的游标: {cursor}")
+            with self._lock:
+                entry = self._results.get(cursor_id)
+                if entry is not None:
+                    entry[3] = now
+                    self._results.move_to_end(cursor_id)
+            if entry is None:
+                raise ValueError("游标已失效，请不带 cursor 重新查询第一页")
+            if entry[0] != key:
+                raise ValueError("游标不属于这个查询")
+            _, version, results, _ = entry
+        else:
+            cursor_id, offset = secrets.token_urlsafe(9), 0
+            version, results = snapshot.version, tuple(fetch(snapshot))
+            if len(results) > limit:
+                with self._lock:
+                    self._results[cursor_id] = [key, version, results, now]
+                    while len(self._results) > self.max_size:
+                        self._results.popitem(last=False)
+        offset = max(offset, 0)
+        end = offset + limit
+        next_cursor = f"{cursor_id}.{end}" if end < len(results) else None
+        return list(results[offset:end]), len(results), next_cursor, version
+
+
+class DataNotLoadedError(RuntimeError):
+    """从未同步成功过（本地没有任何数据）时，读取操作等待首次同步超时或失败"""
 
-    def to_dict(self):
-        # 返回一个字典，过滤掉值为 None 的属性
-        return {key: value for key, value in self.__dict__.items() if value is not None}
 
 class User:
+    # 查询 SQLite 副本时是否等待正在进行的写入（AsyncUser 在事件循环中查询，不等待而是回退到内存索引）
+    _replica_blocking = True
 
-    def __init__(self,token = ""):
+    def __init__(self,token = "", incremental_sync = True, cache_ttl = 30,
+                 session = None, timeout = DEFAULT_TIMEOUT, base_url = BASE_URL, write_through = True,
+                 coalesce_window = 0, max_stale = 0, replica = None):
         # 初始化方法，构造函数
         # 参数token默认为空字符串，用于存储用户的token信息
         self.token = token
+        # HTTP 会话：默认使用进程内共享的连接池，避免每次请求都重新建立 TCP+TLS 连接
+        self.session = session if session is not None else get_shared_session()
+        # 请求超时时间，可以是秒数或 (连接超时, 读取超时)
+        self.timeout = timeout
+        self.base_url = base_url
+        # 是否开启增量同步：开启后 get_info_about 只拉取上次 checkPoint 之后的变更
+        self.incremental_sync = incremental_sync
+        # 服务器返回的同步检查点，0 表示尚未同步（需要全量拉取）
+        self.checkpoint = 0
+        # 本地快照的新鲜度（秒）：在此时间内 refresh() 直接使用内存数据，不再请求服务器
+        self.cache_ttl = cache_ttl
+        # 最近一次同步成功的时间（time.monotonic），None 表示缓存无效
+        self.synced_at = None
+        # 最近一次同步成功的时间，invalidate() 不会清除，用于计算数据年龄
+        self.last_synced_at = None
+        # 过期后仍可直接返回的最长数据年龄（秒）：serve() 在此范围内返回内存数据并在后台刷新，0 表示不启用
+        self.max_stale = max_stale
+        # 写穿模式：任务写操作成功后直接把结果应用到本地模型，不再重新同步
+        self.write_through = write_through
+        # 收件箱项目ID，新建任务未指定项目时归入收件箱
+        self.inbox_id = None
+        # 写操作合并窗口（秒）：大于 0 时 add_task/modify_task/remove_task 先进入队列，
+        # 窗口结束后与其他排队的操作合并为一次请求；为 0 时立即发送
+        self.coalesce_window = coalesce_window
+        self._write_queue = TaskWriteQueue()
+        self._flush_timer = None
+        self._flush_lock = threading.Lock()
         # 定义请求头的一部分，包含多个HTTP头部字段
         self.headers_part = {
             "authority": "api.dida365.com",  # 请求的目标服务器
@@ -190,9 +2054,26 @@ class User:
         self.username = ""
         
         
-        self.tasks = []
-        self.tags = []
-        self.projects = []
+        # 当前发布的只读快照（任务、项目、标签及查找索引），同步和写操作通过整体替换来更新
+        self._snapshot = Snapshot()
+        # 发布锁：“读取当前快照 → 构建新快照 → 发布 → 更新检查点”在锁内完成，
+        # 后台同步和写穿同时发布时各自基于锁内的最新快照构建，不会互相覆盖
+        self._model_lock = threading.RLock()
+        # 可选的 SQLite 副本（TaskReplica），每次发布快照后在后台更新，筛选查询在副本跟上当前快照时优先在副本中执行
+        self.replica = replica
+        # 分页游标：翻页时固定在第一页所用的快照版本
+        self.cursors = ResultCursors()
+
+        # 同步去重：同一时刻只向服务器发起一次同步，其余调用等待并共享它的结果
+        self._sync_lock = threading.Lock()
+        self._sync_flight = None      # 进行中的同步 (future, full, generation)
+        self._sync_generation = 0     # 每次 invalidate() 加一，失效之前发起的同步不再被复用
+        self.syncs_upstream = 0       # 实际发往服务器的同步次数
+        self.syncs_saved = 0          # 因复用进行中的同步而省下的次数
+        # 每次 update_token() 加一：同步发出后账号被切换时，返回的旧账号数据和检查点不再应用
+        self._token_epoch = 0
+        # 每次写穿或丢弃检查点时加一：在此之前发出的同步返回的是写入前的数据，不再应用
+        self._write_generation = 0
 
     def sign_with_phone(self,phone_number,password):
         pass
@@ -210,26 +2091,166 @@ class User:
         }) 
     
     def update_token(self,token):
-        self.token = token
-        self.build_headers()
+        with self._model_lock:
+            self._token_epoch += 1
+            self.token = token
+            self.build_headers()
+            # 切换账号后旧的检查点失效，下次同步需要全量拉取
+            self.checkpoint = 0
+        self.invalidate()
+
+    @property
+    def snapshot(self):
+        """当前快照，多步读取时先取得快照再使用，保证看到同一版本的数据"""
+        return self._snapshot
+
+    @property
+    def version(self):
+        """当前快照的版本号"""
+        return self._snapshot.version
+
+    @property
+    def tasks(self):
+        return self._snapshot.tasks
+
+    @property
+    def projects(self):
+        return self._snapshot.projects
+
+    @property
+    def tags(self):
+        return self._snapshot.tags
+
+    def _publish(self, **changes):
+        """基于当前快照构建新快照并发布（一次引用赋值）"""
+        with self._model_lock:
+            previous = self._snapshot
+            self._install(previous.evolve(previous.version + 1, **changes), previous, changes)
+
+    def _install(self, snapshot, previous = None, changes = None):
+        """发布快照并把变化交给 SQLite 副本在后台写入，previous 为 None 时副本全量重建"""
+        self._snapshot = snapshot
+        if self.replica is not None:
+            self.replica.submit(previous, snapshot, **(changes or {}))
+
+    def is_fresh(self):
+        """本地快照是否仍在有效期内"""
+        if self.synced_at is None:
+            return False
+        return time.monotonic() - self.synced_at < self.cache_ttl
+
+    def invalidate(self, full = False):
+        """使本地快照失效，下次 refresh() 时重新同步
+
+        full=True 时同时丢弃检查点，下次同步拉取全量数据（用于本地模型可能已不一致的情况）。
+        """
+        self.synced_at = None
+        self._sync_generation += 1
+        if full:
+            with self._model_lock:
+                self._write_generation += 1
+                self.checkpoint = 0
+
+    def refresh(self, force = False):
+        """按需同步：快照过期、已失效或 force=True 时才请求服务器
+
+        返回 True 表示本地数据可用（命中缓存或同步成功）。
+        """
+        if not force and self.is_fresh():
+            return True
+        return self.get_info_about() is not None
+
+    def export_state(self):
+        """导出可持久化的状态：快照数据、同步检查点和用户信息
+
+        只读取已发布的快照，可以在其他线程中调用。先读检查点再读快照，
+        保证检查点不会比快照新（恢复后最多重复应用一些增量，不会遗漏）。
+        """
+        checkpoint = self.checkpoint
+        snapshot = self._snapshot
+        age = self.data_age()
+        return {
+            "checkpoint": checkpoint,
+            "inbox_id": self.inbox_id,
+            "synced_at": time.time() - (age or 0),
+            "user": {"name": self.name, "email": self.email, "phone": self.phone, "username": self.username},
+            "tasks": [i.to_dict() for i in snapshot.tasks],
+            "projects": [i.to_dict() for i in snapshot.projects],
+            "tags": [i.to_dict() for i in snapshot.tags],
+        }
+
+    def import_state(self, state):
+        """从 export_state 的结果恢复本地模型，数据年龄按保存时的同步时间计算"""
+        tasks = [Task(i) for i in state["tasks"]]
+        projects = [Project(i) for i in state["projects"]]
+        tags = [Tag(i) for i in state["tags"]]
+        with self._model_lock:
+            self._install(Snapshot(self._snapshot.version + 1, tasks, projects, tags))
+            self.checkpoint = state["checkpoint"]
+        self.inbox_id = state.get("inbox_id") or self.inbox_id
+        for key, value in (state.get("user") or {}).items():
+            setattr(self, key, value)
+        age = max(0, time.time() - state["synced_at"])
+        self.synced_at = self.last_synced_at = time.monotonic() - age
+
+    def revalidate(self):
+        """在后台发起一次增量同步（或复用进行中的同步），不等待结果"""
+        return self._start_sync()
+
+    def data_age(self):
+        """当前快照距上次同步成功的秒数，从未同步过时返回 None"""
+        if self.last_synced_at is None:
+            return None
+        return time.monotonic() - self.last_synced_at
+
+    def _can_serve_stale(self, force):
+        # 只有自然过期的数据可以先返回再刷新；被 invalidate() 的数据（如写操作之后）必须等待同步
+        return (not force and self.synced_at is not None and self.max_stale > 0
+                and self.data_age() < self.max_stale)
+
+    def serve(self, force = False, deadline = None):
+        """读取类操作的刷新策略（stale-while-revalidate）
+
+        数据在有效期内直接使用；过期但未超过 max_stale 时直接使用并在后台刷新；
+        否则等待同步，最多等待 deadline 秒，超时或同步失败时继续使用上一版快照。
+        返回 None 表示使用的是最新数据，否则返回所用数据的年龄（秒）；
+        从未同步成功过、没有上一版快照可用时抛出 DataNotLoadedError，不把空模型当作最新数据返回。
+        """
+        if not force and self.is_fresh():
+            return None
+        if self._can_serve_stale(force):
+            self._start_sync()
+            return self.data_age()
+        try:
+            ok = self._start_sync().result(timeout=deadline) is not None
+        except concurrent.futures.TimeoutError:
+            logging.warning(f"同步超过 {deadline} 秒未完成，返回上一版数据")
+            ok = False
+        return None if ok else self._stale_age()
+
+    def _stale_age(self):
+        """同步未完成时所用上一版数据的年龄，没有上一版数据时抛出 DataNotLoadedError"""
+        age = self.data_age()
+        if age is None:
+            raise DataNotLoadedError("数据尚未加载：首次同步失败或未在限定时间内完成，请稍后重试")
+        return age
     
-    def get_user_info(self):
-        url = "https://api.dida365.com/api/v2/user/profile"
+    def _request(self, method, url, **kwargs):
+        """发送 HTTP 请求，网络异常时记录日志并返回 None"""
         try:
-            response = requests.request("GET", url, headers = self.headers, data={})
+            return self.session.request(method, url, headers=self.headers, timeout=self.timeout, **kwargs)
         except requests.exceptions.RequestException as e:
             logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
             return None
 
-        data = json.loads(response.text)
+    def get_user_info(self):
+        response = self._request("GET", f"{self.base_url}/api/v2/user/profile")
+        if response is None:
+            return None
+        return self._load_user_info(json.loads(response.text))
+
+    def _load_user_info(self, data):
+        """解析用户信息接口的返回值"""
         if data.get("errorCode", None) == "user_not_sign_on":
             logging.error("用户未登录")
             return None
@@ -241,43 +2262,333 @@ class User:
             self.username = data.get("username", "")
             return data
         
-    def get_info_about(self):
-        url = "https://api.dida365.com/api/v2/batch/check/0"
-        try:
-            response = requests.request("GET", url, headers = self.headers, data={})
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
+    def get_info_about(self, full = False):
+        """同步任务、项目、标签信息
+
+        开启增量同步且已有检查点时，只请求该检查点之后的变更并合并到本地模型；
+        首次同步或 full=True 时拉取全量数据并重建模型。
+        已有同步在进行时（且发起后本地快照没有失效过）直接等待并返回它的结果，不重复请求。
+        """
+        with self._sync_lock:
+            flight = self._join_sync(full)
+            if flight is None:
+                flight = concurrent.futures.Future()
+                self._sync_flight = (flight, full, self._sync_generation)
+                leader = True
             else:
-                logging.error("未获取到响应对象")
+                leader = False
+        if leader:
+            self._run_sync(flight, full)
+        return flight.result()
+
+    def _start_sync(self, full = False):
+        """发起（或复用进行中的）同步并立即返回 Future，同步在后台线程中执行"""
+        with self._sync_lock:
+            flight = self._join_sync(full)
+            if flight is not None:
+                return flight
+            flight = concurrent.futures.Future()
+            self._sync_flight = (flight, full, self._sync_generation)
+        threading.Thread(target=self._run_sync, args=(flight, full), daemon=True).start()
+        return flight
+
+    def _run_sync(self, flight, full):
+        try:
+            flight.set_result(self._sync_once(full))
+        except BaseException as e:
+            flight.set_exception(e)
+        finally:
+            self._end_sync(flight)
+
+    def _join_sync(self, full):
+        """可以复用的进行中同步，没有时返回 None"""
+        if self._sync_flight is None:
             return None
-        
-        data = json.loads(response.text)
-        
-        # 清空现有数据，避免重复
-        self.tags = []
-        self.projects = []
-        self.tasks = []
+        flight, flight_full, generation = self._sync_flight
+        # 全量同步可以满足增量请求，反之不行
+        if generation != self._sync_generation or (full and not flight_full):
+            return None
+        self.syncs_saved += 1
+        return flight
 
-        # Tag
-        for i in data.get("tags",[]):
-            if i != []:
-                self.tags.append(Tag(i))
-        # Project
-        for i in data.get("projectProfiles",[]):
-            if i != []:
-                self.projects.append(Project(i))
-        # Task
-        for i in data.get("syncTaskBean",{}).get("update",[]):
-            if i != []:
-                self.tasks.append(Task(i))
+    def _end_sync(self, flight):
+        if self._sync_flight is not None and self._sync_flight[0] is flight:
+            self._sync_flight = None
+
+    def sync_stats(self):
+        """同步去重统计"""
+        return {"upstream": self.syncs_upstream, "saved": self.syncs_saved}
+
+    def _sync_once(self, full = False):
+        """向服务器发起一次同步，结果在请求期间过时时重新请求"""
+        for _ in range(SYNC_ATTEMPTS):
+            self.syncs_upstream += 1
+            base = self._sync_base()
+            checkpoint = self._sync_checkpoint(full)
+            response = self._request("GET", f"{self.base_url}/api/v2/batch/check/{checkpoint}")
+            data = self._parse_sync_result(response)
+            if data is None:
+                return None
+            if self._load_sync_data(checkpoint, data, base) is not None:
+                return data
+        return None
+
+    def _sync_base(self):
+        """发起同步时的本地状态标记，应用结果时不一致说明结果已过时（期间切换了账号、写穿了修改或丢弃了检查点）"""
+        return self._token_epoch, self._write_generation
+
+    def _parse_sync_result(self, response):
+        """解析 batch/check 的返回值
+
+        请求失败、状态码不是 200、无法解析或返回 errorCode（如 token 失效时的 user_not_sign_on）时返回 None，
+        此时不修改本地快照和检查点。
+        """
+        if response is None:
+            return None
+        if response.status_code != 200:
+            logging.error(f"同步失败，状态码: {response.status_code}, 响应: {response.text}")
+            return None
+        try:
+            data = json.loads(response.text)
+        except ValueError:
+            logging.error(f"同步失败，无法解析响应: {response.text[:200]}")
+            return None
+        if not isinstance(data, dict) or data.get("errorCode"):
+            logging.error(f"同步失败，服务器返回错误: {response.text[:200]}")
+            return None
         return data
 
+    def _sync_checkpoint(self, full = False):
+        """本次同步应携带的检查点，0 表示全量同步"""
+        return self.checkpoint if self.incremental_sync and not full else 0
+
+    def _load_sync_data(self, checkpoint, data, base = None):
+        """把 batch/check 的返回值合并到本地模型
+
+        base 为发起同步时 _sync_base() 的值，与当前不一致时（如期间切换了账号）丢弃结果并返回 None。
+        """
+        with self._model_lock:
+            if base is not None and base != self._sync_base():
+                logging.info("同步期间本地状态已变化，丢弃本次同步结果")
+                return None
+            if checkpoint == 0:
+                self._load_full(data)
+            else:
+                self._apply_delta(data)
+            # 记录新的检查点，供下次增量同步使用
+            self.checkpoint = data.get("checkPoint") or 0
+        self.inbox_id = data.get("inboxId") or self.inbox_id
+        self.synced_at = self.last_synced_at = time.monotonic()
+        return data
+
+    def _load_full(self, data):
+        """用全量同步结果构建新快照并发布"""
+        tags = [Tag(i) for i in data.get("tags") or [] if i != []]
+        projects = [Project(i) for i in data.get("projectProfiles") or [] if i != []]
+        tasks = [Task(i) for i in (data.get("syncTaskBean") or {}).get("update") or [] if i != []]
+        self._install(Snapshot(self._snapshot.version + 1, tasks, projects, tags))
+
+    def _apply_delta(self, data):
+        """把增量同步结果合并为新快照并发布
+
+        服务器只返回检查点之后变化的任务：syncTaskBean.update 中为新增或修改的任务，
+        syncTaskBean.delete 中为已删除的任务；项目和标签有变化时返回完整列表，否则为空。
+        """
+        changes = {}
+        # 项目和标签数量很少，有返回时直接整体替换
+        tags = data.get("tags")
+        if tags:
+            changes["tags"] = [Tag(i) for i in tags if i != []]
+        projects = data.get("projectProfiles")
+        if projects:
+            changes["projects"] = [Project(i) for i in projects if i != []]
+
+        bean = data.get("syncTaskBean") or {}
+        deleted_ids = set()
+        for i in bean.get("delete") or []:
+            if isinstance(i, dict):
+                deleted_ids.add(i.get("taskId"))
+            else:
+                deleted_ids.add(i)
+
+        updated = {}
+        for i in (bean.get("add") or []) + (bean.get("update") or []):
+            if i != []:
+                updated[i.get("id")] = Task(i)
+
+        if deleted_ids or updated:
+            logging.info(f"增量同步: 更新 {len(updated)} 个任务, 删除 {len(deleted_ids)} 个任务")
+            changes["updated"] = updated
+            changes["deleted_ids"] = deleted_ids
+        if changes:
+            self._publish(**changes)
+
+    def _merge_tasks(self, updated, deleted_ids):
+        """把写穿的新增/修改的任务（任务ID -> Task）和删除的任务ID合并为新快照并发布"""
+        with self._model_lock:
+            self._write_generation += 1
+            self._publish(updated=updated, deleted_ids=deleted_ids)
+
+    def tasks_in_project(self, project_id):
+        """获取指定项目中的所有任务"""
+        return self._snapshot.tasks_in_project(project_id)
+
+    def tasks_with_tag(self, tag_name):
+        """获取包含指定标签的所有任务"""
+        return self._snapshot.tasks_with_tag(tag_name)
+
+    # ========== 按日期查询（基于排序的日期索引，二分查找） ==========
+    def tasks_due_between(self, start, end):
+        """截止时间在 [start, end) 内的任务，start/end 为时间戳，按截止时间排序"""
+        return self._snapshot.tasks_due_between(start, end)
+
+    def tasks_starting_between(self, start, end):
+        """开始时间在 [start, end) 内的任务，按开始时间排序"""
+        return self._snapshot.tasks_starting_between(start, end)
+
+    def overdue_tasks(self, now = None):
+        """已过截止时间且未完成的任务"""
+        now = time.time() if now is None else now
+        return [task for task in self.tasks_due_between(float("-inf"), now) if (task.status or 0) == 0]
+
+    def today_tasks(self, day = None):
+        """开始时间或截止时间在某一天（默认今天）的任务"""
+        start, end = day_range(day)
+        snapshot = self._snapshot
+        tasks = {task.id: task for task in snapshot.tasks_starting_between(start, end)}
+        for task in snapshot.tasks_due_between(start, end):
+            tasks.setdefault(task.id, task)
+        return list(tasks.values())
+
+    def upcoming_tasks(self, days = 7, now = None):
+        """今后若干天内到期且未完成的任务，按截止时间排序"""
+        now = time.time() if now is None else now
+        return [task for task in self.tasks_due_between(now, now + days * 86400) if (task.status or 0) == 0]
+
+    def resolve_task_by_title(self, title, limit = 5):
+        """按标题查找任务，容忍轻微的拼写差异
+
+        返回 (任务, 置信度, 相似候选)：标题完全一致时置信度为 1；否则取明显最相近的任务，
+        无法确定时任务为 None。相似候选为 [(Task, 相似度), ...]，精确命中时为空列表。
+        返回的对象属于当前快照，只读。
+        """
+        snapshot = self._snapshot
+        same_title = snapshot.tasks_by_title.get(title)
+        exact = same_title[0] if same_title else None
+        matches = [] if exact else snapshot.match_tasks(title, limit)
+        task, confidence = pick_match(exact, matches)
+        return task, confidence, matches
+
+    def resolve_project_by_name(self, name, limit = 5):
+        """按名称查找项目，容忍轻微的拼写差异，返回值同 resolve_task_by_title"""
+        snapshot = self._snapshot
+        exact = snapshot.projects_by_name.get(name)
+        matches = [] if exact else snapshot.match_projects(name, limit)
+        project, confidence = pick_match(exact, matches)
+        return project, confidence, matches
+
+    def resolve_tag_by_name(self, name, limit = 5):
+        """按名称查找标签，容忍轻微的拼写差异，返回值同 resolve_task_by_title"""
+        snapshot = self._snapshot
+        exact = snapshot.tags_by_name.get(name)
+        matches = [] if exact else snapshot.match_tags(name, limit)
+        tag, confidence = pick_match(exact, matches)
+        return tag, confidence, matches
+
+    def task_statistics(self, now = None):
+        """任务统计，由随快照增量维护的累计值直接得出，不遍历任务
+
+        返回 {"total", "by_status", "by_priority", "by_project", "by_tag", "overdue"}，
+        by_project/by_tag 为 {项目ID/标签名: {状态: 任务数}}。
+        """
+        stats = self._snapshot.stats
+        return {
+            "total": stats.total,
+            "by_status": dict(stats.by_status),
+            "by_priority": dict(stats.by_priority),
+            "by_project": {key: dict(value) for key, value in stats.by_project.items()},
+            "by_tag": {key: dict(value) for key, value in stats.by_tag.items()},
+            "overdue": stats.overdue(now),
+        }
+
+    def autocomplete(self, prefix, kind = "all", limit = 10):
+        """按前缀补全项目名、标签名和任务标题，kind 为 all/project/tag/task
+
+        返回 [{"type", "id", "name"}, ...]：整个名称匹配的排在前面，同类中较短的名称在前，
+        排序相同时项目优先于标签，标签优先于任务。
+        """
+        snapshot = self._snapshot
+        sources = [("project", snapshot.project_prefix_index), ("tag", snapshot.tag_prefix_index),
+                   ("task", snapshot.task_prefix_index)]
+        results = []
+        for order, (name, index) in enumerate(sources):
+            if kind in ("all", name):
+                results.extend((rank, order, name, key, label) for rank, key, label in index.complete(prefix, limit))
+        return [{"type": name, "id": key, "name": label}
+                for _, _, name, key, label in heapq.nsmallest(limit, results, key=lambda i: i[:2])]
+
+    def search_tasks(self, query, limit = 20):
+        """全文检索任务标题、内容和检查项，返回按相关度排序的 [(Task, 得分, 片段), ...]"""
+        snapshot = self._snapshot
+        terms = list(dict.fromkeys(tokenize(query)))
+        return [(task, score, text_snippet(task, terms)) for task, score in snapshot.search(query, limit)]
+
+    def query_tasks(self, project_id = None, tag = None, status = None, min_priority = None, due_before = None,
+                    snapshot = None):
+        """按条件筛选任务，返回 Task 列表
+
+        SQLite 副本与当前快照版本一致时在副本中通过索引查询（AsyncUser 遇到副本正在写入时不等待）；
+        否则安装了 numpy 时在列式副本上向量化筛选，再否则使用快照的内存索引。
+        指定 due_before 时只返回截止时间早于该时间戳的任务并按截止时间排序，否则保持任务列表中的顺序。
+        snapshot 指定在哪个快照上查询，默认为当前快照。
+        """
+        snapshot = self._snapshot if snapshot is None else snapshot
+        replica = self.replica
+        if replica is not None and replica.version == snapshot.version:
+            # 版本在副本的锁内再确认一次：写线程可能恰好提交了更新的版本
+            task_ids = replica.query_task_ids(project_id, tag, status, min_priority, due_before,
+                                              version=snapshot.version, blocking=self._replica_blocking)
+            if task_ids is not None:
+                tasks_by_id = snapshot.tasks_by_id
+                return [tasks_by_id[task_id] for task_id in task_ids]
+        columns = snapshot.columns
+        if columns is not None:
+            return columns.select(project_id, tag, status, min_priority, due_before)
+        if due_before is not None:
+            tasks = snapshot.tasks_due_between(float("-inf"), due_before)
+        elif project_id is not None:
+            # 索引桶中修改过的任务排在最后，按任务列表的顺序重新排列，与副本和列式副本的结果一致
+            tasks = snapshot.positions.sort(snapshot.tasks_in_project(project_id))
+        elif tag is not None:
+            tasks = snapshot.positions.sort(snapshot.tasks_with_tag(tag))
+        else:
+            tasks = snapshot.tasks
+        return [task for task in tasks
+                if (project_id is None or task.projectId == project_id)
+                and (tag is None or tag in (task.tags or ()))
+                and (status is None or (task.status or 0) == status)
+                and (min_priority is None or (task.priority or 0) >= min_priority)]
+
+    def paginate(self, key, fetch, limit, cursor = None):
+        """分页取得结果，返回 (本页任务列表, 总数, 下一页游标, 快照版本)，详见 ResultCursors.page
+
+        fetch(snapshot) 返回完整的结果列表，只在取第一页时在当前快照上调用一次。
+        """
+        return self.cursors.page(key, self._snapshot, fetch, max(limit, 1), cursor)
+
+    def find_tasks(self, expression, sort = None, limit = None):
+        """按查询表达式（写法见 TaskQuery）查找任务
+
+        返回 (任务列表, 符合条件的总数, 执行计划说明, {任务ID: 全文检索得分})，表达式有误时抛出 ValueError。
+        """
+        return TaskQuery(expression).run(self._snapshot, sort, limit)
+
+    def enriched_tasks(self, tasks = None):
+        """附加了项目名称和标签详情的任务字典列表（默认全部任务），字典来自快照的物化视图，只读"""
+        snapshot = self._snapshot
+        view = snapshot.enriched_view
+        return [view.get(task) for task in (snapshot.tasks if tasks is None else tasks)]
+
     def tool_get_task_info(self,id = None):
         if id is None:
             res = []
@@ -285,10 +2596,8 @@ class User:
                 res.append(i.to_dict())
             return res
         else:
-            for i in self.tasks:
-                if i.id == id:
-                    return i.to_dict()
-            return None
+            task = self._snapshot.tasks_by_id.get(id)
+            return task.to_dict() if task else None
 
     def tool_get_project_info(self,id = None):
         if id is None:
@@ -297,10 +2606,8 @@ class User:
                 res.append(i.to_dict())
             return res
         else:
-            for i in self.projects:
-                if i.id == id:
-                    return i.to_dict()
-            return None
+            project = self._snapshot.projects_by_id.get(id)
+            return project.to_dict() if project else None
         
     def tool_get_tag_info(self,name = None):
         if name is None:
@@ -309,384 +2616,245 @@ class User:
                 res.append(i.to_dict())
             return res
         else:
-            for i in self.tags:
-                if i.name == name:
-                    return i.to_dict()
+            tag = self._snapshot.tags_by_name.get(name)
+            return tag.to_dict() if tag else None
                 
     def tool_get_all_info(self):
+        snapshot = self._snapshot
         return {
-            "tags": self.tool_get_tag_info(),
-            "projects": self.tool_get_project_info(),
-            "tasks": self.tool_get_task_info()
+            "tags": [i.to_dict() for i in snapshot.tags],
+            "projects": [i.to_dict() for i in snapshot.projects],
+            "tasks": [i.to_dict() for i in snapshot.tasks]
         }
         
-    def add_task(self,task):
-        task = task.to_dict()
-        payload = {
-            "add": [task],
-            "update": [],
-            "delete": [],
-            "addAttachments": [],
-            "updateAttachments": [],
-            "deleteAttachments": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/task"
+    def _post_task_batch(self, payload):
+        """提交任务批量操作（/batch/task），并把结果应用到本地模型"""
+        response = self._request("POST", f"{self.base_url}/api/v2/batch/task", json=payload)
+        return self._after_task_batch(payload, response)
+
+    def _parse_batch_result(self, response):
+        """解析 /batch/task 的返回值，请求失败或无法解析时返回 None"""
+        if response is None or response.status_code != 200:
+            return None
         try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
+            result = json.loads(response.text)
+        except ValueError:
+            return None
+        return result if isinstance(result, dict) else None
+
+    def _after_task_batch(self, payload, response):
+        """处理 /batch/task 的返回值
+
+        写穿模式下，服务器返回的 id2etag 覆盖了所有提交的任务且 id2error 为空时，
+        直接把新增、修改、删除应用到本地模型，快照保持有效；
+        出现错误或结果无法确认时（包括网络异常，写入可能已经生效）使快照失效，下次读取时全量同步。
+        本地模型只在服务器确认之后更新，不会提前应用未确认的修改。
+        """
+        if response is None:
+            self.invalidate(full=True)
             return None
-        self.get_info_about()
+        if response.status_code != 200:
+            logging.error(f"任务批量操作失败，状态码: {response.status_code}, 响应: {response.text}")
+            self.invalidate(full=True)
+            return False
+        if not self.write_through:
+            self.invalidate()
+            return True
+        result = self._parse_batch_result(response)
+        if result is None:
+            self.invalidate(full=True)
+            return True
+        id2error = result.get("id2error") or {}
+        if id2error:
+            logging.error(f"任务批量操作部分失败: {id2error}")
+            self.invalidate(full=True)
+            return False
+        if not self._apply_task_batch(payload, result.get("id2etag") or {}):
+            self.invalidate(full=True)
         return True
+
+    def _apply_task_batch(self, payload, id2etag):
+        """把成功的任务批量操作写回本地模型，无法确认结果时返回 False"""
+        if payload.get("addAttachments") or payload.get("updateAttachments") or payload.get("deleteAttachments"):
+            return False
+        # 以锁内的当前快照为基础合并，避免覆盖同时发布的同步结果
+        with self._model_lock:
+            updated = {}
+            for item in payload.get("add", []) + payload.get("update", []):
+                task_id = item.get("id")
+                if task_id not in id2etag:
+                    return False
+                # 更新数据可能只包含部分字段，以本地已有的任务为基础合并
+                existing = self._snapshot.tasks_by_id.get(task_id)
+                task_data = existing.to_dict() if existing else {}
+                task_data.update(item)
+                task_data["etag"] = id2etag[task_id]
+                if not task_data.get("projectId") and self.inbox_id:
+                    task_data["projectId"] = self.inbox_id
+                updated[task_id] = Task(task_data)
+            deleted_ids = {item.get("taskId") for item in payload.get("delete", [])}
+            self._merge_tasks(updated, deleted_ids)
+        logging.info(f"写穿: 本地应用 {len(updated)} 个更新, {len(deleted_ids)} 个删除")
+        return True
+
+    # ========== 写操作合并 ==========
+    def queue_add(self, task):
+        """把新增任务放入合并队列，返回 concurrent.futures.Future，结果为 True/False"""
+        return self._queue_write("add", new_task_items([task])[0])
+
+    def queue_update(self, task):
+        """把修改任务放入合并队列，同一任务的多次修改会合并
+
+        与当前快照中的任务比较得出改动的字段，合并时只覆盖这些字段，
+        并发修改同一任务的不同字段时各自的修改都会提交。
+        """
+        data = task.to_dict()
+        base = self._snapshot.tasks_by_id.get(task.id)
+        return self._queue_write("update", data, None if base is None else changed_fields(base.to_dict(), data))
+
+    def queue_delete(self, task):
+        """把删除任务放入合并队列"""
+        return self._queue_write("delete", delete_items([task])[0])
+
+    def _queue_write(self, kind, data, changes = None):
+        future = concurrent.futures.Future()
+        self._write_queue.put(kind, data, future, changes)
+        if self.coalesce_window > 0:
+            with self._flush_lock:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.coalesce_window, self.flush_writes)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        return future
+
+    def flush_writes(self):
+        """立即把合并队列中的操作作为一次批量请求提交"""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        payload, pending = self._write_queue.drain()
+        if payload is None:
+            return True
+        logging.info(f"合并提交 {len(pending)} 个任务写操作")
+        try:
+            response = self._request("POST", f"{self.base_url}/api/v2/batch/task", json=payload)
+            ok = self._after_task_batch(payload, response)
+            TaskWriteQueue.resolve(pending, self._parse_batch_result(response))
+            return bool(ok)
+        except Exception:
+            # 写入结果无法确认，本地模型可能与服务器不一致
+            self.invalidate(full=True)
+            raise
+        finally:
+            # 出现异常时尚未设置结果的操作一律视为失败，避免等待它们的调用一直挂起
+            TaskWriteQueue.resolve(pending, None)
+
+    def add_task(self,task):
+        if self.coalesce_window > 0:
+            return self.queue_add(task).result()
+        return self._post_task_batch(task_batch_payload(add=new_task_items([task])))
     
     def add_tasks(self,tasks):
-        tasks = [task.to_dict() for task in tasks]
-        payload = {
-            "add": tasks,
-            "update": [],
-            "delete": [],
-            "addAttachments": [],
-            "updateAttachments": [],
-            "deleteAttachments": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/task"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post_task_batch(task_batch_payload(add=new_task_items(tasks)))
         
     def remove_task(self,task):
         if task is None:
             return False
-        task = task.to_dict()
-        task_id = task.get("id")
-        project_id = task.get("projectId")
-        payload = {
-            "add": [],
-            "update": [],
-            "delete": [
-                {
-                    "taskId": task_id,
-                    "projectId": project_id
-                }
-            ],
-            "addAttachments": [],
-            "updateAttachments": [],
-            "deleteAttachments": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/task"
-        try:
-            response = requests.request("POST", url, headers = self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
-             
-    def remove_tasks(self,tasks):
-        flag = True
-        tasks = [task.to_dict() for task in tasks]
-        task_ids = [task.get("id") for task in tasks]
-        project_ids = [task.get("projectId") for task in tasks]
-        payload = {
-            "add": [],
-            "update": [],
-            "delete": [
-                {
-                    "taskId": task_id,
-                    "projectId": project_id
-                } for task_id, project_id in zip(task_ids, project_ids)
-            ],
-            "addAttachments": [],
-            "updateAttachments": [],
-            "deleteAttachments": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/task"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        if flag == False:
-            return False
-        return True
+        if self.coalesce_window > 0:
+            return self.queue_delete(task).result()
+        return self._post_task_batch(task_batch_payload(delete=delete_items([task])))
+             
+    def remove_tasks(self,tasks):
+        return self._post_task_batch(task_batch_payload(delete=delete_items(tasks)))
         
+    # find_* 返回快照中对象的副本，调用方可以修改后交给 modify_* 提交，不会影响已发布的快照
     def find_task_by_id(self,id):    
-        for i in self.tasks:
-            if i.id == id:
-                return i
-        return None
+        task = self._snapshot.tasks_by_id.get(id)
+        return task.copy() if task else None
 
     def find_task_by_title(self,title):
-        for i in self.tasks:
-            if i.title == title:
-                return i
-        return None
+        tasks = self._snapshot.tasks_by_title.get(title)
+        return tasks[0].copy() if tasks else None
             
     def modify_task(self,task):
         if task is None:
             return False
-        task = task.to_dict()
-        payload = {
-            "add": [],
-            "update": [task],
-            "delete": [],
-            "addAttachments": [],
-            "updateAttachments": [],
-            "deleteAttachments": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/task"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
+        if self.coalesce_window > 0:
+            return self.queue_update(task).result()
+        return self._post_task_batch(task_batch_payload(update=[task.to_dict()]))
+
+    # ========== 项目管理方法 ==========
+    def _post(self, path, payload, method = "POST"):
+        """提交项目/标签等写操作，成功后使本地快照失效"""
+        response = self._request(method, f"{self.base_url}{path}", json=payload)
+        if response is None:
             return None
-        self.get_info_about()
+        self.invalidate()
         return True
 
-    # ========== 项目管理方法 ==========
     def add_project(self, project):
         """创建单个项目"""
         if project is None:
             return False
-        project_data = project.to_dict()
-        url = "https://api.dida365.com/api/v2/project"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=project_data)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post("/api/v2/project", project.to_dict())
 
     def remove_project(self, project_id):
         """删除项目"""
         if project_id is None:
             return False
-        payload = {
-            "add": [],
-            "update": [],
-            "delete": [project_id]
-        }
-        url = "https://api.dida365.com/api/v2/batch/project"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post("/api/v2/batch/project", {"add": [], "update": [], "delete": [project_id]})
 
     def modify_project(self, project):
         """修改项目"""
         if project is None:
             return False
-        project_data = project.to_dict()
-        payload = {
-            "add": [],
-            "update": [project_data],
-            "delete": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/project"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post("/api/v2/batch/project", {"add": [], "update": [project.to_dict()], "delete": []})
 
     def find_project_by_id(self, id):
         """根据ID查找项目"""
-        for i in self.projects:
-            if i.id == id:
-                return i
-        return None
+        project = self._snapshot.projects_by_id.get(id)
+        return project.copy() if project else None
 
     def find_project_by_name(self, name):
         """根据名称查找项目"""
-        for i in self.projects:
-            if i.name == name:
-                return i
-        return None
+        project = self._snapshot.projects_by_name.get(name)
+        return project.copy() if project else None
 
     # ========== 标签管理方法 ==========
     def add_tag(self, tag):
         """创建标签"""
         if tag is None:
             return False
-        tag_data = tag.to_dict()
-        payload = {
-            "add": [tag_data],
-            "update": []
-        }
-        url = "https://api.dida365.com/api/v2/batch/tag"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post("/api/v2/batch/tag", {"add": [tag.to_dict()], "update": []})
 
     def modify_tag(self, tag):
         """修改标签"""
         if tag is None:
             return False
-        tag_data = tag.to_dict()
-        payload = {
-            "add": [],
-            "update": [tag_data]
-        }
-        url = "https://api.dida365.com/api/v2/batch/tag"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post("/api/v2/batch/tag", {"add": [], "update": [tag.to_dict()]})
 
     def remove_tag(self, tag_name):
         """删除标签"""
         if tag_name is None:
             return False
-        payload = {
-            "name": tag_name
-        }
-        url = "https://api.dida365.com/api/v2/tag/delete"
-        try:
-            response = requests.request("DELETE", url, headers=self.headers, json=payload)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"请求失败: {e}")
-            if 'response' in locals():
-                if response is not None:
-                    logging.error(f"响应状态码: {response.status_code}")
-                    logging.error(f"响应内容: {response.text}")
-                else:
-                    logging.error("响应对象为None")
-            else:
-                logging.error("未获取到响应对象")
-            return None
-        self.get_info_about()
-        return True
+        return self._post("/api/v2/tag/delete", {"name": tag_name}, method="DELETE")
 
     def find_tag_by_name(self, name):
         """根据名称查找标签"""
-        for i in self.tags:
-            if i.name == name:
-                return i
-        return None
+        tag = self._snapshot.tags_by_name.get(name)
+        return tag.copy() if tag else None
 
     def move_task_to_project(self, task_id, from_project_id, to_project_id):
         """移动任务到其他项目"""
         if not task_id or not from_project_id or not to_project_id:
             logging.error("移动任务参数不完整")
             return False
-            
-        payload = [{
+        return self.move_tasks_to_project([{
             "taskId": task_id,
             "fromProjectId": from_project_id,
             "toProjectId": to_project_id
-        }]
-        
-        url = "https://api.dida365.com/api/v2/batch/taskProject"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-            if response.status_code == 200:
-                logging.info(f"成功移动任务 {task_id} 从项目 {from_project_id} 到项目 {to_project_id}")
-                self.get_info_about()  # 刷新数据
-                return True
-            else:
-                logging.error(f"移动任务失败，状态码: {response.status_code}, 响应: {response.text}")
-                return False
-        except requests.exceptions.RequestException as e:
-            logging.error(f"移动任务请求失败: {e}")
-            return False
+        }])
 
     def move_tasks_to_project(self, task_moves):
         """批量移动任务到其他项目
@@ -698,20 +2866,48 @@ class User:
         if not task_moves or not isinstance(task_moves, list):
             logging.error("批量移动任务参数错误")
             return False
-            
-        url = "https://api.dida365.com/api/v2/batch/taskProject"
+        response = self._request("POST", f"{self.base_url}/api/v2/batch/taskProject", json=task_moves)
+        return self._check_moved(task_moves, response)
+
+    def _check_moved(self, task_moves, response):
+        """处理移动任务接口的返回值，写穿模式下直接修改本地任务所属项目"""
+        if response is None:
+            return False
+        if response.status_code == 200:
+            logging.info(f"成功批量移动 {len(task_moves)} 个任务")
+            if not self.write_through or not self._apply_moves(task_moves, response):
+                self.invalidate()  # 数据已变化，下次读取时重新同步
+            return True
+        logging.error(f"批量移动任务失败，状态码: {response.status_code}, 响应: {response.text}")
+        return False
+
+    def _apply_moves(self, task_moves, response):
+        """把成功的移动操作写回本地模型，无法确认结果时返回 False"""
         try:
-            response = requests.request("POST", url, headers=self.headers, json=task_moves)
-            if response.status_code == 200:
-                logging.info(f"成功批量移动 {len(task_moves)} 个任务")
-                self.get_info_about()  # 刷新数据
-                return True
-            else:
-                logging.error(f"批量移动任务失败，状态码: {response.status_code}, 响应: {response.text}")
+            result = json.loads(response.text)
+        except ValueError:
+            result = None
+        id2etag = {}
+        if isinstance(result, dict):
+            if result.get("id2error"):
                 return False
-        except requests.exceptions.RequestException as e:
-            logging.error(f"批量移动任务请求失败: {e}")
-            return False
+            id2etag = result.get("id2etag") or {}
+        # 以锁内的当前快照为基础合并，避免覆盖同时发布的同步结果
+        with self._model_lock:
+            updated = {}
+            for move in task_moves:
+                existing = self._snapshot.tasks_by_id.get(move.get("taskId"))
+                if existing is None:
+                    return False
+                # 移动后 etag 会变化，服务器未返回新 etag 时无法保证后续更新不冲突
+                if existing.id not in id2etag:
+                    return False
+                task_data = existing.to_dict()
+                task_data["projectId"] = move.get("toProjectId")
+                task_data["etag"] = id2etag[existing.id]
+                updated[existing.id] = Task(task_data)
+            self._merge_tasks(updated, ())
+        return True
 
     def batch_update_tasks(self, add_tasks=None, update_tasks=None, delete_tasks=None, 
                           add_attachments=None, update_attachments=None, delete_attachments=None):
@@ -725,28 +2921,20 @@ class User:
             update_attachments: 要更新的附件列表
             delete_attachments: 要删除的附件列表
         """
-        payload = {
-            "add": add_tasks or [],
-            "update": update_tasks or [],
-            "delete": delete_tasks or [],
-            "addAttachments": add_attachments or [],
-            "updateAttachments": update_attachments or [],
-            "deleteAttachments": delete_attachments or []
-        }
-        
-        url = "https://api.dida365.com/api/v2/batch/task"
-        try:
-            response = requests.request("POST", url, headers=self.headers, json=payload)
-            if response.status_code == 200:
-                logging.info("批量更新任务成功")
-                self.get_info_about()  # 刷新数据
-                return True
-            else:
-                logging.error(f"批量更新任务失败，状态码: {response.status_code}, 响应: {response.text}")
-                return False
-        except requests.exceptions.RequestException as e:
-            logging.error(f"批量更新任务请求失败: {e}")
+        payload = task_batch_payload(add_tasks, update_tasks, delete_tasks,
+                                     add_attachments, update_attachments, delete_attachments)
+        response = self._request("POST", f"{self.base_url}/api/v2/batch/task", json=payload)
+        return self._check_batch_updated(payload, response)
+
+    def _check_batch_updated(self, payload, response):
+        """处理批量更新接口的返回值"""
+        if response is None:
             return False
+        if response.status_code == 200:
+            logging.info("批量更新任务成功")
+            return self._after_task_batch(payload, response) is not False
+        logging.error(f"批量更新任务失败，状态码: {response.status_code}, 响应: {response.text}")
+        return False
 
     def update_task_with_checklist(self, task_id, title=None, project_id=None, status=None, 
                                   start_date=None, tags=None, checklist_items=None, **kwargs):
@@ -762,11 +2950,20 @@ class User:
             checklist_items: 清单项目列表，格式为 [{"id": "xxx", "status": 0, "title": "xxx", "sortOrder": 0}, ...]
             **kwargs: 其他任务属性
         """
+        task_data = self._checklist_update_data(task_id, title, project_id, status,
+                                                start_date, tags, checklist_items, **kwargs)
+        if task_data is None:
+            return False
+        return self.batch_update_tasks(update_tasks=[task_data])
+
+    def _checklist_update_data(self, task_id, title=None, project_id=None, status=None,
+                               start_date=None, tags=None, checklist_items=None, **kwargs):
+        """基于现有任务构建清单任务的更新数据，任务不存在时返回 None"""
         # 查找现有任务
         existing_task = self.find_task_by_id(task_id)
         if not existing_task:
             logging.error(f"未找到任务 {task_id}")
-            return False
+            return None
             
         # 构建更新数据
         task_data = existing_task.to_dict()
@@ -789,10 +2986,722 @@ class User:
         for key, value in kwargs.items():
             if value is not None:
                 task_data[key] = value
-                
-        return self.batch_update_tasks(update_tasks=[task_data])
+        return task_data
             
 
+class AsyncUser(User):
+    """User 的 asyncio 版本
+
+    任务、项目、标签相关的接口与 User 一致，涉及网络请求的方法改为协程，
+    底层使用共享的 httpx.AsyncClient 连接池，适合在 Streamable HTTP 服务器的事件循环中使用。
+    find_*、tool_get_* 等只读本地模型的方法与 User 相同，直接调用即可。
+    """
+    _replica_blocking = False
+
+    def __init__(self,token = "", incremental_sync = True, cache_ttl = 30,
+                 session = None, timeout = DEFAULT_TIMEOUT, base_url = BASE_URL, write_through = True,
+                 coalesce_window = 0, max_stale = 0, replica = None):
+        super().__init__(token, incremental_sync, cache_ttl,
+                         session if session is not None else get_shared_async_client(),
+                         timeout, base_url, write_through, coalesce_window, max_stale, replica)
+        self._flush_handle = None
+
+    async def _request(self, method, url, **kwargs):
+        """发送 HTTP 请求，网络异常时记录日志并返回 None"""
+        try:
+            return await self.session.request(method, url, headers=self.headers,
+                                              timeout=httpx_timeout(self.timeout), **kwargs)
+        except httpx.HTTPError as e:
+            logging.error(f"请求失败: {e}")
+            return None
+
+    async def refresh(self, force = False):
+        """按需同步：快照过期、已失效或 force=True 时才请求服务器"""
+        if not force and self.is_fresh():
+            return True
+        return await self.get_info_about() is not None
+
+    async def get_user_info(self):
+        response = await self._request("GET", f"{self.base_url}/api/v2/user/profile")
+        if response is None:
+            return None
+        return self._load_user_info(json.loads(response.text))
+
+    async def get_info_about(self, full = False):
+        """同步任务、项目、标签信息，规则与 User.get_info_about 相同
+
+        同步在独立的 Task 中运行，调用方被取消时不会中断其他等待同一次同步的调用。
+        """
+        return await asyncio.shield(self._start_sync(full))
+
+    def _start_sync(self, full = False):
+        """发起（或复用进行中的）同步，返回运行同步的 asyncio.Task"""
+        flight = self._join_sync(full)
+        if flight is None:
+            flight = asyncio.ensure_future(self._sync_once(full))
+            self._sync_flight = (flight, full, self._sync_generation)
+            flight.add_done_callback(self._end_sync)
+        return flight
+
+    async def serve(self, force = False, deadline = None):
+        """读取类操作的刷新策略，规则与 User.serve 相同"""
+        if not force and self.is_fresh():
+            return None
+        if self._can_serve_stale(force):
+            self._start_sync()
+            return self.data_age()
+        try:
+            ok = await asyncio.wait_for(asyncio.shield(self._start_sync()), deadline) is not None
+        except asyncio.TimeoutError:
+            logging.warning(f"同步超过 {deadline} 秒未完成，返回上一版数据")
+            ok = False
+        return None if ok else self._stale_age()
+
+    def _end_sync(self, flight):
+        super()._end_sync(flight)
+        # 读取一次异常，避免所有调用方都被取消时出现 "exception was never retrieved" 警告
+        if not flight.cancelled():
+            flight.exception()
+
+    async def _sync_once(self, full = False):
+        """向服务器发起一次同步，结果在请求期间过时时重新请求"""
+        for _ in range(SYNC_ATTEMPTS):
+            self.syncs_upstream += 1
+            base = self._sync_base()
+            checkpoint = self._sync_checkpoint(full)
+            response = await self._request("GET", f"{self.base_url}/api/v2/batch/check/{checkpoint}")
+            data = self._parse_sync_result(response)
+            if data is None:
+                return None
+            if self._load_sync_data(checkpoint, data, base) is not None:
+                return data
+        return None
+
+    async def _post_task_batch(self, payload):
+        response = await self._request("POST", f"{self.base_url}/api/v2/batch/task", json=payload)
+        return self._after_task_batch(payload, response)
+
+    def _queue_write(self, kind, data, changes = None):
+        """放入合并队列，返回 asyncio.Future；合并窗口结束后在事件循环中统一提交"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._write_queue.put(kind, data, future, changes)
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.coalesce_window, self._start_flush)
+        return future
+
+    def _start_flush(self):
+        self._flush_handle = None
+        asyncio.ensure_future(self.flush_writes())
+
+    async def flush_writes(self):
+        """立即把合并队列中的操作作为一次批量请求提交"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        payload, pending = self._write_queue.drain()
+        if payload is None:
+            return True
+        logging.info(f"合并提交 {len(pending)} 个任务写操作")
+        try:
+            response = await self._request("POST", f"{self.base_url}/api/v2/batch/task", json=payload)
+            ok = self._after_task_batch(payload, response)
+            TaskWriteQueue.resolve(pending, self._parse_batch_result(response))
+            return bool(ok)
+        except Exception:
+            # 写入结果无法确认，本地模型可能与服务器不一致
+            self.invalidate(full=True)
+            raise
+        finally:
+            # 出现异常时尚未设置结果的操作一律视为失败，避免等待它们的调用一直挂起
+            TaskWriteQueue.resolve(pending, None)
+
+    async def add_task(self,task):
+        if self.coalesce_window > 0:
+            return await self.queue_add(task)
+        return await self._post_task_batch(task_batch_payload(add=new_task_items([task])))
+
+    async def add_tasks(self,tasks):
+        return await self._post_task_batch(task_batch_payload(add=new_task_items(tasks)))
+
+    async def remove_task(self,task):
+        if task is None:
+            return False
+        if self.coalesce_window > 0:
+            return await self.queue_delete(task)
+        return await self._post_task_batch(task_batch_payload(delete=delete_items([task])))
+
+    async def remove_tasks(self,tasks):
+        return await self._post_task_batch(task_batch_payload(delete=delete_items(tasks)))
+
+    async def modify_task(self,task):
+        if task is None:
+            return False
+        if self.coalesce_window > 0:
+            return await self.queue_update(task)
+        return await self._post_task_batch(task_batch_payload(update=[task.to_dict()]))
+
+    async def _post(self, path, payload, method = "POST"):
+        response = await self._request(method, f"{self.base_url}{path}", json=payload)
+        if response is None:
+            return None
+        self.invalidate()
+        return True
+
+    async def add_project(self, project):
+        """创建单个项目"""
+        if project is None:
+            return False
+        return await self._post("/api/v2/project", project.to_dict())
+
+    async def remove_project(self, project_id):
+        """删除项目"""
+        if project_id is None:
+            return False
+        return await self._post("/api/v2/batch/project", {"add": [], "update": [], "delete": [project_id]})
+
+    async def modify_project(self, project):
+        """修改项目"""
+        if project is None:
+            return False
+        return await self._post("/api/v2/batch/project", {"add": [], "update": [project.to_dict()], "delete": []})
+
+    async def add_tag(self, tag):
+        """创建标签"""
+        if tag is None:
+            return False
+        return await self._post("/api/v2/batch/tag", {"add": [tag.to_dict()], "update": []})
+
+    async def modify_tag(self, tag):
+        """修改标签"""
+        if tag is None:
+            return False
+        return await self._post("/api/v2/batch/tag", {"add": [], "update": [tag.to_dict()]})
+
+    async def remove_tag(self, tag_name):
+        """删除标签"""
+        if tag_name is None:
+            return False
+        return await self._post("/api/v2/tag/delete", {"name": tag_name}, method="DELETE")
+
+    async def move_task_to_project(self, task_id, from_project_id, to_project_id):
+        """移动任务到其他项目"""
+        if not task_id or not from_project_id or not to_project_id:
+            logging.error("移动任务参数不完整")
+            return False
+        return await self.move_tasks_to_project([{
+            "taskId": task_id,
+            "fromProjectId": from_project_id,
+            "toProjectId": to_project_id
+        }])
+
+    async def move_tasks_to_project(self, task_moves):
+        """批量移动任务到其他项目，参数格式同 User.move_tasks_to_project"""
+        if not task_moves or not isinstance(task_moves, list):
+            logging.error("批量移动任务参数错误")
+            return False
+        response = await self._request("POST", f"{self.base_url}/api/v2/batch/taskProject", json=task_moves)
+        return self._check_moved(task_moves, response)
+
+    async def batch_update_tasks(self, add_tasks=None, update_tasks=None, delete_tasks=None,
+                                 add_attachments=None, update_attachments=None, delete_attachments=None):
+        """批量更新任务，参数同 User.batch_update_tasks"""
+        payload = task_batch_payload(add_tasks, update_tasks, delete_tasks,
+                                     add_attachments, update_attachments, delete_attachments)
+        response = await self._request("POST", f"{self.base_url}/api/v2/batch/task", json=payload)
+        return self._check_batch_updated(payload, response)
+
+    async def update_task_with_checklist(self, task_id, title=None, project_id=None, status=None,
+                                         start_date=None, tags=None, checklist_items=None, **kwargs):
+        """更新带有清单的任务，参数同 User.update_task_with_checklist"""
+        task_data = self._checklist_update_data(task_id, title, project_id, status,
+                                                start_date, tags, checklist_items, **kwargs)
+        if task_data is None:
+            return False
+        return await self.batch_update_tasks(update_tasks=[task_data])
+
+
+class UserPool:
+    """多租户用户实例池
+
+    按 key（通常是 token）缓存 AsyncUser，每个租户拥有独立的连接配置、缓存有效期、索引和写合并队列，
+    切换租户时无需重新创建实例或重新同步。超过 max_size 时淘汰最近最少使用的租户，
+    超过 idle_ttl 秒未使用的租户也会被淘汰；淘汰前会提交该租户尚未发送的合并写操作。
+    每个租户有各自的 asyncio.Lock，保证同一租户只创建和初始化一次。
+    """
+
+    def __init__(self, factory, max_size = 64, idle_ttl = 3600):
+        self.factory = factory          # key -> AsyncUser
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._users = OrderedDict()     # key -> AsyncUser，按最近使用排序
+        self._used_at = {}              # key -> 最近使用时间
+        self._locks = {}                # key -> asyncio.Lock
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, key):
+        return key in self._users
+
+    def lock(self, key):
+        """获取租户锁"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def peek(self, key):
+        """获取已缓存的租户实例，不更新使用顺序"""
+        return self._users.get(key)
+
+    def users(self):
+        """当前缓存的全部租户实例"""
+        return list(self._users.values())
+
+    def items(self):
+        """当前缓存的全部 (key, 租户实例)"""
+        return list(self._users.items())
+
+    async def get(self, key, loader = None):
+        """获取租户实例，不存在时创建，并在租户锁内调用一次 await loader(user)
+
+        loader 返回 False 时（如 token 无效）实例不会被缓存，下次调用会重新创建。
+        """
+        user = self._touch(key)
+        if user is not None:
+            return user
+        async with self.lock(key):
+            user = self._touch(key)
+            if user is not None:
+                return user
+            user = self.factory(key)
+            if loader is not None and await loader(user) is False:
+                return user
+            self._users[key] = user
+            self._used_at[key] = time.monotonic()
+            logging.info(f"用户池: 新增租户，当前 {len(self._users)} 个")
+        await self._evict()
+        return user
+
+    def _touch(self, key):
+        user = self._users.get(key)
+        if user is not None:
+            self._users.move_to_end(key)
+            self._used_at[key] = time.monotonic()
+        return user
+
+    async def _evict(self):
+        """淘汰超出容量或长时间未使用的租户（刚使用的租户除外）"""
+        now = time.monotonic()
+        expired = []
+        for key in list(self._users)[:-1]:
+            if len(self._users) - len(expired) > self.max_size or now - self._used_at[key] > self.idle_ttl:
+                expired.append(key)
+            else:
+                break
+        for key in expired:
+            await self.discard(key)
+
+    async def discard(self, key):
+        """移除租户，提交其尚未发送的合并写操作并关闭其 SQLite 副本"""
+        user = self._users.pop(key, None)
+        self._used_at.pop(key, None)
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+        if user is not None:
+            await user.flush_writes()
+            if user.replica is not None:
+                user.replica.close()
+            logging.info(f"用户池: 淘汰租户，剩余 {len(self._users)} 个")
+
+    async def close(self):
+        """移除全部租户"""
+        for key in list(self._users):
+            await self.discard(key)
+
+
+class RefreshWorker:
+    """后台刷新任务：按固定间隔刷新用户池中每个租户的快照，使工具调用通常直接命中内存数据
+
+    每个租户独立调度，间隔加入随机抖动以免所有租户同时请求服务器；
+    刷新失败或耗时超过 slow_after 秒时，该租户的间隔按指数退避（最长 max_backoff 秒），成功后恢复。
+    """
+
+    def __init__(self, pool, interval = 20, jitter = 0.1, max_backoff = 300, slow_after = 5, after_refresh = None):
+        self.pool = pool
+        # 每次刷新成功后调用的协程函数 after_refresh(user)，如保存本地快照
+        self.after_refresh = after_refresh
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.slow_after = slow_after
+        self.last_success = None    # 最近一次刷新成功的时间（time.time）
+        self.schedule_lag = 0.0     # 最近一次刷新比计划时间晚了多少秒
+        self._schedule = {}         # key -> [下次刷新时间(time.monotonic), 连续失败/变慢次数]
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.interval and self.interval > 0 and not self.running:
+            self._task = asyncio.ensure_future(self._run())
+            logging.info(f"后台刷新已启动，间隔 {self.interval} 秒")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _delay(self, failures):
+        delay = min(self.interval * (2 ** failures), max(self.max_backoff, self.interval))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _run(self):
+        # 轮询粒度：足够及时地发现到期的租户，又不会空转
+        tick = max(0.5, min(5, self.interval / 4))
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"后台刷新出错: {e}")
+            await asyncio.sleep(tick)
+
+    async def run_once(self):
+        """刷新所有到期的租户"""
+        now = time.monotonic()
+        items = self.pool.items()
+        for key in set(self._schedule) - {key for key, _ in items}:
+            del self._schedule[key]
+        due = []
+        for key, user in items:
+            entry = self._schedule.get(key)
+            if entry is None:
+                # 新租户刚完成首次同步，从下一个间隔开始刷新
+                self._schedule[key] = [now + self._delay(0), 0]
+            elif entry[0] <= now:
+                self.schedule_lag = now - entry[0]
+                due.append((key, user, entry))
+        if due:
+            # 单个租户出错不影响同一批的其他租户（_refresh 已处理异常，这里兜底）
+            await asyncio.gather(*[self._refresh(user, entry) for _, user, entry in due], return_exceptions=True)
+
+    async def _refresh(self, user, entry):
+        start = time.monotonic()
+        if not entry[1] and user.synced_at is not None and start - user.synced_at < self.interval / 2:
+            # 工具调用刚刚同步过，顺延到下一个间隔
+            entry[0] = user.synced_at + self._delay(0)
+            return
+        try:
+            ok = await user.get_info_about() is not None
+            if ok:
+                self.last_success = time.time()
+                if self.after_refresh is not None:
+                    await self.after_refresh(user)
+        except Exception as e:
+            # 出错的租户和刷新失败一样退避，不会在每次轮询时重试
+            logging.error(f"后台刷新租户出错: {e}")
+            ok = False
+        elapsed = time.monotonic() - start
+        if ok and elapsed <= self.slow_after:
+            entry[1] = 0
+        else:
+            entry[1] += 1
+            logging.warning(f"后台刷新{'较慢' if ok else '失败'}（{elapsed:.1f} 秒），退避 {entry[1]} 次")
+        entry[0] = time.monotonic() + self._delay(entry[1])
+
+    def status(self):
+        """用于健康检查的状态：lag 为各租户数据距上次同步成功的最长时间（秒）"""
+        now = time.monotonic()
+        ages = [now - user.synced_at for user in self.pool.users() if user.synced_at is not None]
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "lag": round(max(ages), 3) if ages else None,
+            "schedule_lag": round(self.schedule_lag, 3),
+            "last_success": datetime.fromtimestamp(self.last_success).isoformat() if self.last_success else None,
+            "backoff_tenants": sum(1 for entry in self._schedule.values() if entry[1]),
+        }
+
+
+class SnapshotStore:
+    """本地快照存储：把用户快照和同步检查点按账号保存到文件，冷启动时立即恢复
+
+    文件名为 token 的哈希，内容为 魔数 + 格式版本 + zlib 压缩的 JSON（UTF-8），
+    读取时只解析数据，缓存目录被他人写入也无法借此执行代码。写入先写临时文件再原子替换，损坏或格式不符的文件会被忽略。
+    只保存同步成功后的数据：从未同步成功过或检查点已被丢弃（本地模型可能与服务器不一致）时不保存。
+    """
+    MAGIC = b"DIDA365S"
+    FORMAT = 2
+
+    @staticmethod
+    def savable(user):
+        """用户数据来自成功的同步且检查点有效时返回 True"""
+        return bool(user.token) and user.last_synced_at is not None and user.checkpoint != 0
+
+    def __init__(self, directory, min_interval = 60):
+        self.directory = directory
+        # 两次保存之间的最短间隔（秒），快照版本未变化时不保存
+        self.min_interval = min_interval
+        self._saved = {}    # 文件路径 -> (已保存的快照版本, 保存时间)
+
+    def path(self, token):
+        name = hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.snap")
+
+    def due(self, user):
+        """快照有变化且距上次保存超过 min_interval 时返回 True"""
+        if not self.savable(user):
+            return False
+        saved = self._saved.get(self.path(user.token))
+        if saved is None:
+            return True
+        version, saved_at = saved
+        return version != user.version and time.monotonic() - saved_at >= self.min_interval
+
+    def save(self, user):
+        """保存用户快照，成功返回 True"""
+        if not self.savable(user):
+            return False
+        path = self.path(user.token)
+        version = user.version
+        try:
+            payload = zlib.compress(json.dumps(user.export_state(), ensure_ascii=False).encode("utf-8"), 6)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.MAGIC + bytes([self.FORMAT]) + payload)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.error(f"保存本地快照失败: {e}")
+            return False
+        self._saved[path] = (version, time.monotonic())
+        logging.info(f"已保存本地快照 {path}（{len(payload)} 字节）")
+        return True
+
+    def load(self, user):
+        """从本地文件恢复用户快照，文件不存在或无法解析时返回 False"""
+        path = self.path(user.token)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        header = self.MAGIC + bytes([self.FORMAT])
+        if not data.startswith(header):
+            logging.warning(f"本地快照格式不符，已忽略: {path}")
+            return False
+        try:
+            user.import_state(json.loads(zlib.decompress(data[len(header):]).decode("utf-8")))
+        except (zlib.error, KeyError, TypeError, ValueError) as e:
+            logging.warning(f"本地快照无法解析，已忽略: {e}")
+            return False
+        self._saved[path] = (user.version, time.monotonic())
+        logging.info(f"已从本地快照恢复 {len(user.tasks)} 个任务，数据年龄 {user.data_age():.0f} 秒")
+        return True
+
+    def delete(self, token):
+        try:
+            os.remove(self.path(token))
+        except OSError:
+            pass
+
+
+class TaskReplica:
+    """本地 SQLite 副本：把快照中任务的筛选字段和标签、项目、标签名镜像到 SQLite，按项目、状态、截止时间、优先级、标签建立索引
+
+    筛选类查询（按项目/标签/状态/优先级/截止时间）在数据库中通过索引完成，返回任务ID，
+    由调用方映射回快照中的任务对象；副本只承担筛选，不替代内存中的快照。
+    User 每发布一个快照就通过 submit() 把本次变化（增量或全量）交给副本的写线程，按发布顺序写入并记录快照版本，
+    发布快照不等待写入完成；查询时只有副本版本与当前快照一致才使用副本，否则回退到内存索引。
+    副本可随时由快照重建，因此不保证崩溃后的持久性（synchronous=OFF），表结构版本不符时直接重建。
+    """
+    SCHEMA_VERSION = 2
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            project_id TEXT,
+            status INTEGER NOT NULL,
+            priority INTEGER NOT NULL,
+            due_ts REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks (project_id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_status_due ON tasks (status, due_ts);
+        CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (due_ts);
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+        CREATE TABLE IF NOT EXISTS task_tags (
+            tag TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            PRIMARY KEY (tag, task_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_task_tags_task ON task_tags (task_id);
+        CREATE TABLE IF NOT EXISTS projects (id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE IF NOT EXISTS tags (name TEXT PRIMARY KEY);
+    """
+
+    def __init__(self, path = ":memory:"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 同步线程、写操作和工具调用可能在不同线程中访问，所有操作都在 _lock 内进行
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                for table in ("meta", "tasks", "task_tags", "projects", "tags"):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self._conn.executescript(self.SCHEMA)
+        # 写线程：按发布顺序在后台写入，发布快照（包括在事件循环中发布）不被数据库写入阻塞
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-replica")
+        # 副本当前对应的快照版本，None 表示内容未知（需要全量重建）
+        self.version = None
+
+    @classmethod
+    def for_token(cls, directory, token):
+        """按账号在 directory 下创建副本文件，directory 为空时使用内存数据库"""
+        if not directory:
+            return cls()
+        name = hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+        return cls(os.path.join(directory, f"{name}.sqlite"))
+
+    def close(self):
+        """停止使用副本；已提交的写入完成后在写线程中关闭连接，不等待"""
+        self.version = None
+        self._writer.submit(self._close)
+        self._writer.shutdown(wait=False)
+
+    def _close(self):
+        with self._lock:
+            self._conn.close()
+        self.version = None
+
+    def submit(self, previous, snapshot, **changes):
+        """把快照 previous 到 snapshot 的变化交给写线程，立即返回 Future；副本已关闭时返回 None"""
+        try:
+            return self._writer.submit(self.sync, previous, snapshot, **changes)
+        except RuntimeError:
+            return None
+
+    def wait(self):
+        """等待已提交的写入全部完成"""
+        self._writer.submit(lambda: None).result()
+
+    @staticmethod
+    def _task_row(task):
+        return (task.id, task.projectId, task.status or 0, task.priority or 0, task.due_time())
+
+    def sync(self, previous, snapshot, updated = None, deleted_ids = (), projects = None, tags = None):
+        """把快照 previous 到 snapshot 的变化写入副本
+
+        副本版本与 previous 一致时只写入变化的部分，否则用 snapshot 全量重建。
+        """
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    if previous is None or self.version != previous.version:
+                        self._load(snapshot)
+                    else:
+                        self._apply(snapshot, updated or {}, deleted_ids, projects, tags)
+                    self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (snapshot.version,))
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self.version = snapshot.version
+        except sqlite3.Error as e:
+            logging.error(f"更新 SQLite 副本失败: {e}")
+            self.version = None
+
+    def _load(self, snapshot):
+        conn = self._conn
+        for table in ("tasks", "task_tags", "projects", "tags"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.executemany("INSERT INTO tasks VALUES (?, ?, ?, ?, ?)",
+                         [self._task_row(task) for task in snapshot.tasks])
+        conn.executemany("INSERT OR IGNORE INTO task_tags VALUES (?, ?)",
+                         [(tag, task.id) for task in snapshot.tasks for tag in task.tags or ()])
+        self._set_projects(snapshot.projects)
+        self._set_tags(snapshot.tags)
+        logging.info(f"SQLite 副本全量重建: {len(snapshot.tasks)} 个任务")
+
+    def _apply(self, snapshot, updated, deleted_ids, projects, tags):
+        conn = self._conn
+        changed = [(task_id,) for task_id in list(deleted_ids) + list(updated)]
+        conn.executemany("DELETE FROM task_tags WHERE task_id = ?", changed)
+        conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in deleted_ids])
+        # 已存在的任务原位更新（保留 rowid，即保持原有顺序），新任务追加在末尾
+        conn.executemany(
+            "INSERT INTO tasks VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "project_id = excluded.project_id, status = excluded.status, priority = excluded.priority, "
+            "due_ts = excluded.due_ts",
+            [self._task_row(task) for task in updated.values()])
+        conn.executemany("INSERT OR IGNORE INTO task_tags VALUES (?, ?)",
+                         [(tag, task.id) for task in updated.values() for tag in task.tags or ()])
+        if projects is not None:
+            conn.execute("DELETE FROM projects")
+            self._set_projects(snapshot.projects)
+        if tags is not None:
+            conn.execute("DELETE FROM tags")
+            self._set_tags(snapshot.tags)
+
+    def _set_projects(self, projects):
+        self._conn.executemany("INSERT OR REPLACE INTO projects VALUES (?, ?)", [(i.id, i.name) for i in projects])
+
+    def _set_tags(self, tags):
+        self._conn.executemany("INSERT OR IGNORE INTO tags VALUES (?)", [(i.name,) for i in tags])
+
+    def query_task_ids(self, project_id = None, tag = None, status = None, min_priority = None, due_before = None,
+                       version = None, blocking = True):
+        """按条件查询任务，返回任务ID列表
+
+        指定 due_before 时只返回截止时间早于该时间戳的任务并按截止时间排序，否则保持快照中的顺序。
+        version 不为 None 时在锁内确认副本仍是该快照版本，不是时返回 None（结果会与调用方的快照对不上）；
+        blocking=False 时副本正在写入就直接返回 None，不等待（用于事件循环中）。
+        """
+        sql = "SELECT t.id FROM tasks t"
+        where, params = [], []
+        if tag is not None:
+            sql += " JOIN task_tags g ON g.task_id = t.id"
+            where.append("g.tag = ?")
+            params.append(tag)
+        if project_id is not None:
+            where.append("t.project_id = ?")
+            params.append(project_id)
+        if status is not None:
+            where.append("t.status = ?")
+            params.append(status)
+        if min_priority is not None:
+            where.append("t.priority >= ?")
+            params.append(min_priority)
+        if due_before is not None:
+            where.append("t.due_ts < ?")
+            params.append(due_before)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY t.due_ts, t.id" if due_before is not None else " ORDER BY t.rowid"
+        if not self._lock.acquire(blocking):
+            return None
+        try:
+            if version is not None and self.version != version:
+                return None
+            rows = self._conn.execute(sql, params).fetchall()
+        finally:
+            self._lock.release()
+        return [task_id for (task_id,) in rows]
+
+
 class ProjectBuilder:
     def __init__(self, name: str):
         self._data = {
@@ -1034,6 +3943,8 @@ if __name__ == '__main__':
     onecreeper.add_task(task2)
     
     # ========== 演示修改和删除功能 ==========
+    # 写操作会使缓存失效，查找前先同步最新数据
+    onecreeper.refresh()
     # 查找并修改项目
     work_project = onecreeper.find_project_by_name("工作项目")
     if work_project:
@@ -0,0 +1,107 @@
+"""任务模型内存基准测试
+
+构造一批与 /batch/check 接口返回格式一致的任务 JSON，分别用旧的「每个对象一个 __dict__」模型
+和新的 __slots__ 模型（api.Task）解析加载，对比常驻内存（含字段值）、加载耗时和 to_dict 耗时。
+
+运行: python benchmarks/bench_model_memory.py [任务数]
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+
+
+class LegacyTask:
+    """改造前的任务模型：所有字段初始化为 None 后用 __dict__.update 覆盖"""
+
+    def __init__(self, task_dict=None):
+        for name in api.Task._fields[:22]:
+            setattr(self, name, None)
+        if task_dict:
+            self.__dict__.update(task_dict)
+
+    def to_dict(self):
+        return {key: value for key, value in self.__dict__.items() if value is not None}
+
+
+def make_task_json(count):
+    projects = [api.new_object_id() for _ in range(20)]
+    tasks = []
+    for i in range(count):
+        tasks.append({
+            "id": api.new_object_id(),
+            "projectId": projects[i % len(projects)],
+            "sortOrder": -1099511627776 * (i + 1),
+            "title": f"任务 {i}",
+            "content": "",
+            "desc": "",
+            "timeZone": "Asia/Shanghai",
+            "isFloating": False,
+            "isAllDay": i % 2 == 0,
+            "reminder": "",
+            "reminders": [],
+            "exDate": [],
+            "completedTime": None,
+            "completedUserId": 0,
+            "repeatTaskId": None,
+            "priority": (0, 1, 3, 5)[i % 4],
+            "status": 0,
+            "items": [],
+            "progress": 0,
+            "modifiedTime": "2025-05-21T16:00:00.000+0000",
+            "etag": "abcdefgh",
+            "deleted": 0,
+            "createdTime": "2025-05-21T16:00:00.000+0000",
+            "creator": 123456789,
+            "repeatFrom": "2",
+            "focusSummaries": [],
+            "columnId": "6778eeb7c71c710000000115",
+            "kind": "TEXT",
+            "tags": ["工作"] if i % 3 == 0 else [],
+            "dueDate": "2025-05-22T16:00:00.000+0000" if i % 2 else None,
+            "startDate": "2025-05-22T16:00:00.000+0000" if i % 2 else None,
+            "commentCount": 0,
+        })
+    return json.dumps(tasks, ensure_ascii=False)
+
+
+def measure(model, raw):
+    # tracemalloc 本身会显著拖慢分配，耗时和内存分两次测量
+    start = time.perf_counter()
+    tasks = [model(item) for item in json.loads(raw)]
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(3):
+        for task in tasks:
+            task.to_dict()
+    dict_time = (time.perf_counter() - start) / 3
+
+    del tasks
+    gc.collect()
+    tracemalloc.start()
+    tasks = [model(item) for item in json.loads(raw)]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, load_time, dict_time
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    raw = make_task_json(count)
+    for label, model in (("旧模型(__dict__)", LegacyTask), ("新模型(__slots__)", api.Task)):
+        size, load_time, dict_time = measure(model, raw)
+        print(f"{label}: {count} 个任务, 内存 {size / 1024 / 1024:.1f} MB "
+              f"({size / count:.0f} 字节/个), 加载 {load_time * 1000:.0f} ms, "
+              f"to_dict 全量 {dict_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""工具输出体积基准测试
+
+用与 /batch/check 接口返回格式一致的任务 JSON 构造任务列表，分别按默认的缩进 JSON、不缩进 JSON、
+紧凑格式（省略空值和默认值）、紧凑格式 + 短键名，以及只保留部分字段的方式序列化，
+对比输出字节数和整形 + 序列化耗时。
+
+运行: python benchmarks/bench_output_size.py [任务数]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+from bench_model_memory import make_task_json
+
+
+PROFILES = (
+    ("缩进 JSON(默认)", {}, False),
+    ("不缩进 JSON", {}, True),
+    ("紧凑格式", {"compact": True}, True),
+    ("紧凑格式 + 短键名", {"compact": True, "short_keys": True}, True),
+    ("字段裁剪 id,title,dueDate,status", {"fields": "title,dueDate,status", "compact": True}, True),
+)
+
+
+def measure(tasks, options, compact):
+    start = time.perf_counter()
+    text = api.dump_json(api.shape_output(tasks, **options), compact=compact)
+    return len(text.encode("utf-8")), time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tasks = [api.Task(item).to_dict() for item in json.loads(make_task_json(count))]
+    baseline = None
+    for label, options, compact in PROFILES:
+        size, elapsed = measure(tasks, options, compact)
+        baseline = baseline or size
+        print(f"{label}: {count} 个任务, {size / 1024:.0f} KB ({size / count:.0f} 字节/个, "
+              f"{size / baseline:.0%}), 耗时 {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
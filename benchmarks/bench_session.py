@@ -0,0 +1,71 @@
+"""连接池基准测试
+
+在本地启动一个模拟滴答清单接口的 HTTP 服务，分别用
+「每次请求新建连接」和「共享连接池」两种方式调用 User.get_user_info，
+对比耗时与服务端实际接受的 TCP 连接数。
+
+运行: python benchmarks/bench_session.py [请求次数]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 才支持 keep-alive
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，关闭 Nagle 算法以免 keep-alive 连接上出现延迟确认等待
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        body = json.dumps({"name": "bench", "username": "bench"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(user, server, count):
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        user.get_user_info()
+    elapsed = time.perf_counter() - start
+    return elapsed, server.connections
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    fresh = api.User("", session=api.create_session(keep_alive=False), base_url=base_url)
+    pooled = api.User("", session=api.create_session(), base_url=base_url)
+
+    for label, user in (("每次新建连接", fresh), ("共享连接池", pooled)):
+        elapsed, connections = run(user, server, count)
+        print(f"{label}: {count} 次请求, 耗时 {elapsed * 1000:.1f} ms, "
+              f"平均 {elapsed / count * 1000:.3f} ms/次, 建立连接 {connections} 个")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,13 @@ from mcp.server.fastmcp import FastMCP
 import api
 import os
 import json
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+import time
+import functools
+import inspect
+import contextvars
+from typing import Optional, List, Dict, Any, Union
 import uvicorn
 from starlette.applications import Starlette
 from starlette.middleware.cors import CORSMiddleware
@@ -35,53 +40,274 @@ def save_json(data, file_path='key.json'):
 # 创建MCP服务器
 mcp = FastMCP("Dida365")
 
-# 全局用户实例
-user_instance = None
+# 所有用户实例共享同一个异步 HTTP 连接池，连接在多次工具调用之间复用
+api.configure_shared_async_client(max_connections=read_or_create_json().get('pool_size', 32))
 
-def get_user_instance():
-    """获取用户实例，如果不存在则创建"""
-    global user_instance
-    if user_instance is None:
-        config = read_or_create_json()
-        token = config.get('token', '')
-        user_instance = api.User(token)
+def create_replica(token, config):
+    """配置 sqlite_replica 为 true 时为账号创建 SQLite 副本，文件保存在 replica_dir（默认与快照目录相同）"""
+    if not token or not config.get('sqlite_replica', False):
+        return None
+    return api.TaskReplica.for_token(config.get('replica_dir', config.get('snapshot_dir', 'cache')), token)
+
+def create_user(token, config):
+    """根据配置创建用户实例（异步版本，工具中通过 await 调用网络接口）
+
+    config['tenants'] 中可以按 token 为单个租户覆盖 cache_ttl、timeout、coalesce_window 等配置
+    """
+    config = {**config, **config.get('tenants', {}).get(token, {})}
+    return api.AsyncUser(
+        token,
+        cache_ttl=config.get('cache_ttl', 30),
+        timeout=config.get('timeout', api.DEFAULT_TIMEOUT),
+        # 过期不超过 max_stale 秒的数据可以先返回，再在后台刷新
+        max_stale=config.get('max_stale', 300),
+        # 可选的 SQLite 副本：筛选类工具在副本中通过索引查询
+        replica=create_replica(token, config),
+        # 并发的任务写操作在该窗口内合并为一次批量请求
+        coalesce_window=config.get('coalesce_window', 0.05),
+    )
+
+async def load_user(user):
+    """验证token并加载任务、项目、标签信息，token无效时返回 False
+
+    有本地快照时先从快照恢复并立即返回，验证token和增量同步在后台进行。
+    """
+    if not user.token:
+        return False
+    if snapshot_store is not None and await asyncio.to_thread(snapshot_store.load, user):
+        asyncio.ensure_future(reconcile_user(user))
+        return True
+    # 先尝试获取用户信息以验证token
+    try:
+        user_info = await user.get_user_info()
+        if user_info:
+            # 加载任务、项目、标签信息，同步成功后保存本地快照
+            if await user.get_info_about() is not None:
+                await save_snapshot(user)
+            return True
+        # 获取用户信息失败，可能需要重新登录
+        logger.warning("获取用户信息失败，token可能已过期")
+    except Exception as e:
+        logger.error(f"验证token时出错: {e}")
+    return False
+
+async def reconcile_user(user):
+    """从本地快照恢复后，在后台刷新用户信息并与服务器增量同步"""
+    try:
+        if not await user.get_user_info():
+            logger.warning("获取用户信息失败，token可能已过期")
+        if await user.get_info_about() is not None:
+            await save_snapshot(user)
+    except Exception as e:
+        logger.error(f"同步本地快照时出错: {e}")
+
+async def save_snapshot(user, force=False):
+    """保存用户的本地快照（在线程中序列化，不阻塞事件循环）"""
+    if snapshot_store is not None and (force or snapshot_store.due(user)):
+        await asyncio.to_thread(snapshot_store.save, user)
+
+# 多租户用户实例池：每个 token 对应一个独立的用户实例（独立的缓存、索引和写合并队列）
+_config = read_or_create_json()
+
+# 本地快照：按账号保存快照和同步检查点，重启后立即恢复再在后台增量同步；snapshot_dir 为空时关闭
+snapshot_store = api.SnapshotStore(
+    _config.get('snapshot_dir', 'cache'),
+    min_interval=_config.get('snapshot_interval', 60),
+) if _config.get('snapshot_dir', 'cache') else None
+
+user_pool = api.UserPool(
+    lambda token: create_user(token, read_or_create_json()),
+    max_size=_config.get('max_tenants', 64),
+    idle_ttl=_config.get('tenant_idle_ttl', 3600),
+)
+
+# 后台刷新：间隔应小于 cache_ttl，使工具调用时快照始终处于有效期内；设为 0 关闭
+refresh_worker = api.RefreshWorker(
+    user_pool,
+    interval=_config.get('refresh_interval', 20),
+    jitter=_config.get('refresh_jitter', 0.1),
+    max_backoff=_config.get('refresh_max_backoff', 300),
+    slow_after=_config.get('refresh_slow_after', 5),
+    after_refresh=save_snapshot,
+)
+
+# MCP 会话ID -> 该会话通过 set_token 设置的 token（按设置顺序保留最近的若干个）
+session_tokens = {}
+MAX_SESSION_TOKENS = 1024
+
+# 未在请求头或会话中指定 token 时使用 key.json 中的 token
+default_token = _config.get('token', '')
+
+def current_request():
+    """当前工具调用对应的 HTTP 请求，不在请求上下文中时返回 None"""
+    try:
+        return mcp.get_context().request_context.request
+    except (ValueError, LookupError):
+        return None
+
+def current_token():
+    """确定当前调用使用的 token：请求头 X-Dida365-Token > 会话中 set_token 设置的 token > key.json"""
+    request = current_request()
+    if request is not None:
+        token = request.headers.get('x-dida365-token')
         if token:
-            # 先尝试获取用户信息以验证token
-            try:
-                user_info = user_instance.get_user_info()
-                if user_info:
-                    user_instance.get_info_about()  # 加载任务、项目、标签信息
-                else:
-                    # 获取用户信息失败，可能需要重新登录
-                    logger.warning("获取用户信息失败，token可能已过期")
-            except Exception as e:
-                logger.error(f"验证token时出错: {e}")
-    return user_instance
+            return token
+        token = session_tokens.get(request.headers.get('mcp-session-id'))
+        if token:
+            return token
+    return default_token
+
+# 读取类工具本次返回的数据年龄（秒），None 表示返回的是最新数据
+served_age = contextvars.ContextVar('served_age', default=None)
+
+def read_deadline():
+    """本次调用等待同步的最长时间（秒）：请求头 X-Deadline-Ms 优先，其次是配置 read_deadline"""
+    request = current_request()
+    if request is not None and request.headers.get('x-deadline-ms'):
+        try:
+            return max(float(request.headers['x-deadline-ms']) / 1000, 0)
+        except ValueError:
+            pass
+    return _config.get('read_deadline', 5)
+
+async def serve_read(user, force_refresh=False):
+    """按读取策略刷新数据：过期不久的数据直接返回并在后台刷新，等待同步超时则返回上一版数据"""
+    served_age.set(await user.serve(force_refresh, read_deadline()))
+
+def mark_stale(result, age):
+    """在结果中标注数据年龄：对象增加 _stale 键，列表和 JSON 字符串放进 {"data": ..., "_stale": ...}"""
+    marker = {"stale": True, "age_seconds": round(age, 1)}
+    if isinstance(result, dict):
+        return {**result, "_stale": marker}
+    if isinstance(result, list):
+        return {"data": result, "_stale": marker}
+    if isinstance(result, str):
+        try:
+            return api.dump_json({"_stale": marker, "data": json.loads(result)}, compact="\n" not in result)
+        except ValueError:
+            return result
+    return result
+
+def serve_stale(func):
+    """读取类工具和资源的装饰器：返回的是上一版数据时，在结果中标注其年龄"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        served_age.set(None)
+        result = await func(*args, **kwargs)
+        age = served_age.get()
+        return result if age is None else mark_stale(result, age)
+    # 列表结果过期时会放进 {"data", "_stale"} 对象，返回类型相应放宽
+    signature = inspect.signature(func)
+    if signature.return_annotation not in (str, inspect.Signature.empty):
+        wrapper.__signature__ = signature.replace(return_annotation=Union[signature.return_annotation, Dict[str, Any]])
+    return wrapper
+
+OUTPUT_ARGS_DOC = """
+
+    输出格式（返回任务/项目/标签的读取工具通用）:
+        fields: 只返回这些字段（逗号分隔，如 "title,dueDate,status"），id（标签为 name）总是返回
+        compact: 紧凑格式，不缩进并省略空值和默认值（status/priority/progress 为 0、空列表、false 等）
+        short_keys: 使用短键名（如 title→t、dueDate→due），对照表见资源 dida365://schema/short-keys
+"""
+
+def compact_output(func):
+    """读取类工具的装饰器：增加 fields、compact、short_keys 参数，按需裁剪字段并输出紧凑格式
+
+    放在 serve_stale 外层，数据过期标记同样以紧凑格式输出。
+    """
+    signature = inspect.signature(func)
+    extra = [
+        inspect.Parameter("fields", inspect.Parameter.KEYWORD_ONLY, default="", annotation=str),
+        inspect.Parameter("compact", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool),
+        inspect.Parameter("short_keys", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool),
+    ]
+    @functools.wraps(func)
+    async def wrapper(*args, fields="", compact=False, short_keys=False, **kwargs):
+        result = await func(*args, **kwargs)
+        if fields or compact or short_keys:
+            result = api.shape_output(result, fields, compact, short_keys)
+        # 紧凑格式直接返回序列化好的字符串，否则 FastMCP 会按缩进格式序列化
+        return api.dump_json(result, compact=True) if compact else result
+    # 紧凑格式返回的是 JSON 字符串，返回类型相应放宽，否则 FastMCP 校验结构化输出时会报错
+    return_annotation = signature.return_annotation
+    if return_annotation not in (str, inspect.Signature.empty):
+        return_annotation = Union[return_annotation, str]
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), *extra],
+                                              return_annotation=return_annotation)
+    wrapper.__doc__ = (func.__doc__ or "") + OUTPUT_ARGS_DOC
+    return wrapper
+
+# 资源的输出格式：compact_resources 为 true 时资源使用紧凑格式，short_key_resources 为 true 时再使用短键名
+RESOURCE_COMPACT = read_or_create_json().get('compact_resources', False)
+RESOURCE_SHORT_KEYS = read_or_create_json().get('short_key_resources', False)
+
+def dump_resource(data, indent=True):
+    """序列化资源内容；indent=False 时即使未开启紧凑格式也不缩进"""
+    if RESOURCE_COMPACT or RESOURCE_SHORT_KEYS:
+        data = api.shape_output(data, compact=RESOURCE_COMPACT, short_keys=RESOURCE_SHORT_KEYS)
+    return api.dump_json(data, compact=RESOURCE_COMPACT or not indent)
+
+async def get_user_instance():
+    """获取当前租户的用户实例，如果不存在则创建"""
+    token = current_token()
+    if not token:
+        return create_user('', _config)
+    return await user_pool.get(token, load_user)
+
+def describe_matches(matches, attr="name"):
+    """把相似候选格式化为提示文字，如 'xx'(0.82)、'yy'(0.61)"""
+    return "、".join(f"'{getattr(obj, attr)}'({score:.2f})" for obj, score in matches)
+
+def not_found(message, matches, attr="name"):
+    """未找到时的提示，有相似候选时一并列出"""
+    if not matches:
+        return message
+    return f"{message}，相近的有: {describe_matches(matches, attr)}"
+
+def match_note(name, obj, confidence, attr="name"):
+    """按相近名称匹配时的说明，精确匹配时为空字符串"""
+    if confidence >= 1 and getattr(obj, attr) == name:
+        return ""
+    return f"（'{name}' 按相近名称匹配为 '{getattr(obj, attr)}'，置信度 {confidence:.2f}）"
+
+# 分页：工具指定 cursor 但没有指定 limit 时的每页任务数，以及任务分页资源的每页任务数
+PAGE_SIZE = 100
+RESOURCE_PAGE_SIZE = 200
+
+def paged_tasks(user, key, fetch, limit, cursor):
+    """分页返回任务 {"total", "version", "nextCursor", "tasks"}，nextCursor 为 None 表示已是最后一页"""
+    try:
+        tasks, total, next_cursor, version = user.paginate(key, fetch, limit or PAGE_SIZE, cursor or None)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"total": total, "version": version, "nextCursor": next_cursor, "tasks": enhance_tasks_with_names(user, tasks)}
 
 def enhance_tasks_with_names(user, tasks):
-    """为任务添加项目名称和标签名称信息"""
-    if not isinstance(tasks, list):
+    """为任务添加项目名称和标签名称信息
+
+    Task 对象从快照的物化视图中取得已附加好的字典（只读，需要修改时先复制）；字典形式的任务逐个补充。
+    """
+    single = not isinstance(tasks, list)
+    if single:
         tasks = [tasks] if tasks else []
     
-    # 创建项目ID到名称的映射
-    project_map = {}
-    for project in user.projects:
-        project_map[project.id] = project.name
-    
-    # 创建标签名称到标签对象的映射
-    tag_map = {}
-    for tag in user.tags:
-        tag_map[tag.name] = tag
+    # 使用同一版本快照中的项目和标签索引
+    snapshot = user.snapshot
+    project_map = snapshot.projects_by_id
+    tag_map = snapshot.tags_by_name
     
+    view = snapshot.enriched_view
     enhanced_tasks = []
     for task in tasks:
-        if isinstance(task, dict):
+        if isinstance(task, api.Task):
+            enhanced_tasks.append(view.get(task))
+        elif isinstance(task, dict):
             enhanced_task = task.copy()
             
             # 添加项目名称
             project_id = task.get('projectId')
             if project_id and project_id in project_map:
-                enhanced_task['projectName'] = project_map[project_id]
+                enhanced_task['projectName'] = project_map[project_id].name
             
             # 添加标签详细信息
             task_tags = task.get('tags', [])
@@ -103,24 +329,23 @@ def enhance_tasks_with_names(user, tasks):
         else:
             enhanced_tasks.append(task)
     
-    return enhanced_tasks[0] if len(enhanced_tasks) == 1 and not isinstance(tasks, list) else enhanced_tasks
+    return enhanced_tasks[0] if len(enhanced_tasks) == 1 and single else enhanced_tasks
 
 @mcp.tool()
-def set_token(token: str) -> str:
-    """设置滴答清单的认证token"""
+async def set_token(token: str) -> str:
+    """设置当前 MCP 会话使用的滴答清单认证token（只影响本会话，不修改 key.json 和其他会话）"""
     try:
-        config = read_or_create_json()
-        config['token'] = token
-        save_json(config)
-        
-        # 更新用户实例
-        global user_instance
-        user_instance = api.User(token)
-        user_info = user_instance.get_user_info()
-        
-        if user_info:
-            user_instance.get_info_about()
-            return f"Token设置成功，用户: {user_instance.name or user_instance.username}"
+        request = current_request()
+        session_id = request.headers.get('mcp-session-id') if request is not None else None
+        if not session_id:
+            return "当前请求没有 MCP 会话ID，无法绑定token，请在请求头 X-Dida365-Token 中传入token"
+        session_tokens[session_id] = token
+        while len(session_tokens) > MAX_SESSION_TOKENS:
+            session_tokens.pop(next(iter(session_tokens)))
+
+        user = await user_pool.get(token, load_user)
+        if user_pool.peek(token) is user:
+            return f"Token设置成功，用户: {user.name or user.username}"
         else:
             return "Token设置失败，请检查token是否有效"
     except Exception as e:
@@ -128,14 +353,14 @@ def set_token(token: str) -> str:
         return f"设置token失败: {str(e)}"
 
 @mcp.tool()
-def get_user_info() -> Dict[str, Any]:
+async def get_user_info() -> Dict[str, Any]:
     """获取当前用户信息"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
-        user_info = user.get_user_info()
+        user_info = await user.get_user_info()
         if user_info:
             return {
                 "name": user.name,
@@ -150,30 +375,44 @@ def get_user_info() -> Dict[str, Any]:
         return {"error": str(e)}
 
 @mcp.tool()
-def get_all_tasks() -> List[Dict[str, Any]]:
-    """获取所有任务"""
+@compact_output
+@serve_stale
+async def get_all_tasks(force_refresh: bool = False, limit: int = 0, cursor: str = "") -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """获取所有任务
+
+    任务很多时请分页获取：指定 limit 后返回 {"total", "version", "nextCursor", "tasks"}，
+    把 nextCursor 作为 cursor 再次调用取下一页，直到 nextCursor 为 null。
+
+    Args:
+        force_refresh: 是否强制从服务器刷新数据
+        limit: 每页返回的任务数，为 0 且没有 cursor 时不分页、返回全部任务
+        cursor: 上一页返回的 nextCursor；翻页期间的结果固定在第一页时的数据版本，不受之后同步的影响
+    """
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        tasks = user.tool_get_task_info()
-        return enhance_tasks_with_names(user, tasks)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        if limit or cursor:
+            return paged_tasks(user, ("all",), lambda snapshot: snapshot.tasks, limit, cursor)
+        return user.enriched_tasks()
     except Exception as e:
         logger.error(f"获取任务失败: {e}")
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_task_by_id(task_id: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
     """根据ID获取特定任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
-        user.get_info_about()  # 刷新数据
-        task_info = user.tool_get_task_info(task_id)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        task_info = user.snapshot.tasks_by_id.get(task_id)
         if task_info:
             return enhance_tasks_with_names(user, task_info)
         else:
@@ -183,28 +422,32 @@ def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
         return {"error": str(e)}
 
 @mcp.tool()
-def get_all_projects() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_all_projects(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取所有项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         return user.tool_get_project_info()
     except Exception as e:
         logger.error(f"获取项目失败: {e}")
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_project_by_id(project_id: str) -> Optional[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_project_by_id(project_id: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
     """根据ID获取特定项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
-        user.get_info_about()  # 刷新数据
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         project_info = user.tool_get_project_info(project_id)
         return project_info if project_info else {"error": f"未找到ID为{project_id}的项目"}
     except Exception as e:
@@ -212,24 +455,26 @@ def get_project_by_id(project_id: str) -> Optional[Dict[str, Any]]:
         return {"error": str(e)}
 
 @mcp.tool()
-def get_all_tags() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_all_tags(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取所有标签"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         return user.tool_get_tag_info()
     except Exception as e:
         logger.error(f"获取标签失败: {e}")
         return [{"error": str(e)}]
 
 @mcp.tool()
-def create_simple_task(title: str, content: str = "", project_id: str = "") -> str:
+async def create_simple_task(title: str, content: str = "", project_id: str = "") -> str:
     """创建简单任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
@@ -241,7 +486,7 @@ def create_simple_task(title: str, content: str = "", project_id: str = "") -> s
             builder.project(project_id)
         
         task = builder.build()
-        result = user.add_task(task)
+        result = await user.add_task(task)
         
         if result:
             return f"任务'{title}'创建成功"
@@ -252,7 +497,7 @@ def create_simple_task(title: str, content: str = "", project_id: str = "") -> s
         return f"创建任务失败: {str(e)}"
 
 @mcp.tool()
-def create_advanced_task(
+async def create_advanced_task(
     title: str,
     content: str = "",
     project_id: str = "",
@@ -263,7 +508,7 @@ def create_advanced_task(
 ) -> str:
     """创建高级任务（支持更多参数）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
@@ -284,7 +529,7 @@ def create_advanced_task(
             builder.tag(*tags)
         
         task = builder.build()
-        result = user.add_task(task)
+        result = await user.add_task(task)
         
         if result:
             return f"高级任务'{title}'创建成功"
@@ -295,18 +540,20 @@ def create_advanced_task(
         return f"创建高级任务失败: {str(e)}"
 
 @mcp.tool()
-def delete_task_by_id(task_id: str) -> str:
+async def delete_task_by_id(task_id: str) -> str:
     """根据ID删除任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
-        result = user.remove_task(task)
+        result = await user.remove_task(task)
         if result:
             return f"任务'{task.title}'删除成功"
         else:
@@ -316,18 +563,24 @@ def delete_task_by_id(task_id: str) -> str:
         return f"删除任务失败: {str(e)}"
 
 @mcp.tool()
-def delete_task_by_title(title: str) -> str:
+async def delete_task_by_title(title: str) -> str:
     """根据标题删除任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
-        task = user.find_task_by_title(title)
-        if not task:
-            return f"未找到标题为'{title}'的任务"
+        await user.refresh()  # 确保基于最新数据查找
+        
+        # 删除操作只接受标题完全一致的任务，相近的标题只作为候选列出
+        task, _, matches = user.resolve_task_by_title(title)
+        if not task or task.title != title:
+            if not matches:
+                return f"未找到标题为'{title}'的任务"
+            candidates = "、".join(f"'{candidate.title}'(ID: {candidate.id}, {score:.2f})" for candidate, score in matches)
+            return f"未找到标题为'{title}'的任务，相近的有: {candidates}。确认后可使用 delete_task_by_id 按ID删除"
         
-        result = user.remove_task(task)
+        result = await user.remove_task(task)
         if result:
             return f"任务'{title}'删除成功"
         else:
@@ -337,19 +590,21 @@ def delete_task_by_title(title: str) -> str:
         return f"删除任务失败: {str(e)}"
 
 @mcp.tool()
-def update_task_status(task_id: str, status: int) -> str:
+async def update_task_status(task_id: str, status: int) -> str:
     """更新任务状态 (0=未完成，1=已完成，2=已归档)"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         task.status = status
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         status_text = {0: "未完成", 1: "已完成", 2: "已归档"}.get(status, "未知状态")
         
@@ -362,20 +617,22 @@ def update_task_status(task_id: str, status: int) -> str:
         return f"更新任务状态失败: {str(e)}"
 
 @mcp.tool()
-def update_task_title(task_id: str, new_title: str) -> str:
+async def update_task_title(task_id: str, new_title: str) -> str:
     """更新任务标题"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         old_title = task.title
         task.title = new_title
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             return f"任务标题从'{old_title}'更新为'{new_title}'"
@@ -386,7 +643,7 @@ def update_task_title(task_id: str, new_title: str) -> str:
         return f"更新任务标题失败: {str(e)}"
 
 @mcp.tool()
-def update_advanced_task(
+async def update_advanced_task(
     task_id: str,
     title: str = "",
     content: str = "",
@@ -400,10 +657,12 @@ def update_advanced_task(
 ) -> str:
     """高级任务修改功能（支持修改多个属性）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
@@ -488,7 +747,7 @@ def update_advanced_task(
         if not changes:
             return "没有提供任何要修改的内容"
         
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             changes_text = "、".join(changes)
@@ -500,26 +759,25 @@ def update_advanced_task(
         return f"高级修改任务失败: {str(e)}"
 
 @mcp.tool()
-def update_task_project(task_id: str, project_id: str) -> str:
+async def update_task_project(task_id: str, project_id: str) -> str:
     """修改任务所属项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         # 获取项目名称用于显示
-        project_name = "未知项目"
-        for project in user.projects:
-            if project.id == project_id:
-                project_name = project.name
-                break
+        project = user.find_project_by_id(project_id)
+        project_name = project.name if project else "未知项目"
         
         task.projectId = project_id
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             return f"任务'{task.title}'已移动到项目'{project_name}'"
@@ -530,19 +788,21 @@ def update_task_project(task_id: str, project_id: str) -> str:
         return f"修改任务项目失败: {str(e)}"
 
 @mcp.tool()
-def update_task_tags(task_id: str, tags: List[str]) -> str:
+async def update_task_tags(task_id: str, tags: List[str]) -> str:
     """修改任务标签"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         task.tags = tags
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             if tags:
@@ -556,20 +816,22 @@ def update_task_tags(task_id: str, tags: List[str]) -> str:
         return f"修改任务标签失败: {str(e)}"
 
 @mcp.tool()
-def update_task_due_date(task_id: str, due_date: str) -> str:
+async def update_task_due_date(task_id: str, due_date: str) -> str:
     """修改任务截止时间"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         if due_date.lower() == "clear":
             task.dueDate = None
-            result = user.modify_task(task)
+            result = await user.modify_task(task)
             if result:
                 return f"任务'{task.title}'截止时间已清除"
             else:
@@ -578,7 +840,7 @@ def update_task_due_date(task_id: str, due_date: str) -> str:
             from dateutil import parser
             try:
                 task.dueDate = parser.parse(due_date).isoformat()
-                result = user.modify_task(task)
+                result = await user.modify_task(task)
                 if result:
                     return f"任务'{task.title}'截止时间已设置为: {due_date}"
                 else:
@@ -590,20 +852,22 @@ def update_task_due_date(task_id: str, due_date: str) -> str:
         return f"修改任务截止时间失败: {str(e)}"
 
 @mcp.tool()
-def update_task_start_date(task_id: str, start_date: str) -> str:
+async def update_task_start_date(task_id: str, start_date: str) -> str:
     """修改任务开始时间"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         if start_date.lower() == "clear":
             task.startDate = None
-            result = user.modify_task(task)
+            result = await user.modify_task(task)
             if result:
                 return f"任务'{task.title}'开始时间已清除"
             else:
@@ -611,7 +875,7 @@ def update_task_start_date(task_id: str, start_date: str) -> str:
         elif start_date.lower() == "today":
             from datetime import datetime
             task.startDate = datetime.now().isoformat()
-            result = user.modify_task(task)
+            result = await user.modify_task(task)
             if result:
                 return f"任务'{task.title}'开始时间已设置为今天"
             else:
@@ -620,7 +884,7 @@ def update_task_start_date(task_id: str, start_date: str) -> str:
             from dateutil import parser
             try:
                 task.startDate = parser.parse(start_date).isoformat()
-                result = user.modify_task(task)
+                result = await user.modify_task(task)
                 if result:
                     return f"任务'{task.title}'开始时间已设置为: {start_date}"
                 else:
@@ -632,20 +896,22 @@ def update_task_start_date(task_id: str, start_date: str) -> str:
         return f"修改任务开始时间失败: {str(e)}"
 
 @mcp.tool()
-def update_task_priority(task_id: str, priority: int) -> str:
+async def update_task_priority(task_id: str, priority: int) -> str:
     """修改任务优先级 (0=无，1=低，2=中低，3=中，4=中高，5=高)"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         priority = min(max(0, priority), 5)
         task.priority = priority
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         priority_text = {0: "无", 1: "低", 2: "中低", 3: "中", 4: "中高", 5: "高"}.get(priority, str(priority))
         
@@ -658,19 +924,21 @@ def update_task_priority(task_id: str, priority: int) -> str:
         return f"修改任务优先级失败: {str(e)}"
 
 @mcp.tool()
-def update_task_content(task_id: str, content: str) -> str:
+async def update_task_content(task_id: str, content: str) -> str:
     """修改任务内容/描述"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         task.content = content
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             if content:
@@ -684,20 +952,22 @@ def update_task_content(task_id: str, content: str) -> str:
         return f"修改任务内容失败: {str(e)}"
 
 @mcp.tool()
-def update_task_progress(task_id: str, progress: int) -> str:
+async def update_task_progress(task_id: str, progress: int) -> str:
     """修改任务进度 (0-100)"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         progress = min(max(0, progress), 100)
         task.progress = progress
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             return f"任务'{task.title}'进度已设置为: {progress}%"
@@ -708,20 +978,22 @@ def update_task_progress(task_id: str, progress: int) -> str:
         return f"修改任务进度失败: {str(e)}"
 
 @mcp.tool()
-def complete_task(task_id: str) -> str:
+async def complete_task(task_id: str) -> str:
     """标记任务为已完成"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         task.status = 1
         task.progress = 100
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             return f"任务'{task.title}'已标记为完成"
@@ -732,19 +1004,21 @@ def complete_task(task_id: str) -> str:
         return f"完成任务失败: {str(e)}"
 
 @mcp.tool()
-def reopen_task(task_id: str) -> str:
+async def reopen_task(task_id: str) -> str:
     """重新打开已完成的任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
         task.status = 0
-        result = user.modify_task(task)
+        result = await user.modify_task(task)
         
         if result:
             return f"任务'{task.title}'已重新打开"
@@ -755,43 +1029,145 @@ def reopen_task(task_id: str) -> str:
         return f"重新打开任务失败: {str(e)}"
 
 @mcp.tool()
-def search_tasks_by_title(keyword: str) -> List[Dict[str, Any]]:
-    """根据关键词搜索任务"""
+@compact_output
+@serve_stale
+async def search_tasks_by_title(keyword: str, force_refresh: bool = False, limit: int = 0, cursor: str = "") -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """根据关键词搜索任务
+
+    指定 limit 或 cursor 时分页返回 {"total", "version", "nextCursor", "tasks"}，用法同 get_all_tasks。
+
+    Args:
+        keyword: 标题中包含的关键词（不区分大小写）
+        force_refresh: 是否强制从服务器刷新数据
+        limit: 每页返回的任务数，为 0 且没有 cursor 时不分页、返回全部匹配的任务
+        cursor: 上一页返回的 nextCursor
+    """
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         # 搜索包含关键词的任务
-        matching_tasks = []
-        for task in all_tasks:
-            if keyword.lower() in task.get('title', '').lower():
-                matching_tasks.append(task)
+        def matching_tasks(snapshot):
+            return [task for task in snapshot.tasks if keyword.lower() in (task.title or '').lower()]
         
-        return enhance_tasks_with_names(user, matching_tasks)
+        if limit or cursor:
+            return paged_tasks(user, ("title", keyword.lower()), matching_tasks, limit, cursor)
+        return enhance_tasks_with_names(user, matching_tasks(user.snapshot))
     except Exception as e:
         logger.error(f"搜索任务失败: {e}")
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_tasks_by_project(project_id: str) -> List[Dict[str, Any]]:
-    """获取指定项目的所有任务"""
+@compact_output
+@serve_stale
+async def search_tasks(query: str, limit: int = 20, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    """全文检索任务（标题、内容、检查项），按相关度排序返回，附带得分和命中片段
+
+    中文按相邻两字匹配，英文按单词匹配，多个词之间为“或”关系，同时命中的词越多排名越靠前。
+    """
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        results = user.search_tasks(query, max(limit, 1))
+        
+        enhanced = enhance_tasks_with_names(user, [task for task, _, _ in results])
+        return [dict(task, searchScore=round(score, 3), snippet=snippet)
+                for task, (_, score, snippet) in zip(enhanced, results)]
+    except Exception as e:
+        logger.error(f"全文检索任务失败: {e}")
+        return [{"error": str(e)}]
+
+@mcp.tool()
+@serve_stale
+async def autocomplete(prefix: str, kind: str = "all", limit: int = 10, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    """按前缀补全项目名、标签名和任务标题，只返回类型、ID和名称，用于在不列出全部数据的情况下找到准确的名称
+
+    kind 可选 all/project/tag/task；名称中任意一个词的开头都可以匹配，安装 pypinyin 后还支持拼音和拼音首字母。
+    """
+    try:
+        if kind not in ("all", "project", "tag", "task"):
+            return [{"error": f"不支持的类型: {kind}，可选 all/project/tag/task"}]
+        user = await get_user_instance()
+        if not user.token:
+            return [{"error": "请先设置token"}]
+        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        return user.autocomplete(prefix, kind, max(limit, 1))
+    except Exception as e:
+        logger.error(f"自动补全失败: {e}")
+        return [{"error": str(e)}]
+
+@mcp.tool()
+@compact_output
+@serve_stale
+async def query_tasks(query: str, sort: str = "", limit: int = 50, force_refresh: bool = False) -> Dict[str, Any]:
+    """用一个查询表达式筛选任务，自动选择最合适的索引，代替多次调用按项目/标签/状态/日期获取任务的工具
+
+    query 由空格分隔的条件组成，全部同时满足，条件前加 - 表示取反，值含空格时用引号括起来：
+      status:pending|completed|archived   priority>=3、priority:1..3（none/low/medium/high）
+      project:名称或ID（逗号分隔为任一）    tag:a,b（任一）、tag:a+b（同时包含）
+      due<today、due:2025-06-01..2025-06-30、due>=+7d、due<now、due:none；start 写法同 due
+      text:关键词 或直接写关键词（全文检索，所有词都要命中）
+    例如 "status:pending due<now tag:重要"、"project:工作 priority>=3 周报"
+
+    Args:
+        query: 查询表达式
+        sort: 排序字段 due/start/priority/status/title/created/modified/score，前加 - 为降序，逗号分隔多个；
+              默认有关键词时按相关度，否则按截止时间
+        limit: 最多返回的任务数
+        force_refresh: 是否强制从服务器刷新数据
+    """
+    try:
+        user = await get_user_instance()
+        if not user.token:
+            return {"error": "请先设置token"}
+        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        try:
+            tasks, total, plan, scores = user.find_tasks(query, sort or None, max(limit, 0))
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        results = []
+        for task in enhance_tasks_with_names(user, tasks):
+            if task["id"] in scores:
+                task = dict(task, searchScore=round(scores[task["id"]], 3))
+            results.append(task)
+        return {"total": total, "plan": plan, "tasks": results}
+    except Exception as e:
+        logger.error(f"查询任务失败: {e}")
+        return {"error": str(e)}
+
+@mcp.tool()
+@compact_output
+@serve_stale
+async def get_tasks_by_project(project_id: str, force_refresh: bool = False, limit: int = 0, cursor: str = "") -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """获取指定项目的所有任务
+
+    指定 limit 或 cursor 时分页返回 {"total", "version", "nextCursor", "tasks"}，用法同 get_all_tasks。
+
+    Args:
+        project_id: 项目ID
+        force_refresh: 是否强制从服务器刷新数据
+        limit: 每页返回的任务数，为 0 且没有 cursor 时不分页、返回全部任务
+        cursor: 上一页返回的 nextCursor
+    """
+    try:
+        user = await get_user_instance()
+        if not user.token:
+            return [{"error": "请先设置token"}]
         
-        # 筛选指定项目的任务
-        project_tasks = []
-        for task in all_tasks:
-            if task.get('projectId') == project_id:
-                project_tasks.append(task)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        # 通过项目索引直接获取（启用 SQLite 副本时为索引查询），无需遍历全部任务
+        if limit or cursor:
+            return paged_tasks(user, ("project", project_id),
+                               lambda snapshot: user.query_tasks(project_id=project_id, snapshot=snapshot), limit, cursor)
+        project_tasks = user.query_tasks(project_id=project_id)
         
         return enhance_tasks_with_names(user, project_tasks)
     except Exception as e:
@@ -799,21 +1175,18 @@ def get_tasks_by_project(project_id: str) -> List[Dict[str, Any]]:
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_completed_tasks() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_completed_tasks(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取所有已完成的任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         # 筛选已完成的任务 (status = 1)
-        completed_tasks = []
-        for task in all_tasks:
-            if task.get('status') == 1:
-                completed_tasks.append(task)
+        completed_tasks = user.query_tasks(status=1)
         
         return enhance_tasks_with_names(user, completed_tasks)
     except Exception as e:
@@ -821,21 +1194,18 @@ def get_completed_tasks() -> List[Dict[str, Any]]:
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_pending_tasks() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_pending_tasks(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取所有待完成的任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         # 筛选待完成的任务 (status = 0)
-        pending_tasks = []
-        for task in all_tasks:
-            if task.get('status') == 0:
-                pending_tasks.append(task)
+        pending_tasks = user.query_tasks(status=0)
         
         return enhance_tasks_with_names(user, pending_tasks)
     except Exception as e:
@@ -845,7 +1215,7 @@ def get_pending_tasks() -> List[Dict[str, Any]]:
 # ========== 项目管理工具 ==========
 
 @mcp.tool()
-def create_project(
+async def create_project(
     name: str,
     color: str = "",
     group_id: str = "",
@@ -855,7 +1225,7 @@ def create_project(
 ) -> str:
     """创建新项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
@@ -874,7 +1244,7 @@ def create_project(
             builder.team(team_id)
         
         project = builder.build()
-        result = user.add_project(project)
+        result = await user.add_project(project)
         
         if result:
             return f"项目'{name}'创建成功"
@@ -885,18 +1255,20 @@ def create_project(
         return f"创建项目失败: {str(e)}"
 
 @mcp.tool()
-def delete_project_by_id(project_id: str) -> str:
+async def delete_project_by_id(project_id: str) -> str:
     """根据ID删除项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 先获取项目信息用于显示
         project = user.find_project_by_id(project_id)
         project_name = project.name if project else f"ID为{project_id}的项目"
         
-        result = user.remove_project(project_id)
+        result = await user.remove_project(project_id)
         if result:
             return f"项目'{project_name}'删除成功"
         else:
@@ -906,18 +1278,20 @@ def delete_project_by_id(project_id: str) -> str:
         return f"删除项目失败: {str(e)}"
 
 @mcp.tool()
-def delete_project_by_name(name: str) -> str:
+async def delete_project_by_name(name: str) -> str:
     """根据名称删除项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         project = user.find_project_by_name(name)
         if not project:
             return f"未找到名称为'{name}'的项目"
         
-        result = user.remove_project(project.id)
+        result = await user.remove_project(project.id)
         if result:
             return f"项目'{name}'删除成功"
         else:
@@ -927,20 +1301,22 @@ def delete_project_by_name(name: str) -> str:
         return f"删除项目失败: {str(e)}"
 
 @mcp.tool()
-def update_project_name(project_id: str, new_name: str) -> str:
+async def update_project_name(project_id: str, new_name: str) -> str:
     """修改项目名称"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         project = user.find_project_by_id(project_id)
         if not project:
             return f"未找到ID为{project_id}的项目"
         
         old_name = project.name
         project.name = new_name
-        result = user.modify_project(project)
+        result = await user.modify_project(project)
         
         if result:
             return f"项目名称从'{old_name}'更新为'{new_name}'"
@@ -951,19 +1327,21 @@ def update_project_name(project_id: str, new_name: str) -> str:
         return f"更新项目名称失败: {str(e)}"
 
 @mcp.tool()
-def update_project_color(project_id: str, color: str) -> str:
+async def update_project_color(project_id: str, color: str) -> str:
     """修改项目颜色"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         project = user.find_project_by_id(project_id)
         if not project:
             return f"未找到ID为{project_id}的项目"
         
         project.color = color
-        result = user.modify_project(project)
+        result = await user.modify_project(project)
         
         if result:
             return f"项目'{project.name}'颜色已更新为'{color}'"
@@ -974,13 +1352,15 @@ def update_project_color(project_id: str, color: str) -> str:
         return f"更新项目颜色失败: {str(e)}"
 
 @mcp.tool()
-def update_project_view_mode(project_id: str, view_mode: str) -> str:
+async def update_project_view_mode(project_id: str, view_mode: str) -> str:
     """修改项目视图模式 (list/kanban)"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         if view_mode not in ["list", "kanban"]:
             return "视图模式只能是 'list' 或 'kanban'"
         
@@ -989,7 +1369,7 @@ def update_project_view_mode(project_id: str, view_mode: str) -> str:
             return f"未找到ID为{project_id}的项目"
         
         project.viewMode = view_mode
-        result = user.modify_project(project)
+        result = await user.modify_project(project)
         
         if result:
             return f"项目'{project.name}'视图模式已更新为'{view_mode}'"
@@ -1000,7 +1380,7 @@ def update_project_view_mode(project_id: str, view_mode: str) -> str:
         return f"更新项目视图模式失败: {str(e)}"
 
 @mcp.tool()
-def update_advanced_project(
+async def update_advanced_project(
     project_id: str,
     name: str = "",
     color: str = "",
@@ -1011,10 +1391,12 @@ def update_advanced_project(
 ) -> str:
     """高级项目修改功能（支持修改多个属性）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         project = user.find_project_by_id(project_id)
         if not project:
             return f"未找到ID为{project_id}的项目"
@@ -1058,7 +1440,7 @@ def update_advanced_project(
         if not changes:
             return "没有提供任何要修改的内容"
         
-        result = user.modify_project(project)
+        result = await user.modify_project(project)
         
         if result:
             changes_text = "、".join(changes)
@@ -1070,19 +1452,26 @@ def update_advanced_project(
         return f"高级修改项目失败: {str(e)}"
 
 @mcp.tool()
-def find_project_by_name(name: str) -> Optional[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def find_project_by_name(name: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
     """根据名称查找项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
-        user.get_info_about()  # 刷新数据
-        project = user.find_project_by_name(name)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        project, confidence, matches = user.resolve_project_by_name(name)
         if project:
-            return project.to_dict()
+            result = project.to_dict()
+            if match_note(name, project, confidence):
+                # 按相近名称匹配到的项目，附带置信度
+                result['matchConfidence'] = round(confidence, 2)
+            return result
         else:
-            return {"error": f"未找到名称为'{name}'的项目"}
+            return {"error": f"未找到名称为'{name}'的项目",
+                    "candidates": [{"id": p.id, "name": p.name, "similarity": round(score, 2)} for p, score in matches]}
     except Exception as e:
         logger.error(f"查找项目失败: {e}")
         return {"error": str(e)}
@@ -1090,7 +1479,7 @@ def find_project_by_name(name: str) -> Optional[Dict[str, Any]]:
 # ========== 标签管理工具 ==========
 
 @mcp.tool()
-def create_tag(
+async def create_tag(
     name: str,
     color: str = "",
     sort_order: int = 0,
@@ -1099,7 +1488,7 @@ def create_tag(
 ) -> str:
     """创建新标签"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
@@ -1116,7 +1505,7 @@ def create_tag(
             builder.sort_type(sort_type)
         
         tag = builder.build()
-        result = user.add_tag(tag)
+        result = await user.add_tag(tag)
         
         if result:
             return f"标签'{name}'创建成功"
@@ -1127,19 +1516,21 @@ def create_tag(
         return f"创建标签失败: {str(e)}"
 
 @mcp.tool()
-def delete_tag_by_name(name: str) -> str:
+async def delete_tag_by_name(name: str) -> str:
     """根据名称删除标签"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 先检查标签是否存在
         tag = user.find_tag_by_name(name)
         if not tag:
             return f"未找到名称为'{name}'的标签"
         
-        result = user.remove_tag(name)
+        result = await user.remove_tag(name)
         if result:
             return f"标签'{name}'删除成功"
         else:
@@ -1149,20 +1540,22 @@ def delete_tag_by_name(name: str) -> str:
         return f"删除标签失败: {str(e)}"
 
 @mcp.tool()
-def update_tag_name(old_name: str, new_name: str) -> str:
+async def update_tag_name(old_name: str, new_name: str) -> str:
     """修改标签名称"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         tag = user.find_tag_by_name(old_name)
         if not tag:
             return f"未找到名称为'{old_name}'的标签"
         
         tag.name = new_name
         tag.label = new_name
-        result = user.modify_tag(tag)
+        result = await user.modify_tag(tag)
         
         if result:
             return f"标签名称从'{old_name}'更新为'{new_name}'"
@@ -1173,19 +1566,21 @@ def update_tag_name(old_name: str, new_name: str) -> str:
         return f"更新标签名称失败: {str(e)}"
 
 @mcp.tool()
-def update_tag_color(name: str, color: str) -> str:
+async def update_tag_color(name: str, color: str) -> str:
     """修改标签颜色"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         tag = user.find_tag_by_name(name)
         if not tag:
             return f"未找到名称为'{name}'的标签"
         
         tag.color = color
-        result = user.modify_tag(tag)
+        result = await user.modify_tag(tag)
         
         if result:
             return f"标签'{name}'颜色已更新为'{color}'"
@@ -1196,7 +1591,7 @@ def update_tag_color(name: str, color: str) -> str:
         return f"更新标签颜色失败: {str(e)}"
 
 @mcp.tool()
-def update_advanced_tag(
+async def update_advanced_tag(
     name: str,
     new_name: str = "",
     color: str = "",
@@ -1206,10 +1601,12 @@ def update_advanced_tag(
 ) -> str:
     """高级标签修改功能（支持修改多个属性）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         tag = user.find_tag_by_name(name)
         if not tag:
             return f"未找到名称为'{name}'的标签"
@@ -1246,7 +1643,7 @@ def update_advanced_tag(
         if not changes:
             return "没有提供任何要修改的内容"
         
-        result = user.modify_tag(tag)
+        result = await user.modify_tag(tag)
         
         if result:
             changes_text = "、".join(changes)
@@ -1258,40 +1655,43 @@ def update_advanced_tag(
         return f"高级修改标签失败: {str(e)}"
 
 @mcp.tool()
-def find_tag_by_name(name: str) -> Optional[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def find_tag_by_name(name: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
     """根据名称查找标签"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
-        user.get_info_about()  # 刷新数据
-        tag = user.find_tag_by_name(name)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        tag, confidence, matches = user.resolve_tag_by_name(name)
         if tag:
-            return tag.to_dict()
+            result = tag.to_dict()
+            if match_note(name, tag, confidence):
+                # 按相近名称匹配到的标签，附带置信度
+                result['matchConfidence'] = round(confidence, 2)
+            return result
         else:
-            return {"error": f"未找到名称为'{name}'的标签"}
+            return {"error": f"未找到名称为'{name}'的标签",
+                    "candidates": [{"name": t.name, "similarity": round(score, 2)} for t, score in matches]}
     except Exception as e:
         logger.error(f"查找标签失败: {e}")
         return {"error": str(e)}
 
 @mcp.tool()
-def get_tasks_by_tag(tag_name: str) -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_tasks_by_tag(tag_name: str, force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取包含指定标签的所有任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
-        # 筛选包含指定标签的任务
-        tagged_tasks = []
-        for task in all_tasks:
-            task_tags = task.get('tags', [])
-            if tag_name in task_tags:
-                tagged_tasks.append(task)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        # 通过标签索引直接获取（启用 SQLite 副本时为索引查询），无需遍历全部任务
+        tagged_tasks = user.query_tasks(tag=tag_name)
         
         return enhance_tasks_with_names(user, tagged_tasks)
     except Exception as e:
@@ -1299,22 +1699,18 @@ def get_tasks_by_tag(tag_name: str) -> List[Dict[str, Any]]:
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_high_priority_tasks() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_high_priority_tasks(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取高优先级任务（优先级4-5）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
         # 筛选高优先级任务
-        high_priority_tasks = []
-        for task in all_tasks:
-            priority = task.get('priority', 0)
-            if priority >= 4:
-                high_priority_tasks.append(task)
+        high_priority_tasks = user.query_tasks(min_priority=4)
         
         return enhance_tasks_with_names(user, high_priority_tasks)
     except Exception as e:
@@ -1322,31 +1718,18 @@ def get_high_priority_tasks() -> List[Dict[str, Any]]:
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_overdue_tasks() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_overdue_tasks(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取已过期的任务"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
-        from datetime import datetime
-        now = datetime.now()
-        
-        # 筛选已过期的任务
-        overdue_tasks = []
-        for task in all_tasks:
-            due_date = task.get('dueDate')
-            if due_date and task.get('status', 0) == 0:  # 未完成且有截止时间
-                try:
-                    from dateutil import parser
-                    due_datetime = parser.parse(due_date)
-                    if due_datetime < now:
-                        overdue_tasks.append(task)
-                except:
-                    continue
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        # 基于截止时间索引查找已过截止时间且未完成的任务，不再逐个解析日期字符串
+        overdue_tasks = user.query_tasks(status=0, due_before=time.time())
         
         return enhance_tasks_with_names(user, overdue_tasks)
     except Exception as e:
@@ -1354,49 +1737,18 @@ def get_overdue_tasks() -> List[Dict[str, Any]]:
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_today_tasks() -> List[Dict[str, Any]]:
+@compact_output
+@serve_stale
+async def get_today_tasks(force_refresh: bool = False) -> List[Dict[str, Any]]:
     """获取今天的任务（开始时间或截止时间在今天）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return [{"error": "请先设置token"}]
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        
-        from datetime import datetime, date
-        today = date.today()
-        
-        # 筛选今天的任务
-        today_tasks = []
-        for task in all_tasks:
-            start_date = task.get('startDate')
-            due_date = task.get('dueDate')
-            
-            is_today_task = False
-            
-            # 检查开始时间
-            if start_date:
-                try:
-                    from dateutil import parser
-                    start_datetime = parser.parse(start_date)
-                    if start_datetime.date() == today:
-                        is_today_task = True
-                except:
-                    pass
-            
-            # 检查截止时间
-            if due_date and not is_today_task:
-                try:
-                    from dateutil import parser
-                    due_datetime = parser.parse(due_date)
-                    if due_datetime.date() == today:
-                        is_today_task = True
-                except:
-                    pass
-            
-            if is_today_task:
-                today_tasks.append(task)
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        # 基于开始/截止时间索引查找今天范围内的任务
+        today_tasks = user.today_tasks()
         
         return enhance_tasks_with_names(user, today_tasks)
     except Exception as e:
@@ -1404,57 +1756,104 @@ def get_today_tasks() -> List[Dict[str, Any]]:
         return [{"error": str(e)}]
 
 @mcp.tool()
-def get_task_statistics() -> Dict[str, Any]:
+@compact_output
+@serve_stale
+async def get_upcoming_tasks(days: int = 7, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    """获取今后若干天内到期的未完成任务（按截止时间排序）
+    
+    Args:
+        days: 向后查看的天数，默认7天
+        force_refresh: 是否强制从服务器刷新数据
+    """
+    try:
+        user = await get_user_instance()
+        if not user.token:
+            return [{"error": "请先设置token"}]
+        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        upcoming_tasks = user.upcoming_tasks(days)
+        
+        return enhance_tasks_with_names(user, upcoming_tasks)
+    except Exception as e:
+        logger.error(f"获取即将到期任务失败: {e}")
+        return [{"error": str(e)}]
+
+@mcp.tool()
+@compact_output
+@serve_stale
+async def get_tasks_by_date_range(start_date: str, end_date: str, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    """获取截止时间在指定日期范围内的任务（按截止时间排序）
+    
+    Args:
+        start_date: 开始日期，如 "2025-05-01"，包含当天
+        end_date: 结束日期，如 "2025-05-31"，包含当天
+        force_refresh: 是否强制从服务器刷新数据
+    """
+    try:
+        user = await get_user_instance()
+        if not user.token:
+            return [{"error": "请先设置token"}]
+        
+        from dateutil import parser
+        start, _ = api.day_range(parser.parse(start_date).date())
+        _, end = api.day_range(parser.parse(end_date).date())
+        
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        tasks = user.tasks_due_between(start, end)
+        
+        return enhance_tasks_with_names(user, tasks)
+    except Exception as e:
+        logger.error(f"按日期范围获取任务失败: {e}")
+        return [{"error": str(e)}]
+
+
+def merge_status_counts(target, counts):
+    """把 {状态: 任务数} 累加到 {"总数", "已完成", "待完成", "已归档"} 形式的明细中"""
+    target["总数"] = target.get("总数", 0) + sum(counts.values())
+    for status, label in ((1, "已完成"), (0, "待完成"), (2, "已归档")):
+        target[label] = target.get(label, 0) + counts.get(status, 0)
+    return target
+
+
+@mcp.tool()
+@serve_stale
+async def get_task_statistics(force_refresh: bool = False) -> Dict[str, Any]:
     """获取任务统计信息"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
+        await serve_read(user, force_refresh)  # 刷新数据（过期不久的数据直接返回并在后台刷新）
+        stats = user.task_statistics()  # 随快照增量维护的统计，不遍历任务
         
         # 统计信息
-        total_tasks = len(all_tasks)
-        completed_tasks = len([t for t in all_tasks if t.get('status') == 1])
-        pending_tasks = len([t for t in all_tasks if t.get('status') == 0])
-        archived_tasks = len([t for t in all_tasks if t.get('status') == 2])
+        total_tasks = stats["total"]
+        completed_tasks = stats["by_status"].get(1, 0)
+        pending_tasks = stats["by_status"].get(0, 0)
+        archived_tasks = stats["by_status"].get(2, 0)
         
         # 优先级统计
-        priority_stats = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        for task in all_tasks:
-            priority = task.get('priority', 0)
-            priority_stats[priority] += 1
+        priority_stats = stats["by_priority"]
         
-        # 项目统计
+        # 项目统计（按项目名称合并，附带各状态的明细）
         project_stats = {}
-        for task in all_tasks:
-            project_id = task.get('projectId', '无项目')
+        project_details = {}
+        for project_id, counts in stats["by_project"].items():
             project_name = '无项目'
-            if project_id != '无项目':
-                for project in user.projects:
-                    if project.id == project_id:
-                        project_name = project.name
-                        break
-            
-            if project_name not in project_stats:
-                project_stats[project_name] = 0
-            project_stats[project_name] += 1
+            if project_id:
+                project = user.snapshot.projects_by_id.get(project_id)
+                if project:
+                    project_name = project.name
+            project_stats[project_name] = project_stats.get(project_name, 0) + sum(counts.values())
+            merge_status_counts(project_details.setdefault(project_name, {}), counts)
+        
+        # 标签统计
+        tag_stats = {tag: sum(counts.values()) for tag, counts in stats["by_tag"].items()}
+        tag_details = {tag: merge_status_counts({}, counts) for tag, counts in stats["by_tag"].items()}
         
         # 过期任务统计
-        from datetime import datetime
-        now = datetime.now()
-        overdue_count = 0
-        for task in all_tasks:
-            due_date = task.get('dueDate')
-            if due_date and task.get('status', 0) == 0:
-                try:
-                    from dateutil import parser
-                    due_datetime = parser.parse(due_date)
-                    if due_datetime < now:
-                        overdue_count += 1
-                except:
-                    continue
+        overdue_count = stats["overdue"]
         
         return {
             "总任务数": total_tasks,
@@ -1464,14 +1863,17 @@ def get_task_statistics() -> Dict[str, Any]:
             "过期任务": overdue_count,
             "完成率": f"{(completed_tasks/total_tasks*100):.1f}%" if total_tasks > 0 else "0%",
             "优先级分布": {
-                "无优先级": priority_stats[0],
-                "低优先级": priority_stats[1],
-                "中低优先级": priority_stats[2],
-                "中优先级": priority_stats[3],
-                "中高优先级": priority_stats[4],
-                "高优先级": priority_stats[5]
+                "无优先级": priority_stats.get(0, 0),
+                "低优先级": priority_stats.get(1, 0),
+                "中低优先级": priority_stats.get(2, 0),
+                "中优先级": priority_stats.get(3, 0),
+                "中高优先级": priority_stats.get(4, 0),
+                "高优先级": priority_stats.get(5, 0)
             },
             "项目分布": project_stats,
+            "项目明细": project_details,
+            "标签分布": tag_stats,
+            "标签明细": tag_details,
             "项目总数": len(user.projects),
             "标签总数": len(user.tags)
         }
@@ -1482,13 +1884,15 @@ def get_task_statistics() -> Dict[str, Any]:
 # ========== 任务移动功能 ==========
 
 @mcp.tool()
-def move_task_to_project(task_id: str, from_project_id: str, to_project_id: str) -> str:
+async def move_task_to_project(task_id: str, from_project_id: str, to_project_id: str) -> str:
     """移动单个任务到其他项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 验证任务是否存在
         task = user.find_task_by_id(task_id)
         if not task:
@@ -1510,7 +1914,7 @@ def move_task_to_project(task_id: str, from_project_id: str, to_project_id: str)
             source_project_name = source_project.name
         
         # 执行移动操作
-        result = user.move_task_to_project(task_id, from_project_id, to_project_id)
+        result = await user.move_task_to_project(task_id, from_project_id, to_project_id)
         
         if result:
             return f"任务'{task.title}'已成功从项目'{source_project_name}'移动到项目'{target_project.name}'"
@@ -1521,37 +1925,41 @@ def move_task_to_project(task_id: str, from_project_id: str, to_project_id: str)
         return f"移动任务失败: {str(e)}"
 
 @mcp.tool()
-def move_task_to_project_by_name(task_id: str, from_project_name: str, to_project_name: str) -> str:
+async def move_task_to_project_by_name(task_id: str, from_project_name: str, to_project_name: str) -> str:
     """通过项目名称移动单个任务到其他项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 验证任务是否存在
         task = user.find_task_by_id(task_id)
         if not task:
             return f"未找到ID为{task_id}的任务"
         
-        # 查找源项目
-        source_project = user.find_project_by_name(from_project_name)
+        # 查找源项目（容忍轻微的拼写差异）
+        source_project, source_confidence, matches = user.resolve_project_by_name(from_project_name)
         if not source_project:
-            return f"未找到源项目: {from_project_name}"
+            return not_found(f"未找到源项目: {from_project_name}", matches)
         
         # 查找目标项目
-        target_project = user.find_project_by_name(to_project_name)
+        target_project, target_confidence, matches = user.resolve_project_by_name(to_project_name)
         if not target_project:
-            return f"未找到目标项目: {to_project_name}"
+            return not_found(f"未找到目标项目: {to_project_name}", matches)
+        notes = (match_note(from_project_name, source_project, source_confidence)
+                 + match_note(to_project_name, target_project, target_confidence))
         
         # 验证任务是否在源项目中
         if task.projectId != source_project.id:
-            return f"任务'{task.title}'当前不在项目'{from_project_name}'中"
+            return f"任务'{task.title}'当前不在项目'{source_project.name}'中{notes}"
         
         # 执行移动操作
-        result = user.move_task_to_project(task_id, source_project.id, target_project.id)
+        result = await user.move_task_to_project(task_id, source_project.id, target_project.id)
         
         if result:
-            return f"任务'{task.title}'已成功从项目'{from_project_name}'移动到项目'{to_project_name}'"
+            return f"任务'{task.title}'已成功从项目'{source_project.name}'移动到项目'{target_project.name}'{notes}"
         else:
             return f"移动任务'{task.title}'失败"
     except Exception as e:
@@ -1559,16 +1967,18 @@ def move_task_to_project_by_name(task_id: str, from_project_name: str, to_projec
         return f"移动任务失败: {str(e)}"
 
 @mcp.tool()
-def move_multiple_tasks_to_project(task_moves: List[Dict[str, str]]) -> str:
+async def move_multiple_tasks_to_project(task_moves: List[Dict[str, str]]) -> str:
     """批量移动多个任务到其他项目
     
     参数格式: [{"taskId": "xxx", "fromProjectId": "xxx", "toProjectId": "xxx"}, ...]
     """
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         if not task_moves or not isinstance(task_moves, list):
             return "请提供有效的任务移动列表"
         
@@ -1602,7 +2012,7 @@ def move_multiple_tasks_to_project(task_moves: List[Dict[str, str]]) -> str:
             validated_moves.append(move)
         
         # 执行批量移动
-        result = user.move_tasks_to_project(validated_moves)
+        result = await user.move_tasks_to_project(validated_moves)
         
         if result:
             return f"成功批量移动 {len(validated_moves)} 个任务"
@@ -1613,13 +2023,15 @@ def move_multiple_tasks_to_project(task_moves: List[Dict[str, str]]) -> str:
         return f"批量移动任务失败: {str(e)}"
 
 @mcp.tool()
-def move_all_tasks_from_project(from_project_id: str, to_project_id: str) -> str:
+async def move_all_tasks_from_project(from_project_id: str, to_project_id: str) -> str:
     """将一个项目中的所有任务移动到另一个项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 验证源项目和目标项目存在
         source_project = user.find_project_by_id(from_project_id)
         if not source_project:
@@ -1630,9 +2042,7 @@ def move_all_tasks_from_project(from_project_id: str, to_project_id: str) -> str
             return f"未找到目标项目ID: {to_project_id}"
         
         # 获取源项目中的所有任务
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        source_tasks = [task for task in all_tasks if task.get('projectId') == from_project_id]
+        source_tasks = [task.to_dict() for task in user.tasks_in_project(from_project_id)]
         
         if not source_tasks:
             return f"项目'{source_project.name}'中没有任务需要移动"
@@ -1647,7 +2057,7 @@ def move_all_tasks_from_project(from_project_id: str, to_project_id: str) -> str
             })
         
         # 执行批量移动
-        result = user.move_tasks_to_project(task_moves)
+        result = await user.move_tasks_to_project(task_moves)
         
         if result:
             return f"成功将 {len(source_tasks)} 个任务从项目'{source_project.name}'移动到项目'{target_project.name}'"
@@ -1658,36 +2068,42 @@ def move_all_tasks_from_project(from_project_id: str, to_project_id: str) -> str
         return f"移动项目任务失败: {str(e)}"
 
 @mcp.tool()
-def move_all_tasks_from_project_by_name(from_project_name: str, to_project_name: str) -> str:
+async def move_all_tasks_from_project_by_name(from_project_name: str, to_project_name: str) -> str:
     """通过项目名称将一个项目中的所有任务移动到另一个项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
-        # 查找源项目和目标项目
-        source_project = user.find_project_by_name(from_project_name)
+        await user.refresh()  # 确保基于最新数据查找
+        
+        # 查找源项目和目标项目（容忍轻微的拼写差异）
+        source_project, source_confidence, matches = user.resolve_project_by_name(from_project_name)
         if not source_project:
-            return f"未找到源项目: {from_project_name}"
+            return not_found(f"未找到源项目: {from_project_name}", matches)
         
-        target_project = user.find_project_by_name(to_project_name)
+        target_project, target_confidence, matches = user.resolve_project_by_name(to_project_name)
         if not target_project:
-            return f"未找到目标项目: {to_project_name}"
+            return not_found(f"未找到目标项目: {to_project_name}", matches)
+        notes = (match_note(from_project_name, source_project, source_confidence)
+                 + match_note(to_project_name, target_project, target_confidence))
         
         # 调用按ID移动的方法
-        return move_all_tasks_from_project(source_project.id, target_project.id)
+        return await move_all_tasks_from_project(source_project.id, target_project.id) + notes
     except Exception as e:
         logger.error(f"移动项目任务失败: {e}")
         return f"移动项目任务失败: {str(e)}"
 
 @mcp.tool()
-def move_tasks_by_tag_to_project(tag_name: str, to_project_id: str) -> str:
+async def move_tasks_by_tag_to_project(tag_name: str, to_project_id: str) -> str:
     """将包含指定标签的所有任务移动到指定项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 验证目标项目存在
         target_project = user.find_project_by_id(to_project_id)
         if not target_project:
@@ -1699,13 +2115,7 @@ def move_tasks_by_tag_to_project(tag_name: str, to_project_id: str) -> str:
             return f"未找到标签: {tag_name}"
         
         # 获取包含指定标签的所有任务
-        user.get_info_about()  # 刷新数据
-        all_tasks = user.tool_get_task_info()
-        tagged_tasks = []
-        for task in all_tasks:
-            task_tags = task.get('tags', [])
-            if tag_name in task_tags:
-                tagged_tasks.append(task)
+        tagged_tasks = [task.to_dict() for task in user.tasks_with_tag(tag_name)]
         
         if not tagged_tasks:
             return f"没有找到包含标签'{tag_name}'的任务"
@@ -1725,7 +2135,7 @@ def move_tasks_by_tag_to_project(tag_name: str, to_project_id: str) -> str:
             return f"所有包含标签'{tag_name}'的任务都已在目标项目'{target_project.name}'中"
         
         # 执行批量移动
-        result = user.move_tasks_to_project(task_moves)
+        result = await user.move_tasks_to_project(task_moves)
         
         if result:
             return f"成功将 {len(task_moves)} 个包含标签'{tag_name}'的任务移动到项目'{target_project.name}'"
@@ -1736,32 +2146,36 @@ def move_tasks_by_tag_to_project(tag_name: str, to_project_id: str) -> str:
         return f"按标签移动任务失败: {str(e)}"
 
 @mcp.tool()
-def move_tasks_by_tag_to_project_by_name(tag_name: str, to_project_name: str) -> str:
+async def move_tasks_by_tag_to_project_by_name(tag_name: str, to_project_name: str) -> str:
     """通过项目名称将包含指定标签的所有任务移动到指定项目"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 查找目标项目
         target_project = user.find_project_by_name(to_project_name)
         if not target_project:
             return f"未找到目标项目: {to_project_name}"
         
         # 调用按ID移动的方法
-        return move_tasks_by_tag_to_project(tag_name, target_project.id)
+        return await move_tasks_by_tag_to_project(tag_name, target_project.id)
     except Exception as e:
         logger.error(f"按标签移动任务失败: {e}")
         return f"按标签移动任务失败: {str(e)}"
 
 @mcp.tool()
-def get_task_move_preview(task_id: str, to_project_id: str) -> Dict[str, Any]:
+async def get_task_move_preview(task_id: str, to_project_id: str) -> Dict[str, Any]:
     """预览任务移动操作（不实际执行移动）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return {"error": "请先设置token"}
         
+        await user.refresh()  # 确保基于最新数据查找
+        
         # 验证任务存在
         task = user.find_task_by_id(task_id)
         if not task:
@@ -1821,14 +2235,14 @@ def get_task_move_preview(task_id: str, to_project_id: str) -> Dict[str, Any]:
 
 # 资源定义
 @mcp.resource("dida365://user")
-def get_user_resource() -> str:
+async def get_user_resource() -> str:
     """获取用户信息资源"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
-        user_info = user.get_user_info()
+        user_info = await user.get_user_info()
         if user_info:
             return json.dumps({
                 "name": user.name,
@@ -1842,52 +2256,85 @@ def get_user_resource() -> str:
         return f"错误: {str(e)}"
 
 @mcp.resource("dida365://tasks")
-def get_tasks_resource() -> str:
-    """获取所有任务资源"""
+@serve_stale
+async def get_tasks_resource() -> str:
+    """获取所有任务资源（任务很多时请使用 dida365://tasks/page/first 分页读取）"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
-        user.get_info_about()
-        tasks = user.tool_get_task_info()
-        enhanced_tasks = enhance_tasks_with_names(user, tasks)
-        return json.dumps(enhanced_tasks, ensure_ascii=False, indent=2)
+        await serve_read(user)
+        enhanced_tasks = user.enriched_tasks()
+        return dump_resource(enhanced_tasks)
     except Exception as e:
         return f"错误: {str(e)}"
 
+@mcp.resource("dida365://tasks/page/{cursor}")
+@serve_stale
+async def get_tasks_page_resource(cursor: str) -> str:
+    """分页读取任务资源，每页 200 个任务（RESOURCE_PAGE_SIZE）
+
+    cursor 为 first 时读取第一页，返回中的 nextUri 为下一页的地址，为 null 时表示已是最后一页。
+    """
+    try:
+        user = await get_user_instance()
+        if not user.token:
+            return "请先设置token"
+        
+        await serve_read(user)
+        page = paged_tasks(user, ("all",), lambda snapshot: snapshot.tasks, RESOURCE_PAGE_SIZE,
+                           None if cursor == "first" else cursor)
+        if "error" not in page:
+            page["nextUri"] = f"dida365://tasks/page/{page['nextCursor']}" if page["nextCursor"] else None
+        return dump_resource(page, indent=False)
+    except Exception as e:
+        return f"错误: {str(e)}"
+
+@mcp.resource("dida365://schema/short-keys")
+async def get_short_keys_resource() -> str:
+    """短键名对照表（原键名 -> 短键名），用于解读 short_keys=true 时的输出"""
+    return api.dump_json(api.SHORT_KEYS)
+
 @mcp.resource("dida365://projects")
-def get_projects_resource() -> str:
+@serve_stale
+async def get_projects_resource() -> str:
     """获取所有项目资源"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
-        user.get_info_about()
+        await serve_read(user)
         projects = user.tool_get_project_info()
-        return json.dumps(projects, ensure_ascii=False, indent=2)
+        return dump_resource(projects)
     except Exception as e:
         return f"错误: {str(e)}"
 
 @mcp.resource("dida365://tags")
-def get_tags_resource() -> str:
+@serve_stale
+async def get_tags_resource() -> str:
     """获取所有标签资源"""
     try:
-        user = get_user_instance()
+        user = await get_user_instance()
         if not user.token:
             return "请先设置token"
         
-        user.get_info_about()
+        await serve_read(user)
         tags = user.tool_get_tag_info()
-        return json.dumps(tags, ensure_ascii=False, indent=2)
+        return dump_resource(tags)
     except Exception as e:
         return f"错误: {str(e)}"
 
 
 # 健康检查的处理函数
 async def health_check(request):
-    return JSONResponse({"status": "ok"})
+    syncs = {"upstream": 0, "saved": 0}
+    for user in user_pool.users():
+        for key, value in user.sync_stats().items():
+            syncs[key] += value
+    return JSONResponse({"status": "ok", "tenants": len(user_pool), "syncs": syncs,
+                         "refresh": refresh_worker.status()})
 @contextlib.asynccontextmanager
 async def lifespan(app: Starlette):
     async with mcp.session_manager.run():
@@ -1899,10 +2346,22 @@ async def lifespan(app: Starlette):
     """
     一个 ASGI lifespan 上下文管理器。
     它会在应用启动时运行 `mcp.session_manager.run()` 来初始化任务组，
-    并在应用关闭时自动清理。
+    同时启动后台刷新任务并预加载默认账号，在应用关闭时自动清理
+    （停止后台刷新，保存本地快照，提交各租户未发送的写操作，关闭共享的 HTTP 连接池）。
     """
     async with mcp.session_manager.run():
-        yield
+        refresh_worker.start()
+        if default_token:
+            # 预先加载默认账号（有本地快照时几乎立即完成），首个请求无需等待
+            asyncio.ensure_future(user_pool.get(default_token, load_user))
+        try:
+            yield
+        finally:
+            await refresh_worker.stop()
+    for user in user_pool.users():
+        await save_snapshot(user, force=True)
+    await user_pool.close()
+    await api.close_shared_async_client()
 
 app = Starlette(
     lifespan=lifespan,
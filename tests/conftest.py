@@ -0,0 +1,143 @@
+"""测试公共部分：用内存中的假服务器代替滴答清单接口
+
+FakeDida 实现了 User 用到的 /batch/check 和 /batch/task 两个接口，
+直接作为 User 的 session（AsyncFakeDida 作为 AsyncUser 的 session）传入，不需要真实网络。
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import httpx
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 先配置日志，api 模块里的 basicConfig 不再生效，测试时不写 api.log
+logging.basicConfig(level=logging.INFO)
+
+import api
+
+
+class FakeResponse:
+    def __init__(self, data, status_code = 200):
+        self.status_code = status_code
+        self.text = json.dumps(data, ensure_ascii=False)
+
+
+class FakeDida:
+    """假的滴答清单服务器：按检查点返回增量，/batch/task 返回 id2etag/id2error"""
+
+    def __init__(self, count = 10):
+        self.checkpoint = 1000
+        self.tasks = {}        # 任务ID -> 任务数据
+        self.changed = {}      # 任务ID -> 最近一次修改时的检查点
+        self.deleted = {}      # 任务ID -> 删除时的检查点
+        self.projects = [{"id": "p1", "name": "工作"}, {"id": "p2", "name": "个人学习"}]
+        self.tags = [{"name": "重要", "label": "重要"}, {"name": "紧急", "label": "紧急"}]
+        self.profile_checkpoint = self.checkpoint
+        self.offline = False   # True 时所有请求抛出网络异常
+        self.delay = 0         # 同步接口的响应延迟（秒），返回的是收到请求时的数据
+        self.sync_error = None # 不为 None 时同步接口返回的 (状态码, 响应体)
+        self.errors = set()    # 写入时放进 id2error 的任务ID
+        self.calls = {"check": 0, "batch": 0}
+        self.checkpoints = []  # 每次同步请求携带的检查点
+        self.payloads = []
+        for i in range(count):
+            self.put({"id": f"{i:024x}", "title": f"任务{i}", "projectId": ("p1", "p2")[i % 2],
+                      "status": (0, 0, 2)[i % 3], "priority": (0, 1, 3, 5)[i % 4],
+                      "tags": (["重要"], ["紧急"], [])[i % 3], "content": f"内容 {i}",
+                      "dueDate": "2020-01-01T10:00:00.000+0000" if i % 5 == 0 else None})
+
+    def bump(self):
+        self.checkpoint += 1
+        return self.checkpoint
+
+    def put(self, task):
+        """服务器端新增或修改任务（模拟其他客户端的写入）"""
+        task = dict(task, etag=f"e{self.bump()}")
+        self.tasks[task["id"]] = task
+        self.changed[task["id"]] = self.checkpoint
+        self.deleted.pop(task["id"], None)
+        return task
+
+    def delete(self, task_id):
+        self.tasks.pop(task_id)
+        self.deleted[task_id] = self.bump()
+
+    def request(self, method, url, headers = None, timeout = None, json = None):
+        if self.offline:
+            raise requests.exceptions.ConnectionError("offline")
+        path = url.split("/api/v2/", 1)[1]
+        if method == "GET" and path.startswith("batch/check/"):
+            response = self.sync_response(path)
+            if self.delay:
+                time.sleep(self.delay)
+            return response
+        if method == "POST" and path == "batch/task":
+            return FakeResponse(self.batch(json))
+        return FakeResponse({"errorCode": "not_found"}, 404)
+
+    def sync_response(self, path):
+        if self.sync_error is not None:
+            status_code, body = self.sync_error
+            return FakeResponse(body, status_code)
+        return FakeResponse(self.check(int(path.rsplit("/", 1)[1])))
+
+    def check(self, checkpoint):
+        self.calls["check"] += 1
+        self.checkpoints.append(checkpoint)
+        if checkpoint == 0:
+            update, delete = list(self.tasks.values()), []
+        else:
+            update = [self.tasks[i] for i, cp in self.changed.items() if cp > checkpoint and i in self.tasks]
+            delete = [{"taskId": i} for i, cp in self.deleted.items() if cp > checkpoint]
+        profiles = checkpoint == 0 or self.profile_checkpoint > checkpoint
+        return {"checkPoint": self.checkpoint, "inboxId": "inbox1",
+                "syncTaskBean": {"update": update, "delete": delete, "add": []},
+                "projectProfiles": self.projects if profiles else None,
+                "tags": self.tags if profiles else None}
+
+    def batch(self, payload):
+        self.calls["batch"] += 1
+        self.payloads.append(payload)
+        id2etag, id2error = {}, {}
+        for item in payload.get("add", []) + payload.get("update", []):
+            if item["id"] in self.errors:
+                id2error[item["id"]] = "EXCEPTION"
+                continue
+            id2etag[item["id"]] = self.put({**self.tasks.get(item["id"], {}), **item})["etag"]
+        for item in payload.get("delete", []):
+            if item["taskId"] in self.tasks:
+                self.delete(item["taskId"])
+        return {"id2etag": id2etag, "id2error": id2error}
+
+
+class AsyncFakeDida(FakeDida):
+    """FakeDida 的异步版本，网络异常为 httpx 异常"""
+
+    async def request(self, method, url, headers = None, timeout = None, json = None):
+        if self.offline:
+            raise httpx.ConnectError("offline")
+        if "batch/check" in url:
+            response = self.sync_response(url.split("/api/v2/", 1)[1])
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return response
+        return FakeDida.request(self, method, url, headers, timeout, json)
+
+
+@pytest.fixture
+def server():
+    return FakeDida()
+
+
+@pytest.fixture
+def user(server):
+    """已完成首次全量同步的 User"""
+    user = api.User("token", session=server, base_url="http://fake")
+    assert user.get_info_about() is not None
+    return user
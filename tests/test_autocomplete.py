@@ -0,0 +1,45 @@
+"""名称前缀补全"""
+import api
+
+TASK_ID = "a" * 24
+OTHER_ID = "b" * 24
+
+
+def test_whole_name_before_word_start(user, server):
+    server.put({"id": TASK_ID, "title": "Weekly report", "projectId": "p1"})
+    server.put({"id": OTHER_ID, "title": "Draft report outline", "projectId": "p1"})
+    assert user.refresh(force=True) is True
+    results = user.autocomplete("rep")
+    assert [i["id"] for i in results] == [TASK_ID, OTHER_ID]
+    assert results[0] == {"type": "task", "id": TASK_ID, "name": "Weekly report"}
+    # 整个名称以前缀开头的排在前面
+    assert [i["id"] for i in user.autocomplete("draft r")] == [OTHER_ID]
+    assert user.autocomplete("REPORT OUT")[0]["id"] == OTHER_ID
+
+
+def test_kind_filter_and_type_order(user):
+    assert user.autocomplete("个人") == [{"type": "project", "id": "p2", "name": "个人学习"}]
+    assert user.autocomplete("重", kind="tag") == [{"type": "tag", "id": "重要", "name": "重要"}]
+    assert user.autocomplete("重", kind="project") == []
+    tasks = user.autocomplete("任务", kind="task", limit=3)
+    assert [i["name"] for i in tasks] == ["任务0", "任务1", "任务2"]
+    assert user.autocomplete("") == [] and user.autocomplete("任务", limit=0) == []
+
+
+def test_completions_follow_snapshot_changes(user, server):
+    assert user.autocomplete("季度") == []
+    server.put({"id": TASK_ID, "title": "季度总结", "projectId": "p1"})
+    server.delete(f"{3:024x}")
+    assert user.refresh(force=True) is True
+    assert [i["id"] for i in user.autocomplete("季度")] == [TASK_ID]
+    assert "任务3" not in [i["name"] for i in user.autocomplete("任务", kind="task", limit=20)]
+
+
+def test_prefix_index_evolve_matches_rebuild():
+    projects = [api.Project({"id": f"p{i}", "name": name}) for i, name in enumerate(["Home", "Work - Q1", "Hobby"])]
+    old = api.PrefixIndex(projects)
+    new = old.evolve({"p1": api.Project({"id": "p1", "name": "Homework"})}, ["p2"])
+    assert [key for _, key, _ in old.complete("q1")] == ["p1"]
+    assert new.complete("q1") == [] and new.complete("hob") == []
+    assert [key for _, key, _ in new.complete("home")] == ["p0", "p1"]
+    assert new.keys == api.PrefixIndex([projects[0], api.Project({"id": "p1", "name": "Homework"})]).keys
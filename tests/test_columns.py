@@ -0,0 +1,62 @@
+"""numpy 列式副本：向量化筛选的结果与逐个任务筛选一致"""
+import itertools
+
+import pytest
+
+import api
+
+np = pytest.importorskip("numpy")
+
+CONDITIONS = list(itertools.product(
+    (None, "p1", "p2", "missing"),      # project_id
+    (None, "重要", "紧急", "missing"),  # tag
+    (None, 0, 2),                       # status
+    (None, 3),                          # min_priority
+    (None, 1600000000.0),               # due_before（2020-09-13）
+))
+
+
+def select_all(user, snapshot):
+    return {args: [task.id for task in user.query_tasks(*args, snapshot=snapshot)] for args in CONDITIONS}
+
+
+def assert_same_as_scan(user, monkeypatch):
+    snapshot = user._snapshot
+    assert snapshot.columns is not None
+    columnar = select_all(user, snapshot)
+    with monkeypatch.context() as patch:
+        patch.setattr(api, "np", None)
+        assert snapshot.columns is None
+        scanned = select_all(user, snapshot)
+    assert columnar == scanned
+
+
+def test_columnar_select_matches_scan(user, monkeypatch):
+    assert_same_as_scan(user, monkeypatch)
+
+
+def test_evolved_columns_match_scan(user, server, monkeypatch):
+    old = user._snapshot.columns
+    for i in range(10, 14):
+        server.put({"id": f"{i:024x}", "title": f"新任务{i}", "projectId": "p2", "priority": 5,
+                    "tags": ["新标签", "重要"], "dueDate": "2019-06-01T10:00:00.000+0000"})
+    server.put({**server.tasks[f"{1:024x}"], "projectId": "p1", "tags": ["紧急", "新标签"], "status": 2})
+    for i in (0, 3, 5, 7):
+        server.delete(f"{i:024x}")
+    assert user.refresh(force=True) is True
+    columns = user._snapshot.columns
+    assert columns is not old and len(old.tasks) == 10
+    # 删除的行超过四分之一时整体压缩
+    assert columns.dead == 0 and len(columns.tasks) == len(user._snapshot.tasks)
+    assert_same_as_scan(user, monkeypatch)
+    assert [task.id for task in columns.select(tag="新标签")] == \
+        [f"{1:024x}"] + [f"{i:024x}" for i in range(10, 14)]
+
+
+def test_many_tags_spill_into_more_words(user, server, monkeypatch):
+    server.put({"id": "a" * 24, "title": "很多标签", "projectId": "p1", "tags": [f"标签{i}" for i in range(70)]})
+    assert user.refresh(force=True) is True
+    columns = user._snapshot.columns
+    assert columns.tag_bits.shape[1] == 2
+    assert [task.id for task in columns.select(tag="标签69")] == ["a" * 24]
+    assert_same_as_scan(user, monkeypatch)
@@ -0,0 +1,76 @@
+"""增量同步：只拉取检查点之后的变更并合并到本地模型"""
+import api
+
+TASK_ID = f"{1:024x}"
+NEW_ID = "a" * 24
+
+
+def test_first_sync_is_full(user, server):
+    assert server.calls["check"] == 1
+    assert len(user.tasks) == 10
+    assert user.checkpoint == server.checkpoint
+    assert user.inbox_id == "inbox1"
+    assert [p.name for p in user.projects] == ["工作", "个人学习"]
+
+
+def test_delta_merges_add_update_delete(user, server):
+    order = [task.id for task in user.tasks]
+    server.put({**server.tasks[TASK_ID], "title": "服务器端修改"})
+    server.put({"id": NEW_ID, "title": "新任务", "projectId": "p1", "status": 0})
+    server.delete(f"{2:024x}")
+    version = user.version
+    assert user.get_info_about() is not None
+    assert user.checkpoint == server.checkpoint
+    assert user.version == version + 1
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "服务器端修改"
+    # 修改的任务保持原位，新任务排在最后，删除的任务从模型和索引中移除
+    assert [task.id for task in user.tasks] == [i for i in order if i != f"{2:024x}"] + [NEW_ID]
+    assert f"{2:024x}" not in user.snapshot.tasks_by_id
+    assert NEW_ID in {task.id for task in user.tasks_in_project("p1")}
+    # 项目和标签没有变化时沿用原有列表
+    assert len(user.projects) == 2 and len(user.tags) == 2
+
+
+def test_delta_without_changes_keeps_snapshot(user, server):
+    version = user.version
+    assert user.get_info_about() is not None
+    assert user.version == version
+    assert server.calls["check"] == 2
+
+
+def test_project_change_replaces_project_list(user, server):
+    server.projects = server.projects + [{"id": "p3", "name": "新项目"}]
+    server.profile_checkpoint = server.bump()
+    assert user.get_info_about() is not None
+    assert user.find_project_by_name("新项目").id == "p3"
+
+
+def test_incremental_sync_disabled_always_pulls_full(server):
+    user = api.User("token", session=server, base_url="http://fake", incremental_sync=False)
+    user.get_info_about()
+    server.delete(f"{3:024x}")
+    user.get_info_about()
+    assert len(user.tasks) == 9
+
+
+def test_error_response_leaves_model_and_checkpoint(user, server):
+    checkpoint, version = user.checkpoint, user.version
+    server.sync_error = (401, {"errorCode": "user_not_sign_on"})
+    user.invalidate()
+    assert user.refresh() is False
+    assert len(user.tasks) == 10
+    assert user.checkpoint == checkpoint and user.version == version
+    assert not user.is_fresh()
+    # 恢复后从原检查点继续增量同步，不会重新全量拉取
+    server.sync_error = None
+    server.put({**server.tasks[TASK_ID], "title": "恢复后"})
+    assert user.refresh() is True
+    assert server.checkpoints[-1] == checkpoint
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "恢复后"
+
+
+def test_cached_snapshot_is_not_resynced(user, server):
+    assert user.refresh() is True
+    assert server.calls["check"] == 1
+    assert user.refresh(force=True) is True
+    assert server.calls["check"] == 2
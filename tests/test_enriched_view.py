@@ -0,0 +1,49 @@
+"""附加项目名称和标签详情的物化视图"""
+TASK_ID = f"{0:024x}"
+
+
+def enriched(user):
+    return {data["id"]: data for data in user.enriched_tasks()}
+
+
+def test_enriched_fields(user):
+    data = enriched(user)
+    assert data[TASK_ID]["projectName"] == "工作"
+    assert data[TASK_ID]["tagDetails"] == [{"name": "重要", "label": "重要", "color": None}]
+    assert data[f"{1:024x}"]["projectName"] == "个人学习"
+    assert "tagDetails" not in data[f"{2:024x}"]
+
+
+def test_dicts_are_reused_within_a_snapshot(user, server):
+    first = enriched(user)
+    assert all(first[i] is data for i, data in enriched(user).items())
+    server.put({**server.tasks[TASK_ID], "title": "改过的标题"})
+    assert user.refresh(force=True) is True
+    second = enriched(user)
+    assert second[TASK_ID]["title"] == "改过的标题" and first[TASK_ID]["title"] == "任务0"
+    # 没有变化的任务沿用上一个快照的字典
+    assert second[f"{1:024x}"] is first[f"{1:024x}"]
+
+
+def test_project_rename_rejoins_only_its_tasks(user, server):
+    first = enriched(user)
+    server.projects = [{"id": "p1", "name": "新工作"}, {"id": "p2", "name": "个人学习"}]
+    server.profile_checkpoint = server.bump()
+    assert user.refresh(force=True) is True
+    second = enriched(user)
+    for task_id, data in second.items():
+        if data["projectId"] == "p1":
+            assert data["projectName"] == "新工作" and data is not first[task_id]
+        else:
+            assert data is first[task_id]
+    assert first[TASK_ID]["projectName"] == "工作"
+
+
+def test_tag_color_change_rejoins_tagged_tasks(user, server):
+    first = enriched(user)
+    server.tags = [{"name": "重要", "label": "重要", "color": "#ff0000"}, {"name": "紧急", "label": "紧急"}]
+    server.profile_checkpoint = server.bump()
+    assert user.refresh(force=True) is True
+    second = enriched(user)
+    assert second[TASK_ID]["tagDetails"] == [{"name": "重要", "label": "重要", "color": "#ff0000"}]
+    assert second[f"{1:024x}"] is first[f"{1:024x}"]
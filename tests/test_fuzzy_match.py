@@ -0,0 +1,51 @@
+"""按名称/标题的模糊查找"""
+import api
+
+TASK_ID = "a" * 24
+
+
+def test_exact_title_has_full_confidence(user):
+    task, confidence, matches = user.resolve_task_by_title("任务3")
+    assert task.id == f"{3:024x}" and confidence == 1.0 and matches == []
+
+
+def test_near_miss_title_resolves(user, server):
+    server.put({"id": TASK_ID, "title": "Prepare Quarterly Report", "projectId": "p1"})
+    assert user.refresh(force=True) is True
+    task, confidence, matches = user.resolve_task_by_title("prepare  quartrly report")
+    assert task.id == TASK_ID
+    assert 0.6 <= confidence < 1.0
+    assert matches[0] == (task, confidence)
+
+
+def test_ambiguous_title_lists_candidates(user):
+    # 任务1、任务2…… 与查询同样相近，无法确定唯一结果
+    task, confidence, matches = user.resolve_task_by_title("任务")
+    assert task is None and confidence == 0.0
+    assert len(matches) == 5 and all(t.title.startswith("任务") for t, _ in matches)
+
+
+def test_project_and_tag_names(user):
+    # 大小写和多余空白不影响相似度
+    project, confidence, matches = user.resolve_project_by_name(" 个人学习 ")
+    assert project.id == "p2" and confidence == 1.0 and matches[0][0] is project
+    tag, confidence, matches = user.resolve_tag_by_name("重要")
+    assert tag.name == "重要" and confidence == 1.0 and matches == []
+    tag, confidence, matches = user.resolve_tag_by_name("完全无关")
+    assert tag is None and matches == []
+
+
+def test_pick_match_needs_margin():
+    assert api.pick_match("exact", [("a", 0.9)]) == ("exact", 1.0)
+    assert api.pick_match(None, [("a", 0.9), ("b", 0.5)]) == ("a", 0.9)
+    assert api.pick_match(None, [("a", 0.9), ("b", 0.85)]) == (None, 0.0)
+    assert api.pick_match(None, [("a", 0.5)]) == (None, 0.0)
+
+
+def test_name_index_evolve_keeps_old_index():
+    old = api.NameIndex([api.Project({"id": "p1", "name": "工作"}), api.Project({"id": "p2", "name": "学习"})])
+    new = old.evolve({"p1": api.Project({"id": "p1", "name": "旅行计划"})}, ["p2"])
+    assert [key for _, key in old.match("工作")] == ["p1"]
+    assert new.match("工作") == [] and new.match("学习") == []
+    assert [key for _, key in new.match("旅行计划")] == ["p1"]
+    assert new.grams == api.NameIndex([api.Project({"id": "p1", "name": "旅行计划"})]).grams
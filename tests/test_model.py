@@ -0,0 +1,54 @@
+"""__slots__ 数据对象：已知字段放在 slot 中，未知字段放入溢出字典"""
+import pytest
+
+import api
+
+
+def test_known_and_unknown_fields_round_trip():
+    data = {"id": "t1", "title": "任务", "projectId": "p1", "customField": {"a": 1}, "dueDate": None}
+    task = api.Task(data)
+    assert not hasattr(task, "__dict__")
+    assert task.title == "任务" and task.customField == {"a": 1}
+    # None 值不出现在字典形式中
+    assert task.to_dict() == {"id": "t1", "title": "任务", "projectId": "p1", "customField": {"a": 1}}
+
+
+def test_missing_field_raises_attribute_error():
+    task = api.Task({"id": "t1"})
+    assert task.title is None
+    with pytest.raises(AttributeError):
+        task.notAField
+
+
+def test_to_dict_cache_is_invalidated_on_assignment():
+    task = api.Task({"id": "t1", "title": "旧"})
+    first = task.to_dict()
+    first["title"] = "调用方修改"
+    assert task.to_dict()["title"] == "旧"
+    task.title = "新"
+    task.extraField = 1
+    assert task.to_dict() == {"id": "t1", "title": "新", "extraField": 1}
+
+
+def test_copy_is_independent():
+    task = api.Task({"id": "t1", "title": "原", "other": "x", "dueDate": "2020-01-01T10:00:00.000+0000"})
+    clone = task.copy()
+    clone.title = "副本"
+    clone.other = "y"
+    assert (task.title, task.other) == ("原", "x")
+    assert clone.due_time() == task.due_time()
+
+
+def test_dates_are_reparsed_after_change():
+    task = api.Task({"id": "t1", "dueDate": "2020-01-01T10:00:00.000+0000"})
+    before = task.due_time()
+    task.dueDate = "2020-01-02T10:00:00.000+0000"
+    assert task.due_time() - before == 86400
+    task.dueDate = None
+    assert task.due_time() is None
+
+
+def test_interned_fields_share_strings():
+    first = api.Task({"id": "a", "projectId": "".join(["p", "roject-1"])})
+    second = api.Task({"id": "b", "projectId": "".join(["proj", "ect-1"])})
+    assert first.projectId is second.projectId
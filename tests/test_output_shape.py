@@ -0,0 +1,106 @@
+"""字段裁剪和紧凑输出"""
+import asyncio
+import importlib
+import json
+
+import pytest
+
+import api
+from conftest import AsyncFakeDida
+
+TASK_ID = f"{0:024x}"
+
+
+def test_field_projection_keeps_identity(user):
+    shaped = api.shape_output(user.enriched_tasks(), fields="title, dueDate")
+    assert shaped[0] == {"id": TASK_ID, "title": "任务0", "dueDate": "2020-01-01T10:00:00.000+0000"}
+    # 没有截止时间的任务不含该字段
+    assert shaped[1] == {"id": f"{1:024x}", "title": "任务1"}
+
+
+def test_compact_drops_empty_and_default_values(user):
+    task = api.shape_output(user.enriched_tasks([user.snapshot.tasks_by_id[f"{2:024x}"]])[0], compact=True)
+    assert "tags" not in task and "dueDate" not in task
+    assert "status" in task  # 已归档（2）不是默认值
+    task = api.shape_output(user.enriched_tasks([user.snapshot.tasks_by_id[TASK_ID]])[0], compact=True)
+    assert "status" not in task and "priority" not in task
+    assert task["tags"] == ["重要"]
+
+
+def test_short_keys(user):
+    task = api.shape_output(user.tool_get_task_info(TASK_ID), fields="title,projectId", short_keys=True)
+    assert task == {"id": TASK_ID, "t": "任务0", "pid": "p1"}
+
+
+def test_wrapped_results_and_errors(user):
+    paged = {"total": 10, "nextCursor": None, "tasks": user.tool_get_task_info()[:2]}
+    shaped = api.shape_output(paged, fields="title")
+    assert shaped["total"] == 10 and shaped["tasks"][0] == {"id": TASK_ID, "title": "任务0"}
+    error = {"error": "未找到任务"}
+    assert api.shape_output(error, fields="title", compact=True, short_keys=True) == error
+    assert api.shape_output([error], fields="title") == [error]
+
+
+def test_dump_json_compact():
+    data = {"a": [1, 2], "b": "中文"}
+    assert api.dump_json(data, compact=True) == '{"a":[1,2],"b":"中文"}'
+    assert json.loads(api.dump_json(data)) == data
+
+
+@pytest.fixture(scope="module")
+def servers(tmp_path_factory):
+    """两个 MCP 服务器模块；导入时会在当前目录创建 key.json，因此在临时目录中导入"""
+    pytest.importorskip("mcp.server.fastmcp")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("servers"))
+        return importlib.import_module("server"), importlib.import_module("server_StreamableHTTP")
+
+
+@pytest.fixture
+def sync_server(servers, user, monkeypatch):
+    module = servers[0]
+    monkeypatch.setattr(module, "snapshot_store", None)
+    monkeypatch.setattr(module, "get_user_instance", lambda: user)
+    return module
+
+
+@pytest.fixture
+def http_server(servers, monkeypatch):
+    module = servers[1]
+    user = api.AsyncUser("token", session=AsyncFakeDida(), base_url="http://fake")
+    assert asyncio.run(user.get_info_about()) is not None
+
+    async def get_user_instance():
+        return user
+    monkeypatch.setattr(module, "snapshot_store", None)
+    monkeypatch.setattr(module, "get_user_instance", get_user_instance)
+    return module
+
+
+def call_tool(module, name, arguments):
+    """通过 FastMCP 调用工具（包括返回值校验），返回第一段文本内容"""
+    result = asyncio.run(module.mcp.call_tool(name, arguments))
+    content = result[0] if isinstance(result, tuple) else result
+    return content[0].text
+
+
+@pytest.mark.parametrize("name, arguments", [
+    ("get_all_tasks", {}),
+    ("get_all_tasks", {"limit": 2}),
+    ("get_task_by_id", {"task_id": TASK_ID}),
+    ("get_all_projects", {}),
+    ("get_all_tags", {}),
+    ("query_tasks", {"query": "tag:重要"}),
+])
+@pytest.mark.parametrize("module", ["sync_server", "http_server"])
+def test_compact_output_passes_tool_validation(request, module, name, arguments):
+    module = request.getfixturevalue(module)
+    text = call_tool(module, name, {**arguments, "compact": True, "short_keys": True})
+    assert "\n" not in text
+    data = json.loads(text)
+    assert data and '"title"' not in text and "error" not in text
+
+
+def test_compact_matches_shaped_result(sync_server, user):
+    text = call_tool(sync_server, "get_all_tasks", {"compact": True, "fields": "title,status"})
+    assert json.loads(text) == api.shape_output(user.enriched_tasks(), "title,status", compact=True)
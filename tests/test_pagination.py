@@ -0,0 +1,55 @@
+"""分页游标：翻页期间固定在第一页的快照版本"""
+import pytest
+
+NEW_ID = "b" * 24
+
+
+def all_tasks(snapshot):
+    return snapshot.tasks
+
+
+def test_pages_stay_on_first_snapshot(user, server):
+    page, total, cursor, version = user.paginate(("all",), all_tasks, 4)
+    expected = [task.id for task in user.tasks]
+    assert total == 10 and len(page) == 4 and cursor
+
+    # 翻页期间同步到新版本：删除一个任务、新增一个任务
+    server.delete(f"{5:024x}")
+    server.put({"id": NEW_ID, "title": "新任务", "projectId": "p1"})
+    assert user.get_info_about() is not None
+    assert user.version != version
+
+    seen = [task.id for task in page]
+    while cursor:
+        page, total, cursor, page_version = user.paginate(("all",), all_tasks, 4, cursor)
+        assert page_version == version and total == 10
+        seen.extend(task.id for task in page)
+    assert seen == expected
+
+    # 重新查询第一页时使用新版本
+    page, total, _, new_version = user.paginate(("all",), all_tasks, 4)
+    assert new_version == user.version and total == 10
+    assert NEW_ID in {task.id for task in user.tasks}
+
+
+def test_single_page_has_no_cursor(user):
+    page, total, cursor, _ = user.paginate(("all",), all_tasks, 20)
+    assert len(page) == total == 10 and cursor is None
+    assert len(user.cursors) == 0
+
+
+def test_cursor_errors(user):
+    _, _, cursor, _ = user.paginate(("all",), all_tasks, 3)
+    with pytest.raises(ValueError):
+        user.paginate(("project", "p1"), all_tasks, 3, cursor)
+    with pytest.raises(ValueError):
+        user.paginate(("all",), all_tasks, 3, "bad-cursor")
+    with pytest.raises(ValueError):
+        user.paginate(("all",), all_tasks, 3, "unknown.3")
+
+
+def test_expired_cursor(user):
+    user.cursors.ttl = 0
+    _, _, cursor, _ = user.paginate(("all",), all_tasks, 3)
+    with pytest.raises(ValueError):
+        user.paginate(("all",), all_tasks, 3, cursor)
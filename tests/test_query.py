@@ -0,0 +1,94 @@
+"""查询表达式（TaskQuery）和索引选择"""
+import pytest
+
+import api
+
+
+@pytest.fixture(autouse=True, params=["index", "numpy"])
+def columnar(request, monkeypatch):
+    """每个用例分别在没有 numpy 和有 numpy（列式副本）时各运行一次，结果应当相同"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        return True
+    monkeypatch.setattr(api, "np", None)
+    return False
+
+
+def index_plan(name, columnar):
+    """预期的执行计划：有列式副本时，候选超过任务数 INDEX_RATIO 的索引不如向量化扫描"""
+    return "列式向量化扫描" if columnar else name
+
+
+def ids(tasks):
+    return sorted(int(task.id, 16) for task in tasks)
+
+
+def find(user, expression, sort = None, limit = None):
+    tasks, total, plan, _ = user.find_tasks(expression, sort, limit)
+    return tasks, total, plan
+
+
+def test_conditions_are_combined(user, columnar):
+    tasks, total, plan = find(user, "status:pending tag:重要")
+    assert ids(tasks) == [0, 3, 6, 9] and total == 4
+    assert plan.startswith(index_plan("标签索引", columnar))
+    tasks, _, plan = find(user, "project:工作 priority>=3")
+    assert ids(tasks) == [2, 6]
+    assert plan.startswith(index_plan("项目索引", columnar))
+
+
+def test_selective_index_is_used_with_columns(user, server):
+    server.put({**server.tasks[f"{4:024x}"], "tags": ["罕见"]})
+    assert user.refresh(force=True) is True
+    tasks, _, plan = find(user, "tag:罕见 -status:archived")
+    assert ids(tasks) == [4]
+    assert plan.startswith("标签索引（候选 1 个）")
+
+
+def test_negation_and_alternatives(user):
+    tasks, _, _ = find(user, "-tag:紧急 status:pending,archived")
+    assert ids(tasks) == [0, 2, 3, 5, 6, 8, 9]
+    tasks, _, _ = find(user, "tag:重要+紧急")
+    assert tasks == []
+    tasks, _, _ = find(user, "priority:high")
+    assert ids(tasks) == [3, 7]
+    tasks, _, _ = find(user, "priority:1..3")
+    assert ids(tasks) == [1, 2, 5, 6, 9]
+
+
+def test_due_conditions_use_date_index(user, columnar):
+    tasks, _, plan = find(user, "due<today")
+    assert ids(tasks) == [0, 5]
+    assert plan.startswith(index_plan("截止时间索引", columnar))
+    tasks, _, _ = find(user, "due:none")
+    assert len(tasks) == 8
+
+
+def test_text_search_and_score_sort(user):
+    tasks, _, plan = find(user, '"内容 3"')
+    assert [task.id for task in tasks][0] == f"{3:024x}"
+    assert plan.startswith("全文索引")
+
+
+def test_sort_and_limit(user):
+    tasks, total, _ = find(user, "project:工作", sort="-priority,title", limit=2)
+    assert total == 5
+    assert [task.priority for task in tasks] == [3, 3]
+    assert [task.title for task in tasks] == ["任务2", "任务6"]
+
+
+def test_without_index_scans_all_tasks(user, columnar):
+    tasks, total, plan = find(user, "-status:archived")
+    assert total == 7
+    assert plan == index_plan("全量扫描", columnar)
+
+
+@pytest.mark.parametrize("expression", ["status>1", "priority:", "due<someday", 'title:"unclosed'])
+def test_invalid_expressions_raise(user, expression):
+    with pytest.raises(ValueError):
+        api.TaskQuery(expression)
+
+
+def test_invalid_sort_raises(user):
+    with pytest.raises(ValueError):
+        find(user, "status:pending", sort="color")
@@ -0,0 +1,96 @@
+"""后台刷新：按间隔刷新用户池中的租户，失败的租户退避且不影响其他租户"""
+import asyncio
+import time
+
+import api
+from conftest import AsyncFakeDida
+
+
+async def make_worker(servers, **kwargs):
+    pool = api.UserPool(lambda token: api.AsyncUser(token, session=servers[token], base_url="http://fake"))
+    for key in servers:
+        await pool.get(key, lambda user: user.get_info_about())
+    worker = api.RefreshWorker(pool, interval=10, jitter=0, **kwargs)
+    await worker.run_once()    # 登记租户，下一个间隔才到期
+    return pool, worker
+
+
+def make_due(worker):
+    for entry in worker._schedule.values():
+        entry[0] = 0
+
+
+def test_due_tenants_are_refreshed():
+    async def run():
+        servers = {"a": AsyncFakeDida(), "b": AsyncFakeDida()}
+        saved = []
+
+        async def after_refresh(user):
+            saved.append(user.token)
+
+        pool, worker = await make_worker(servers, after_refresh=after_refresh)
+        await worker.run_once()
+        assert [server.calls["check"] for server in servers.values()] == [1, 1]
+        for user in pool.users():
+            user.synced_at -= 10
+        make_due(worker)
+        await worker.run_once()
+        assert [server.calls["check"] for server in servers.values()] == [2, 2]
+        assert sorted(saved) == ["a", "b"]
+        assert worker.status()["backoff_tenants"] == 0
+
+    asyncio.run(run())
+
+
+def test_failing_tenant_backs_off_without_blocking_others():
+    async def run():
+        servers = {"a": AsyncFakeDida(), "b": AsyncFakeDida()}
+        pool, worker = await make_worker(servers)
+        broken = pool.peek("a")
+
+        async def fail(full = False):
+            raise ValueError("malformed response")
+
+        broken.get_info_about = fail
+        for user in pool.users():
+            user.synced_at -= 10
+        make_due(worker)
+        await worker.run_once()
+        # 出错的租户记录失败并退避，另一个租户照常刷新
+        assert servers["b"].calls["check"] == 2
+        assert worker._schedule["a"][1] == 1
+        assert worker._schedule["a"][0] > time.monotonic() + 10
+        assert worker.status()["backoff_tenants"] == 1
+        # 退避期间不再重试
+        await worker.run_once()
+        assert worker._schedule["a"][1] == 1
+
+    asyncio.run(run())
+
+
+def test_failing_after_refresh_counts_as_failure():
+    async def run():
+        servers = {"a": AsyncFakeDida()}
+
+        async def after_refresh(user):
+            raise OSError("disk full")
+
+        pool, worker = await make_worker(servers, after_refresh=after_refresh)
+        pool.peek("a").synced_at -= 10
+        make_due(worker)
+        await worker.run_once()
+        assert worker._schedule["a"][1] == 1
+
+    asyncio.run(run())
+
+
+def test_recently_synced_tenant_is_postponed():
+    async def run():
+        servers = {"a": AsyncFakeDida()}
+        pool, worker = await make_worker(servers)
+        make_due(worker)
+        await worker.run_once()
+        assert servers["a"].calls["check"] == 1
+        assert worker._schedule["a"][0] > 0
+
+    asyncio.run(run())
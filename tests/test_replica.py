@@ -0,0 +1,106 @@
+"""SQLite 副本：在后台按发布顺序写入，跟上当前快照后查询结果与内存索引一致"""
+import api
+
+
+def query_both_ways(user, **conditions):
+    """分别在副本和不使用副本时查询，返回 (副本结果, 内存结果) 的任务ID列表"""
+    replica, user.replica = user.replica, None
+    try:
+        memory = [task.id for task in user.query_tasks(**conditions)]
+    finally:
+        user.replica = replica
+    return [task.id for task in user.query_tasks(**conditions)], memory
+
+
+def test_replica_follows_snapshots_in_background(server):
+    replica = api.TaskReplica()
+    user = api.User("token", session=server, base_url="http://fake", replica=replica)
+    user.get_info_about()
+    replica.wait()
+    assert replica.version == user.version
+
+    task = user.find_task_by_id(f"{3:024x}")
+    task.tags = ["重要"]
+    assert user.modify_task(task) is True
+    replica.wait()
+    assert replica.version == user.version
+    from_replica, from_memory = query_both_ways(user, tag="重要")
+    assert from_replica == from_memory
+    replica.close()
+
+
+def test_replica_schema_mismatch_is_rebuilt(tmp_path, server):
+    path = str(tmp_path / "replica.sqlite")
+    replica = api.TaskReplica(path)
+    replica._conn.execute("PRAGMA user_version = 1")
+    replica.close()
+    replica = api.TaskReplica(path)
+    user = api.User("token", session=server, base_url="http://fake", replica=replica)
+    user.get_info_about()
+    replica.wait()
+    assert len(user.query_tasks(project_id="p1")) == 5
+    replica.close()
+
+
+def test_memory_fallback_keeps_task_list_order(user, server):
+    user.query_tasks(tag="重要")  # 先构建顺序表，之后的变化通过增量更新应用
+    task = user.find_task_by_id(f"{0:024x}")
+    task.tags, task.projectId = ["紧急"], "p2"
+    assert user.modify_task(task) is True
+    assert user.remove_task(user.find_task_by_id(f"{4:024x}")) is True
+    server.put({**server.tasks[f"{1:024x}"], "tags": ["紧急", "重要"]})
+    user.invalidate()
+    assert user.refresh() is True
+    for conditions, keep in (({"tag": "紧急"}, lambda t: "紧急" in (t.tags or ())),
+                             ({"project_id": "p2"}, lambda t: t.projectId == "p2")):
+        expected = [t.id for t in user.snapshot.tasks if keep(t)]
+        assert [t.id for t in user.query_tasks(**conditions)] == expected
+
+
+class RacingLock:
+    """第一次加锁之前先执行 before()，模拟写线程恰好在版本检查和查询之间提交"""
+
+    def __init__(self, lock, before):
+        self.lock, self.before = lock, before
+
+    def acquire(self, blocking = True, timeout = -1):
+        if self.before is not None:
+            before, self.before = self.before, None
+            before()
+        return self.lock.acquire(blocking, timeout)
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def test_newer_replica_version_falls_back_to_snapshot(server):
+    replica = api.TaskReplica()
+    user = api.User("token", session=server, base_url="http://fake", replica=replica)
+    user.get_info_about()
+    replica.wait()
+    old = user.snapshot
+    task = api.Task({"id": "c" * 24, "title": "新任务", "projectId": "p1", "tags": ["重要"]})
+    newer = old.evolve(old.version + 1, updated={task.id: task})
+    replica._lock = RacingLock(replica._lock, lambda: replica.sync(old, newer, updated={task.id: task}))
+    tasks = user.query_tasks(tag="重要", snapshot=old)
+    assert [t.id for t in tasks] == [t.id for t in old.tasks if "重要" in (t.tags or ())]
+    assert replica.version == newer.version
+    replica.close()
+
+
+def test_async_user_does_not_wait_for_replica_writes(server):
+    replica = api.TaskReplica()
+    user = api.AsyncUser("token", session=server, base_url="http://fake", replica=replica)
+    user._install(api.Snapshot(1, [api.Task(i) for i in server.tasks.values()]))
+    replica.wait()
+    with replica._lock:
+        # 写线程持有锁时不阻塞，直接使用内存索引
+        assert len(user.query_tasks(project_id="p1")) == 5
+    assert replica.query_task_ids(project_id="p1", version=replica.version + 1) is None
+    replica.close()
@@ -0,0 +1,52 @@
+"""BM25 全文检索"""
+import api
+
+TITLE_ID = "a" * 24
+CONTENT_ID = "b" * 24
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    assert api.tokenize("写周报 Weekly-Report2") == ["写周", "周报", "weekly", "report2"]
+    assert api.tokenize("猫") == ["猫"]
+    assert api.tokenize(None) == []
+
+
+def test_title_match_ranks_before_content_match(user, server):
+    server.put({"id": TITLE_ID, "title": "整理发票", "projectId": "p1"})
+    server.put({"id": CONTENT_ID, "title": "月底杂事", "projectId": "p1", "content": "记得把发票交给财务"})
+    assert user.refresh(force=True) is True
+    results = user.search_tasks("发票")
+    assert [task.id for task, _, _ in results] == [TITLE_ID, CONTENT_ID]
+    assert results[0][1] > results[1][1] > 0
+    assert results[1][2] == "记得把【发票】交给财务"
+
+
+def test_single_cjk_char_and_any_term_fallback(user, server):
+    server.put({"id": TITLE_ID, "title": "整理发票", "projectId": "p1"})
+    assert user.refresh(force=True) is True
+    assert [task.id for task, _, _ in user.search_tasks("票")] == [TITLE_ID]
+    # 没有任务同时包含全部检索词时，返回命中任一检索词的任务
+    assert [task.id for task, _, _ in user.search_tasks("发票 不存在的词")] == [TITLE_ID]
+    assert user.search_tasks("不存在的词") == []
+
+
+def test_incremental_index_matches_full_rebuild(user, server):
+    server.put({"id": TITLE_ID, "title": "整理发票", "projectId": "p1", "items": [{"title": "打印报销单"}]})
+    assert user.refresh(force=True) is True
+    old = user._snapshot
+    assert [task.id for task, _ in old.search("报销")] == [TITLE_ID]
+    server.put({"id": TITLE_ID, "title": "季度总结", "projectId": "p1"})
+    server.delete(f"{1:024x}")
+    assert user.refresh(force=True) is True
+    snapshot = user._snapshot
+    assert snapshot.search("发票") == []
+    assert [task.id for task, _ in snapshot.search("总结")] == [TITLE_ID]
+    # 旧快照上的索引不受影响
+    assert [task.id for task, _ in old.search("报销")] == [TITLE_ID]
+    # 倒排表与全量构建一致；平均长度变化不大时长度归一化项沿用旧值，得分允许有细微差别
+    rebuilt = api.TextIndex(snapshot.tasks)
+    index = snapshot.text_index
+    assert index.postings == rebuilt.postings and index.chars == rebuilt.chars
+    assert index.total_len == rebuilt.total_len
+    for query in ("任务", "内容 3", "季度", "任务1"):
+        assert {i for _, i in index.search(query)} == {i for _, i in rebuilt.search(query)}
@@ -0,0 +1,108 @@
+"""同步去重：并发的同步请求共享同一次上游请求；写穿之前发出的同步结果不覆盖已确认的修改"""
+import asyncio
+import threading
+import time
+
+import api
+from conftest import AsyncFakeDida
+
+TASK_ID = f"{1:024x}"
+
+
+def test_concurrent_syncs_share_one_request(user, server):
+    server.delay = 0.1
+    user.invalidate()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(user.get_info_about())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.calls["check"] == 2
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    assert user.sync_stats() == {"upstream": 2, "saved": 4}
+
+
+def test_full_sync_does_not_join_incremental_flight(user, server):
+    server.delay = 0.1
+    incremental = user._start_sync()
+    full = user._start_sync(full=True)
+    assert full is not incremental
+    assert user._start_sync() is full
+    incremental.result(), full.result()
+    assert sorted(server.checkpoints[1:]) == [0, server.checkpoints[1]]
+
+
+def test_invalidated_flight_is_not_reused(user, server):
+    server.delay = 0.1
+    first = user._start_sync()
+    user.invalidate()
+    second = user._start_sync()
+    assert second is not first
+    first.result(), second.result()
+
+
+def test_write_during_sync_is_not_overwritten(user, server):
+    # 同步返回的增量中包含该任务写入之前的版本
+    server.put({**server.tasks[TASK_ID], "content": "其他客户端修改"})
+    server.delay = 0.2
+    user.invalidate()
+    flight = user._start_sync()
+    time.sleep(0.05)
+    task = user.find_task_by_id(TASK_ID)
+    task.title = "同步期间写入"
+    assert user.modify_task(task) is True
+    # 同步的返回值是写入之前的数据，被丢弃后重新同步
+    assert flight.result(timeout=2) is not None
+    local = user.snapshot.tasks_by_id[TASK_ID]
+    assert local.title == "同步期间写入"
+    assert local.to_dict() == api.Task(server.tasks[TASK_ID]).to_dict()
+    assert user.checkpoint == server.checkpoint
+
+
+def test_full_invalidation_during_sync_forces_full_resync(user, server):
+    server.delay = 0.1
+    user.invalidate()
+    flight = user._start_sync()
+    time.sleep(0.03)
+    user.invalidate(full=True)
+    assert flight.result(timeout=2) is not None
+    assert server.checkpoints[-1] == 0
+    assert user.checkpoint == server.checkpoint
+
+
+def test_async_callers_share_sync_and_survive_cancellation():
+    async def run():
+        server = AsyncFakeDida()
+        user = api.AsyncUser("token", session=server, base_url="http://fake")
+        server.delay = 0.05
+        callers = [asyncio.ensure_future(user.get_info_about()) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        results = await asyncio.gather(*callers[1:])
+        assert all(result is not None for result in results)
+        assert server.calls["check"] == 1
+        assert len(user.tasks) == 10
+
+    asyncio.run(run())
+
+
+def test_async_write_during_sync_is_not_overwritten():
+    async def run():
+        server = AsyncFakeDida()
+        user = api.AsyncUser("token", session=server, base_url="http://fake")
+        await user.get_info_about()
+        server.put({**server.tasks[TASK_ID], "content": "其他客户端修改"})
+        server.delay = 0.1
+        user.invalidate()
+        flight = user._start_sync()
+        await asyncio.sleep(0.02)
+        task = user.find_task_by_id(TASK_ID)
+        task.title = "同步期间写入"
+        assert await user.modify_task(task) is True
+        assert await flight is not None
+        local = user.snapshot.tasks_by_id[TASK_ID]
+        assert local.title == "同步期间写入"
+        assert local.to_dict() == api.Task(server.tasks[TASK_ID]).to_dict()
+
+    asyncio.run(run())
@@ -0,0 +1,38 @@
+"""本地快照：JSON 格式保存和恢复，只保存同步成功后的数据"""
+import json
+import pickle
+import zlib
+
+import api
+
+
+def test_save_and_load_round_trip(tmp_path, user, server):
+    store = api.SnapshotStore(str(tmp_path))
+    assert store.save(user) is True
+    with open(store.path(user.token), "rb") as f:
+        data = f.read()
+    header = store.MAGIC + bytes([store.FORMAT])
+    assert json.loads(zlib.decompress(data[len(header):]).decode("utf-8"))["checkpoint"] == user.checkpoint
+
+    restored = api.User("token", session=server, base_url="http://fake")
+    assert store.load(restored) is True
+    assert [task.to_dict() for task in restored.tasks] == [task.to_dict() for task in user.tasks]
+    assert restored.checkpoint == user.checkpoint
+
+
+def test_does_not_save_without_successful_sync(tmp_path, user, server):
+    store = api.SnapshotStore(str(tmp_path))
+    assert store.save(api.User("token", session=server, base_url="http://fake")) is False
+    # 检查点被丢弃后本地模型可能与服务器不一致，不覆盖已保存的快照
+    user.invalidate(full=True)
+    assert store.due(user) is False
+    assert store.save(user) is False
+
+
+def test_pickle_file_is_ignored(tmp_path, server):
+    store = api.SnapshotStore(str(tmp_path))
+    user = api.User("token", session=server, base_url="http://fake")
+    with open(store.path(user.token), "wb") as f:
+        f.write(store.MAGIC + bytes([store.FORMAT]) + zlib.compress(pickle.dumps({"tasks": []})))
+    assert store.load(user) is False
+    assert user.last_synced_at is None
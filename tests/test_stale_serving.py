@@ -0,0 +1,26 @@
+"""过期数据的读取策略：从未同步成功时报错，过期数据的列表结果包装成对象"""
+import pytest
+
+import api
+
+
+def test_serve_without_any_data_raises(server):
+    server.offline = True
+    user = api.User("token", session=server, base_url="http://fake", max_stale=300)
+    with pytest.raises(api.DataNotLoadedError):
+        user.serve(deadline=1)
+
+
+def test_serve_returns_age_of_previous_snapshot(user, server):
+    user.invalidate()
+    server.offline = True
+    age = user.serve(deadline=1)
+    assert age is not None and age >= 0
+    assert len(user.snapshot.tasks) == 10
+
+
+def test_shape_output_unwraps_stale_list():
+    result = {"data": [{"id": "a", "title": "t", "status": 0}], "_stale": {"stale": True, "age_seconds": 1.0}}
+    shaped = api.shape_output(result, fields="title")
+    assert shaped["data"] == [{"id": "a", "title": "t"}]
+    assert shaped["_stale"] == result["_stale"]
@@ -0,0 +1,25 @@
+"""增量维护的任务统计"""
+NEW_ID = "f" * 24
+
+
+def test_missing_status_counts_as_pending(user, server):
+    server.put({"id": NEW_ID, "title": "没有状态", "projectId": "p1", "tags": ["重要"],
+                "dueDate": "2020-01-02T10:00:00.000+0000"})
+    user.invalidate()
+    assert user.refresh() is True
+    stats = user.task_statistics()
+    assert None not in stats["by_status"]
+    assert stats["by_status"][0] == len(user.query_tasks(status=0))
+    assert None not in stats["by_project"]["p1"] and None not in stats["by_tag"]["重要"]
+    assert stats["overdue"] == len(user.overdue_tasks())
+
+
+def test_statistics_follow_changes(user, server):
+    before = user.task_statistics()
+    task = user.find_task_by_id(f"{0:024x}")
+    task.status = 2
+    assert user.modify_task(task) is True
+    after = user.task_statistics()
+    assert after["total"] == before["total"]
+    assert after["by_status"][2] == before["by_status"][2] + 1
+    assert after["by_status"][0] == before["by_status"][0] - 1
@@ -0,0 +1,116 @@
+"""多租户用户池，以及切换账号时丢弃进行中的旧账号同步"""
+import asyncio
+import time
+
+import api
+from conftest import AsyncFakeDida, FakeDida
+
+
+class AccountRouter:
+    """按请求头中的 token 把请求转给对应账号的假服务器"""
+
+    def __init__(self, servers):
+        self.servers = servers
+
+    def request(self, method, url, headers = None, **kwargs):
+        return self.servers[headers["cookie"]].request(method, url, headers, **kwargs)
+
+
+def pool_of(servers, **kwargs):
+    return api.UserPool(lambda token: api.AsyncUser(token, session=servers[token], base_url="http://fake"), **kwargs)
+
+
+async def load(user):
+    return await user.get_info_about() is not None
+
+
+def test_tenants_are_isolated_and_created_once():
+    async def run():
+        servers = {"a": AsyncFakeDida(3), "b": AsyncFakeDida(5)}
+        created = []
+        pool = pool_of(servers)
+        factory = pool.factory
+        pool.factory = lambda token: created.append(token) or factory(token)
+        first, again, other = await asyncio.gather(pool.get("a", load), pool.get("a", load), pool.get("b", load))
+        assert first is again and created == ["a", "b"]
+        assert (len(first.tasks), len(other.tasks)) == (3, 5)
+        assert servers["a"].calls["check"] == 1
+
+    asyncio.run(run())
+
+
+def test_failed_loader_is_not_cached():
+    async def run():
+        server = AsyncFakeDida()
+        server.offline = True
+        pool = pool_of({"a": server})
+        await pool.get("a", load)
+        assert "a" not in pool
+        server.offline = False
+        await pool.get("a", load)
+        assert "a" in pool
+
+    asyncio.run(run())
+
+
+def test_eviction_flushes_queued_writes():
+    async def run():
+        servers = {key: AsyncFakeDida() for key in "abc"}
+        pool = pool_of(servers, max_size=2)
+        user = await pool.get("a", load)
+        user.coalesce_window = 60
+        queued = user.queue_delete(user.find_task_by_id(f"{1:024x}"))
+        await pool.get("b", load)
+        await pool.get("c", load)
+        # 最近最少使用的租户被淘汰，淘汰前提交了它排队中的写操作
+        assert "a" not in pool and len(pool) == 2
+        assert await queued is True
+        assert f"{1:024x}" not in servers["a"].tasks
+
+    asyncio.run(run())
+
+
+def test_idle_tenants_expire():
+    async def run():
+        servers = {key: AsyncFakeDida() for key in "ab"}
+        pool = pool_of(servers, idle_ttl=0.01)
+        await pool.get("a", load)
+        time.sleep(0.02)
+        await pool.get("b", load)
+        assert "a" not in pool and "b" in pool
+
+    asyncio.run(run())
+
+
+def test_token_change_discards_in_flight_sync():
+    old, new = FakeDida(3), FakeDida(5)
+    user = api.User("old", session=AccountRouter({"old": old, "new": new}), base_url="http://fake")
+    old.delay = 0.2
+    flight = user._start_sync()
+    time.sleep(0.05)
+    user.update_token("new")
+    assert flight.result(timeout=2) is not None
+    # 旧账号的返回值被丢弃，重新按新账号全量同步
+    assert len(user.tasks) == 5
+    assert user.checkpoint == new.checkpoint
+    assert new.checkpoints == [0]
+
+
+def test_async_token_change_discards_in_flight_sync():
+    async def run():
+        old, new = AsyncFakeDida(3), AsyncFakeDida(5)
+        router = AccountRouter({"old": old, "new": new})
+
+        async def request(method, url, headers = None, **kwargs):
+            return await router.servers[headers["cookie"]].request(method, url, headers, **kwargs)
+
+        router.request = request
+        user = api.AsyncUser("old", session=router, base_url="http://fake")
+        old.delay = 0.1
+        flight = user._start_sync()
+        await asyncio.sleep(0.02)
+        user.update_token("new")
+        assert await flight is not None
+        assert len(user.tasks) == 5 and user.checkpoint == new.checkpoint
+
+    asyncio.run(run())
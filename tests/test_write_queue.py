@@ -0,0 +1,108 @@
+"""写操作合并队列：同一窗口内的任务写操作合并为一次 /batch/task 请求，每个操作各自得到结果"""
+import asyncio
+
+import api
+from conftest import AsyncFakeDida
+
+TASK_ID = f"{1:024x}"
+OTHER_ID = f"{2:024x}"
+
+
+def queued_user(server):
+    # 合并窗口足够长，由测试调用 flush_writes() 提交
+    user = api.User("token", session=server, base_url="http://fake", coalesce_window=60)
+    user.get_info_about()
+    return user
+
+
+def test_writes_are_coalesced_into_one_request(server):
+    user = queued_user(server)
+    first = user.find_task_by_id(TASK_ID)
+    first.title = "第一次修改"
+    second = user.find_task_by_id(TASK_ID)
+    second.content = "第二次修改"
+    futures = [user.queue_update(first), user.queue_update(second),
+               user.queue_delete(user.find_task_by_id(OTHER_ID)),
+               user.queue_add(api.Task({"title": "新任务", "projectId": "p1"}))]
+    assert server.calls["batch"] == 0
+    assert user.flush_writes() is True
+    assert server.calls["batch"] == 1
+    payload = server.payloads[0]
+    assert len(payload["update"]) == 1 and len(payload["add"]) == 1
+    assert payload["delete"] == [{"taskId": OTHER_ID, "projectId": "p1"}]
+    # 同一任务的多次修改合并，后提交的字段覆盖先提交的
+    assert payload["update"][0]["content"] == "第二次修改"
+    assert [future.result() for future in futures] == [True, True, True, True]
+    task = user.snapshot.tasks_by_id[TASK_ID]
+    assert task.content == "第二次修改"
+    assert OTHER_ID not in user.snapshot.tasks_by_id
+    assert user.is_fresh()
+
+
+def test_add_then_delete_cancels_out(server):
+    user = queued_user(server)
+    task = api.Task({"title": "临时任务", "projectId": "p1"})
+    added = user.queue_add(task)
+    deleted = user.queue_delete(task)
+    # 删除之后的操作不再生效
+    later = user.queue_update(task)
+    assert later.result() is False
+    assert user.flush_writes() is True
+    assert server.calls["batch"] == 0
+    assert added.result() is True and deleted.result() is True
+
+
+def test_each_operation_gets_its_own_result(server):
+    user = queued_user(server)
+    server.errors.add(TASK_ID)
+    failing = user.find_task_by_id(TASK_ID)
+    failing.title = "会失败"
+    ok = user.find_task_by_id(OTHER_ID)
+    ok.title = "会成功"
+    futures = [user.queue_update(failing), user.queue_update(ok)]
+    assert user.flush_writes() is False
+    assert [future.result() for future in futures] == [False, True]
+    # 部分失败时本地模型不再可信，下次读取时全量同步
+    assert not user.is_fresh()
+    assert user.checkpoint == 0
+
+
+def test_network_failure_fails_every_operation(server):
+    user = queued_user(server)
+    futures = [user.queue_delete(user.find_task_by_id(TASK_ID)), user.queue_delete(user.find_task_by_id(OTHER_ID))]
+    server.offline = True
+    assert user.flush_writes() is False
+    assert [future.result() for future in futures] == [False, False]
+
+
+def test_concurrent_edits_to_different_fields_are_all_sent(server):
+    user = queued_user(server)
+    # 三个工具调用各自取得任务副本，分别修改不同字段
+    edits = [user.find_task_by_id(TASK_ID) for _ in range(3)]
+    edits[0].title = "新标题"
+    edits[1].priority = 5
+    edits[2].content = "新内容"
+    futures = [user.queue_update(task) for task in edits]
+    assert user.flush_writes() is True
+    assert [future.result() for future in futures] == [True, True, True]
+    (sent,) = server.payloads[0]["update"]
+    assert (sent["title"], sent["priority"], sent["content"]) == ("新标题", 5, "新内容")
+    remote = server.tasks[TASK_ID]
+    assert (remote["title"], remote["priority"], remote["content"]) == ("新标题", 5, "新内容")
+    local = user.snapshot.tasks_by_id[TASK_ID]
+    assert (local.title, local.priority, local.content) == ("新标题", 5, "新内容")
+
+
+def test_async_concurrent_edits_are_all_sent():
+    async def run():
+        server = AsyncFakeDida()
+        user = api.AsyncUser("token", session=server, base_url="http://fake", coalesce_window=0.01)
+        await user.get_info_about()
+        edits = [user.find_task_by_id(TASK_ID) for _ in range(2)]
+        edits[0].title = "新标题"
+        edits[1].content = "新内容"
+        assert await asyncio.gather(*[user.modify_task(task) for task in edits]) == [True, True]
+        assert server.calls["batch"] == 1
+        assert (server.tasks[TASK_ID]["title"], server.tasks[TASK_ID]["content"]) == ("新标题", "新内容")
+
+    asyncio.run(run())
@@ -0,0 +1,134 @@
+"""写穿：/batch/task 的结果确认之后才更新本地模型"""
+import asyncio
+import threading
+
+import api
+from conftest import AsyncFakeDida
+
+TASK_ID = f"{1:024x}"
+
+
+def test_modify_applies_confirmed_write(user, server):
+    version = user.version
+    task = user.find_task_by_id(TASK_ID)
+    task.title = "改过的标题"
+    assert user.modify_task(task) is True
+    local = user.snapshot.tasks_by_id[TASK_ID]
+    assert local.title == "改过的标题"
+    assert local.etag == server.tasks[TASK_ID]["etag"]
+    assert user.version == version + 1
+    # 写穿后快照仍然有效，不需要重新同步
+    assert user.is_fresh()
+    assert server.calls["check"] == 1
+
+
+def test_add_and_delete_apply_locally(user, server):
+    task = api.Task({"title": "新任务", "projectId": "p1"})
+    assert user.add_task(task) is True
+    assert user.snapshot.tasks_by_id[task.id].etag == server.tasks[task.id]["etag"]
+    assert user.remove_task(user.find_task_by_id(task.id)) is True
+    assert task.id not in user.snapshot.tasks_by_id
+    assert user.is_fresh()
+
+
+def test_id2error_invalidates(user, server):
+    server.errors.add(TASK_ID)
+    task = user.find_task_by_id(TASK_ID)
+    task.title = "不会生效"
+    assert user.modify_task(task) is False
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "任务1"
+    assert not user.is_fresh()
+    assert user.checkpoint == 0
+
+
+def test_network_failure_keeps_local_model_and_invalidates(user, server):
+    task = user.find_task_by_id(TASK_ID)
+    task.title = "CHANGED"
+    server.offline = True
+    assert user.modify_task(task) is None
+    # 修改没有被服务器确认，本地模型不变且快照失效
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "任务1"
+    assert not user.is_fresh()
+    assert user.checkpoint == 0
+    server.offline = False
+    assert user.refresh() is True
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "任务1"
+
+
+def test_queued_update_is_published_after_flush(server):
+    user = api.User("token", session=server, base_url="http://fake", coalesce_window=60)
+    user.get_info_about()
+    task = user.find_task_by_id(TASK_ID)
+    task.title = "排队中"
+    future = user.queue_update(task)
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "任务1"
+    assert user.flush_writes() is True
+    assert future.result() is True
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "排队中"
+
+
+def test_async_network_failure_keeps_local_model():
+    async def run():
+        server = AsyncFakeDida()
+        user = api.AsyncUser("token", session=server, base_url="http://fake")
+        await user.get_info_about()
+        task = user.find_task_by_id(TASK_ID)
+        task.title = "CHANGED"
+        server.offline = True
+        assert await user.modify_task(task) is None
+        assert user.snapshot.tasks_by_id[TASK_ID].title == "任务1"
+        assert not user.is_fresh()
+        server.offline = False
+        task.title = "确认后"
+        assert await user.modify_task(task) is True
+        assert user.snapshot.tasks_by_id[TASK_ID].title == "确认后"
+
+    asyncio.run(run())
+
+
+def test_async_flush_failure_resolves_queued_futures():
+    async def run():
+        server = AsyncFakeDida()
+        user = api.AsyncUser("token", session=server, base_url="http://fake", coalesce_window=0.01)
+        await user.get_info_about()
+
+        def broken(payload, id2etag):
+            raise ValueError("malformed task")
+
+        user._apply_task_batch = broken
+        task = user.find_task_by_id(TASK_ID)
+        task.title = "排队中"
+        # 应用结果时出错，排队的操作以失败结束，不会一直挂起
+        assert await asyncio.wait_for(user.modify_task(task), 1) is False
+        assert not user.is_fresh()
+        assert user.checkpoint == 0
+
+    asyncio.run(run())
+
+
+def test_write_during_delta_sync_keeps_both_changes(user, server):
+    other_id = f"{2:024x}"
+    server.put({**server.tasks[other_id], "title": "其他客户端修改"})
+    task = user.find_task_by_id(TASK_ID)
+    task.title = "本地修改"
+    install = user._install
+    writer = []
+
+    def install_with_concurrent_write(snapshot, previous = None, changes = None):
+        # 增量同步发布的同时，另一个线程写穿；写穿必须等同步发布完成后基于新快照合并
+        if not writer:
+            writer.append(threading.Thread(target=user.modify_task, args=(task,)))
+            writer[0].start()
+            writer[0].join(0.2)
+        install(snapshot, previous, changes)
+
+    user._install = install_with_concurrent_write
+    user.invalidate()
+    assert user.refresh() is True
+    writer[0].join()
+    assert user.snapshot.tasks_by_id[other_id].title == "其他客户端修改"
+    assert user.snapshot.tasks_by_id[TASK_ID].title == "本地修改"
+    # 检查点之后没有新的变更，再次增量同步不会丢失任何数据
+    user.invalidate()
+    assert user.refresh() is True
+    assert user.snapshot.tasks_by_id[other_id].title == "其他客户端修改"